@@ -9,8 +9,67 @@ class Settings(BaseSettings):
     telegram_channel_id: str = ""
     telegram_channel_url: str = ""
     tg_channel_url: str = ""
+    subscription_cache_size: int = 10000
+    subscription_cache_ttl_seconds: float = 300.0
+    subscription_negative_ttl_seconds: float = 30.0
+    subscription_cache_redis: bool = False
+    bot_fsm_storage: str = "memory"
+    bot_fsm_ttl_seconds: int = 7 * 24 * 3600
+    bot_webhook_url: str = ""
+    bot_webhook_path: str = "/telegram/webhook"
+    bot_webhook_secret: str = ""
+    bot_webhook_host: str = "0.0.0.0"
+    bot_webhook_port: int = 8080
+    bot_webhook_workers: int = 32
+    bot_webhook_max_pending: int = 1000
     api_base_url: str = "http://localhost:8000"
+    bot_api_timeout_seconds: float = 10.0
+    bot_api_connect_timeout_seconds: float = 3.0
+    bot_api_max_connections: int = 100
+    bot_api_max_keepalive_connections: int = 20
+    bot_api_keepalive_expiry_seconds: float = 30.0
     encryption_key: str = ""
+    wb_api_base_url: str = "https://feedbacks-api.wildberries.ru"
+    ozon_api_base_url: str = "https://api-seller.ozon.ru"
+    poll_concurrency: int = 200
+    poll_timeout_seconds: float = 20.0
+    wb_rate_per_second: float = 3.0
+    wb_rate_burst: float = 6.0
+    ozon_rate_per_second: float = 5.0
+    ozon_rate_burst: float = 10.0
+    marketplace_rate_limit_redis: bool = False
+    marketplace_webhook_token: str = ""
+    webhook_fresh_seconds: float = 3600.0
+    webhook_safety_poll_seconds: float = 6 * 3600.0
+    llm_api_url: str = ""
+    llm_api_key: str = ""
+    llm_model: str = "gpt-4o-mini"
+    llm_timeout_seconds: float = 30.0
+    llm_hedge_after_seconds: float = 8.0
+    llm_max_attempts: int = 2
+    llm_max_in_flight: int = 256
+    llm_max_in_flight_per_project: int = 16
+    llm_batch_size: int = 32
+    llm_batch_wait_ms: int = 2000
+    llm_batch_lease_seconds: int = 600
+    llm_batch_max_attempts: int = 3
+    reply_cache_size: int = 10000
+    reply_cache_ttl_seconds: float = 86400.0
+    reply_cache_redis: bool = False
+    kb_top_k: int = 5
+    kb_retrieval_mode: str = "bm25"
+    kb_embedding_model: str = ""
+    kb_embedding_dim: int = 512
+    kb_vector_dir: str = ""
+    kb_semantic_min_score: float = 0.15
+    kb_snapshot_pubsub: bool = False
+    prompt_max_tokens: int = 1500
+    prompt_max_review_tokens: int = 600
+    backfill_days: int = 365
+    backfill_window_days: int = 7
+    backfill_rate_per_second: float = 0.5
+    backfill_rate_burst: float = 1.0
+    backfill_lease_seconds: int = 600
     free_tokens_per_month: int = 100
     log_retention_days: int = 90
 
@@ -1,13 +1,61 @@
-from datetime import datetime
-from sqlalchemy import or_, select, func
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from datetime import datetime, timedelta
+from sqlalchemy import delete, or_, select, func, tuple_, update
+from sqlalchemy.dialects import postgresql, sqlite
 from sqlalchemy.orm import Session
 
 from app import models
 from app.security import encrypt_token, mask_token
-
-
-def create_project(db: Session, name: str, owner_id: int) -> models.Project:
-    project = models.Project(name=name, owner_id=owner_id)
+from app.services.kb_conflicts import add_conflicts, find_conflicts, forget_conflicts
+from app.services.kb_index import kb_indexes
+from app.services.kb_snapshot import kb_snapshots
+
+EVENT_DEDUPE_KEY = ("cabinet_id", "marketplace", "marketplace_event_id")
+WITHOUT_ANSWER_STATUSES = ["new", "drafted", "approved"]
+# First key of the two-key advisory locks taken on a project's event counters.
+COUNTER_LOCK_NAMESPACE = 4
+EVENT_INSERT_FIELDS = (
+    "project_id",
+    "cabinet_id",
+    "marketplace",
+    "marketplace_event_id",
+    "event_type",
+    "text",
+    "rating",
+    "sentiment",
+    "internal_sku",
+    "raw_payload",
+    "media_links",
+)
+
+
+def _insert(db: Session, model):
+    if db.get_bind().dialect.name == "postgresql":
+        return postgresql.insert(model)
+    return sqlite.insert(model)
+
+
+def _event_key(data: dict) -> tuple:
+    return tuple(data[field] for field in EVENT_DEDUPE_KEY)
+
+
+def encode_event_cursor(event: models.Event) -> str:
+    micros = (event.created_at - datetime(1970, 1, 1)) // timedelta(microseconds=1)
+    raw = f"{micros:x}.{event.id:x}".encode("ascii")
+    return urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_event_cursor(cursor: str) -> tuple[datetime, int]:
+    try:
+        raw = urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode("ascii")
+        micros, event_id = raw.split(".", 1)
+        return datetime(1970, 1, 1) + timedelta(microseconds=int(micros, 16)), int(event_id, 16)
+    except (ValueError, UnicodeDecodeError) as exc:
+        raise ValueError("Invalid cursor") from exc
+
+
+def create_project(db: Session, name: str, owner_id: int, tone_description: str | None = None) -> models.Project:
+    project = models.Project(name=name, owner_id=owner_id, tone_description=tone_description)
     db.add(project)
     db.commit()
     db.refresh(project)
@@ -57,13 +105,34 @@ def get_project_for_user(db: Session, project_id: int, user_id: int) -> models.P
     return db.scalars(stmt).first()
 
 
-def create_cabinet(db: Session, project_id: int, marketplace: str, name: str, api_token: str):
+def create_cabinet(
+    db: Session,
+    project_id: int,
+    marketplace: str,
+    name: str,
+    api_token: str,
+    backfill_days: int = 365,
+):
+    """Create a cabinet whose live polling starts now, plus a pending import of its last ``backfill_days``."""
+    now = datetime.utcnow()
     cabinet = models.Cabinet(
         project_id=project_id,
         marketplace=marketplace,
         name=name,
         api_token_encrypted=encrypt_token(api_token),
         api_token_masked=mask_token(api_token),
+        reviews_since=now,
+        questions_since=now,
+        created_at=now,
+    )
+    start_at = now - timedelta(days=max(backfill_days, 0))
+    cabinet.backfill = models.CabinetBackfill(
+        status="pending" if start_at < now else "done",
+        start_at=start_at,
+        end_at=now,
+        cursor_at=start_at,
+        checkpoint={},
+        progress=0 if start_at < now else 100,
     )
     db.add(cabinet)
     db.commit()
@@ -75,6 +144,116 @@ def list_cabinets(db: Session, project_id: int):
     return db.scalars(select(models.Cabinet).where(models.Cabinet.project_id == project_id)).all()
 
 
+def list_all_cabinets(db: Session, cabinet_ids: list[int] | None = None):
+    stmt = select(models.Cabinet).order_by(models.Cabinet.id)
+    if cabinet_ids is not None:
+        stmt = stmt.where(models.Cabinet.id.in_(cabinet_ids))
+    return db.scalars(stmt).all()
+
+
+def list_cabinet_ids(
+    db: Session,
+    now: datetime | None = None,
+    webhook_fresh_seconds: float = 3600,
+    safety_poll_seconds: float = 6 * 3600,
+) -> list[int]:
+    """Cabinets that need polling.
+
+    A cabinet that received a webhook in the last ``webhook_fresh_seconds`` is
+    left out, unless it has not been polled for ``safety_poll_seconds``; one
+    whose webhooks stopped arriving goes back to regular polling.
+    """
+    now = now or datetime.utcnow()
+    stmt = (
+        select(models.Cabinet.id)
+        .where(
+            or_(
+                models.Cabinet.last_webhook_at.is_(None),
+                models.Cabinet.last_webhook_at < now - timedelta(seconds=webhook_fresh_seconds),
+                models.Cabinet.last_polled_at.is_(None),
+                models.Cabinet.last_polled_at < now - timedelta(seconds=safety_poll_seconds),
+            )
+        )
+        .order_by(models.Cabinet.id)
+    )
+    return list(db.scalars(stmt).all())
+
+
+def enqueue_webhook(
+    db: Session, cabinet: models.Cabinet, payload, received_at: datetime | None = None
+) -> models.WebhookInbox:
+    item = models.WebhookInbox(cabinet_id=cabinet.id, marketplace=cabinet.marketplace, payload=payload)
+    db.add(item)
+    cabinet.last_webhook_at = received_at or datetime.utcnow()
+    db.commit()
+    return item
+
+
+def claim_webhook_batch(db: Session, limit: int = 500) -> list[models.WebhookInbox]:
+    stmt = (
+        select(models.WebhookInbox)
+        .where(models.WebhookInbox.processed_at.is_(None))
+        .order_by(models.WebhookInbox.id)
+        .limit(limit)
+        .with_for_update(skip_locked=True)
+    )
+    return list(db.scalars(stmt).all())
+
+
+def claim_backfills(db: Session, now: datetime, lease_seconds: int, limit: int = 1) -> list[int]:
+    """Lease unfinished backfills nobody is working on; a crashed worker's lease simply runs out."""
+    stmt = (
+        select(models.CabinetBackfill)
+        .where(
+            models.CabinetBackfill.status.in_(["pending", "running"]),
+            or_(models.CabinetBackfill.leased_until.is_(None), models.CabinetBackfill.leased_until < now),
+        )
+        .order_by(models.CabinetBackfill.id)
+        .limit(limit)
+        .with_for_update(skip_locked=True)
+    )
+    backfills = list(db.scalars(stmt).all())
+    for backfill in backfills:
+        backfill.status = "running"
+        backfill.leased_until = now + timedelta(seconds=lease_seconds)
+    db.commit()
+    return [backfill.id for backfill in backfills]
+
+
+def update_backfill(db: Session, backfill_id: int, **values) -> None:
+    db.execute(update(models.CabinetBackfill).where(models.CabinetBackfill.id == backfill_id).values(**values))
+    db.commit()
+
+
+def update_cabinet_watermarks(
+    db: Session,
+    cabinet_id: int,
+    polled_at: datetime,
+    reviews_since: datetime | None = None,
+    questions_since: datetime | None = None,
+) -> None:
+    values = {"last_polled_at": polled_at}
+    if reviews_since is not None:
+        values["reviews_since"] = reviews_since
+    if questions_since is not None:
+        values["questions_since"] = questions_since
+    db.execute(update(models.Cabinet).where(models.Cabinet.id == cabinet_id).values(**values))
+    db.commit()
+
+
+def internal_skus_by_item_id(db: Session, project_id: int, marketplace: str, item_ids: list[str]) -> dict[str, str]:
+    if not item_ids:
+        return {}
+    rows = db.execute(
+        select(models.SKUMap.marketplace_item_id, models.SKUMap.internal_sku).where(
+            models.SKUMap.project_id == project_id,
+            models.SKUMap.marketplace == marketplace,
+            models.SKUMap.marketplace_item_id.in_(item_ids),
+        )
+    ).all()
+    return {item_id: internal_sku for item_id, internal_sku in rows}
+
+
 def upsert_sku_map(db: Session, project_id: int, marketplace: str, seller_sku: str, marketplace_item_id: str, internal_sku: str, product_name: str | None):
     existing = db.scalars(
         select(models.SKUMap).where(
@@ -108,11 +287,26 @@ def list_sku_maps(db: Session, project_id: int):
     return db.scalars(select(models.SKUMap).where(models.SKUMap.project_id == project_id)).all()
 
 
+def _bump_kb_version(db: Session, project_id: int) -> int:
+    db.execute(
+        update(models.Project)
+        .where(models.Project.id == project_id)
+        .values(kb_version=models.Project.kb_version + 1)
+    )
+    return db.scalar(select(models.Project.kb_version).where(models.Project.id == project_id)) or 0
+
+
 def create_kb_rule(db: Session, project_id: int, internal_sku: str | None, text: str):
     rule = models.KBRule(project_id=project_id, internal_sku=internal_sku, text=text)
+    conflicting = find_conflicts(db, rule)
     db.add(rule)
+    db.flush()
+    add_conflicts(db, rule, conflicting)
+    version = _bump_kb_version(db, project_id)
     db.commit()
     db.refresh(rule)
+    kb_snapshots.publish(project_id, version)
+    kb_indexes.rule_added(rule, version)
     return rule
 
 
@@ -123,26 +317,140 @@ def list_kb_rules(db: Session, project_id: int):
 def delete_kb_rule(db: Session, rule_id: int):
     rule = db.get(models.KBRule, rule_id)
     if rule:
+        forget_conflicts(db, rule.id)
         db.delete(rule)
+        version = _bump_kb_version(db, rule.project_id)
         db.commit()
+        kb_snapshots.publish(rule.project_id, version)
+        kb_indexes.rule_deleted(rule, version)
     return rule
 
 
+def _counter_key(project_id: int, status: str, sentiment: str | None, event_type: str) -> tuple:
+    return project_id, status, sentiment or "", event_type
+
+
+def _lock_event_counters(db: Session, project_ids, exclusive: bool = False) -> None:
+    """Transaction-scoped advisory lock on projects' counters (Postgres only).
+
+    Writers bumping counters share it; reconciliation takes it exclusively,
+    so it recounts only once in-flight bumps have committed and no bump can
+    land between its count and its write.
+    """
+    if db.get_bind().dialect.name != "postgresql":
+        return
+    lock = func.pg_advisory_xact_lock if exclusive else func.pg_advisory_xact_lock_shared
+    for project_id in sorted(set(project_ids)):
+        db.execute(select(lock(COUNTER_LOCK_NAMESPACE, project_id)))
+
+
+def _bump_event_counters(db: Session, deltas: dict[tuple, int]) -> None:
+    rows = [
+        {"project_id": project_id, "status": status, "sentiment": sentiment, "event_type": event_type, "count": delta}
+        for (project_id, status, sentiment, event_type), delta in deltas.items()
+        if delta
+    ]
+    if not rows:
+        return
+    _lock_event_counters(db, (row["project_id"] for row in rows))
+    stmt = _insert(db, models.EventCounter).values(rows)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=["project_id", "status", "sentiment", "event_type"],
+        set_={"count": models.EventCounter.count + stmt.excluded.count},
+    )
+    db.execute(stmt)
+
+
+def _count_created(db: Session, events: list[models.Event]) -> None:
+    deltas: dict[tuple, int] = {}
+    for event in events:
+        key = _counter_key(event.project_id, event.status, event.sentiment, event.event_type)
+        deltas[key] = deltas.get(key, 0) + 1
+    _bump_event_counters(db, deltas)
+
+
+def set_event_status(db: Session, event: models.Event, status: str) -> models.Event:
+    if event.status != status:
+        _bump_event_counters(
+            db,
+            {
+                _counter_key(event.project_id, event.status, event.sentiment, event.event_type): -1,
+                _counter_key(event.project_id, status, event.sentiment, event.event_type): 1,
+            },
+        )
+        event.status = status
+    event.updated_at = datetime.utcnow()
+    return event
+
+
+def mark_generation_failed(db: Session, event_ids: list[int], error: str) -> None:
+    """Record why drafting gave up on still-new events; they stay ``new`` for a manual regenerate."""
+    db.execute(
+        update(models.Event)
+        .where(models.Event.id.in_(event_ids), models.Event.status == "new")
+        .values(generation_error=error[:1000], updated_at=datetime.utcnow())
+    )
+    db.commit()
+
+
+def _event_row(data: dict, now: datetime) -> dict:
+    return {
+        **{field: data.get(field) for field in EVENT_INSERT_FIELDS},
+        "status": "new",
+        "conflict": False,
+        "created_at": now,
+        "updated_at": now,
+    }
+
+
 def create_event(db: Session, data: dict):
+    stmt = (
+        _insert(db, models.Event)
+        .values(_event_row(data, datetime.utcnow()))
+        .on_conflict_do_nothing(index_elements=list(EVENT_DEDUPE_KEY))
+        .returning(models.Event)
+    )
+    event = db.scalars(stmt).first()
+    if event is not None:
+        _count_created(db, [event])
+    db.commit()
+    if event is not None:
+        return event, True
     existing = db.scalars(
         select(models.Event).where(
-            models.Event.marketplace_event_id == data["marketplace_event_id"],
-            models.Event.marketplace == data["marketplace"],
             models.Event.cabinet_id == data["cabinet_id"],
+            models.Event.marketplace == data["marketplace"],
+            models.Event.marketplace_event_id == data["marketplace_event_id"],
         )
     ).first()
-    if existing:
-        return existing, False
-    event = models.Event(**data)
-    db.add(event)
+    return existing, False
+
+
+def create_events_bulk(db: Session, items: list[dict]):
+    unique: dict[tuple, dict] = {}
+    duplicates: list[dict] = []
+    for data in items:
+        key = _event_key(data)
+        if key in unique:
+            duplicates.append(data)
+            continue
+        unique[key] = data
+    if not unique:
+        return [], duplicates
+    now = datetime.utcnow()
+    rows = [_event_row(data, now) for data in unique.values()]
+    stmt = (
+        _insert(db, models.Event)
+        .values(rows)
+        .on_conflict_do_nothing(index_elements=list(EVENT_DEDUPE_KEY))
+        .returning(models.Event)
+    )
+    created = list(db.scalars(stmt).all())
+    created_keys = {_event_key({field: getattr(event, field) for field in EVENT_DEDUPE_KEY}) for event in created}
+    _count_created(db, created)
     db.commit()
-    db.refresh(event)
-    return event, True
+    duplicates.extend(data for key, data in unique.items() if key not in created_keys)
+    return created, duplicates
 
 
 def list_events(
@@ -153,6 +461,7 @@ def list_events(
     internal_sku: str | None = None,
     limit: int = 10,
     offset: int = 0,
+    cursor: str | None = None,
 ):
     stmt = select(models.Event).where(models.Event.project_id == project_id)
     if status:
@@ -164,11 +473,22 @@ def list_events(
         stmt = stmt.where(models.Event.sentiment == sentiment)
     if internal_sku:
         stmt = stmt.where(models.Event.internal_sku == internal_sku)
-    stmt = stmt.order_by(models.Event.created_at.desc()).offset(offset).limit(limit)
-    return db.scalars(stmt).all()
+    stmt = stmt.order_by(models.Event.created_at.desc(), models.Event.id.desc())
+    if cursor:
+        created_at, event_id = decode_event_cursor(cursor)
+        stmt = stmt.where(tuple_(models.Event.created_at, models.Event.id) < tuple_(created_at, event_id))
+    else:
+        stmt = stmt.offset(offset)
+    return db.scalars(stmt.limit(limit)).all()
 
 
-def count_events(
+def list_events_page(db: Session, project_id: int, limit: int = 10, **filters):
+    events = list(list_events(db, project_id, limit=limit + 1, **filters))
+    next_cursor = encode_event_cursor(events[limit - 1]) if len(events) > limit else None
+    return events[:limit], next_cursor
+
+
+def _count_events_scan(
     db: Session,
     project_id: int,
     status: str | list[str] | None = None,
@@ -188,15 +508,35 @@ def count_events(
     return db.scalar(stmt) or 0
 
 
+def count_events(
+    db: Session,
+    project_id: int,
+    status: str | list[str] | None = None,
+    sentiment: str | None = None,
+    internal_sku: str | None = None,
+) -> int:
+    if internal_sku:
+        return _count_events_scan(db, project_id, status, sentiment, internal_sku)
+    stmt = select(func.sum(models.EventCounter.count)).where(models.EventCounter.project_id == project_id)
+    if status:
+        if isinstance(status, list):
+            stmt = stmt.where(models.EventCounter.status.in_(status))
+        else:
+            stmt = stmt.where(models.EventCounter.status == status)
+    if sentiment:
+        stmt = stmt.where(models.EventCounter.sentiment == sentiment)
+    return db.scalar(stmt) or 0
+
+
 def count_event_statuses(db: Session, project_id: int) -> dict:
     status_counts = db.execute(
-        select(models.Event.status, func.count(models.Event.id))
-        .where(models.Event.project_id == project_id)
-        .group_by(models.Event.status)
+        select(models.EventCounter.status, func.sum(models.EventCounter.count))
+        .where(models.EventCounter.project_id == project_id)
+        .group_by(models.EventCounter.status)
     ).all()
     counts = {status: count for status, count in status_counts}
     without_answer = sum(
-        counts.get(status, 0) for status in ["new", "drafted", "approved"]
+        counts.get(status, 0) for status in WITHOUT_ANSWER_STATUSES
     )
     return {
         "new": counts.get("new", 0),
@@ -205,9 +545,38 @@ def count_event_statuses(db: Session, project_id: int) -> dict:
     }
 
 
-def list_kb_rules_by_ids(db: Session, rule_ids: list[int]):
+def reconcile_event_counters(db: Session, project_id: int | None = None) -> int:
+    """Recount a project's (or every project's) counters from events, one transaction per project."""
+    if project_id is None:
+        project_ids = db.scalars(select(models.Event.project_id).distinct()).all()
+        stale = db.scalars(
+            select(models.EventCounter.project_id).distinct().where(models.EventCounter.project_id.not_in(project_ids))
+        ).all()
+        return sum(reconcile_event_counters(db, pid) for pid in sorted(set(project_ids) | set(stale)))
+    _lock_event_counters(db, [project_id], exclusive=True)
+    dimensions = (models.Event.status, func.coalesce(models.Event.sentiment, ""), models.Event.event_type)
+    stmt = (
+        select(*dimensions, func.count(models.Event.id))
+        .where(models.Event.project_id == project_id)
+        .group_by(*dimensions)
+    )
+    rows = [
+        {"project_id": project_id, "status": status, "sentiment": sentiment, "event_type": event_type, "count": count}
+        for status, sentiment, event_type, count in db.execute(stmt).all()
+    ]
+    db.execute(delete(models.EventCounter).where(models.EventCounter.project_id == project_id))
+    if rows:
+        db.execute(_insert(db, models.EventCounter).values(rows))
+    db.commit()
+    return len(rows)
+
+
+def list_kb_rules_by_ids(db: Session, rule_ids: list[int], project_id: int | None = None):
+    """Rules by id; with ``project_id`` they come from the project's cached KB snapshot."""
     if not rule_ids:
         return []
+    if project_id is not None:
+        return kb_snapshots.get(db, project_id).rules_by_ids(rule_ids)
     return db.scalars(select(models.KBRule).where(models.KBRule.id.in_(rule_ids))).all()
 
 
@@ -1,8 +1,22 @@
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
 
-from app.routers import bot, projects, cabinets, skus, kb, events, settings, balance, xlsx, admin_metrics
+from app.config import settings as app_settings
+from app.routers import bot, projects, cabinets, skus, kb, events, settings, balance, xlsx, admin_metrics, webhooks
+from app.services.kb_snapshot import kb_snapshots
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    if app_settings.kb_snapshot_pubsub:
+        from redis import Redis
+
+        kb_snapshots.listen(Redis.from_url(app_settings.redis_url))
+    yield
+
 
-app = FastAPI(title="mp_reviews_bot")
+app = FastAPI(title="mp_reviews_bot", lifespan=lifespan)
 
 app.include_router(projects.router)
 app.include_router(cabinets.router)
@@ -14,6 +28,7 @@ app.include_router(balance.router)
 app.include_router(xlsx.router)
 app.include_router(admin_metrics.router)
 app.include_router(bot.router)
+app.include_router(webhooks.router)
 
 
 @app.get("/health")
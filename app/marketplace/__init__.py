@@ -1,16 +1,21 @@
-from app.marketplace.base import MarketplaceClient
-from app.marketplace.clients import OzonClient, WBClient
+from app.marketplace.base import AsyncMarketplaceClient, MarketplaceClient
+from app.marketplace.clients import AsyncOzonClient, AsyncWBClient, OzonClient, WBClient
 from app.marketplace.models import (
     MarketplaceActionResult,
     MarketplaceQuestion,
     MarketplaceReview,
+    Page,
 )
 
 __all__ = [
+    "AsyncMarketplaceClient",
+    "AsyncOzonClient",
+    "AsyncWBClient",
     "MarketplaceActionResult",
     "MarketplaceClient",
     "MarketplaceQuestion",
     "MarketplaceReview",
     "OzonClient",
+    "Page",
     "WBClient",
 ]
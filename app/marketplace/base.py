@@ -1,13 +1,19 @@
 from __future__ import annotations
 
+import asyncio
 from abc import ABC, abstractmethod
 from datetime import datetime
+from typing import AsyncIterator
+
+import httpx
 
 from app.marketplace.models import (
     MarketplaceActionResult,
     MarketplaceQuestion,
     MarketplaceReview,
+    Page,
 )
+from app.marketplace.ratelimit import RateLimiter, parse_retry_after
 
 
 class MarketplaceClient(ABC):
@@ -34,3 +40,84 @@ class MarketplaceClient(ABC):
         self, *, question_id: str, text: str
     ) -> MarketplaceActionResult:
         """Send an answer to a question and return raw request/response data."""
+
+
+class AsyncMarketplaceClient(ABC):
+    """Non-blocking read side of a marketplace integration, used by the poller.
+
+    Every HTTP call goes through ``_request``: it takes a token from the
+    cabinet's bucket first and, on 429, blocks the bucket for ``Retry-After``
+    before retrying.
+    """
+
+    marketplace: str
+    rate_per_second: float = 1.0
+    burst: float = 1.0
+    max_retries: int = 3
+    # Listings the API cannot filter by date; they are read newest first.
+    undated_listings: frozenset[str] = frozenset()
+
+    def __init__(
+        self,
+        client: httpx.AsyncClient,
+        limiter: RateLimiter | None = None,
+        limiter_key: str | None = None,
+        rate_per_second: float | None = None,
+        burst: float | None = None,
+    ) -> None:
+        self.client = client
+        self.limiter = limiter
+        self.limiter_key = limiter_key or self.marketplace
+        if rate_per_second is not None:
+            self.rate_per_second = rate_per_second
+        if burst is not None:
+            self.burst = burst
+
+    async def _request(self, method: str, url: str, **kwargs) -> httpx.Response:
+        for attempt in range(self.max_retries + 1):
+            if self.limiter is not None:
+                await self.limiter.acquire(
+                    self.limiter_key, self.rate_per_second, self.burst, scope=self.marketplace
+                )
+            response = await self.client.request(method, url, **kwargs)
+            if response.status_code != 429 or attempt == self.max_retries:
+                break
+            retry_after = parse_retry_after(response.headers.get("Retry-After"))
+            if self.limiter is not None:
+                await self.limiter.penalize(self.limiter_key, retry_after, scope=self.marketplace)
+            else:
+                await asyncio.sleep(retry_after)
+        response.raise_for_status()
+        return response
+
+    @abstractmethod
+    def iter_reviews(
+        self,
+        *,
+        since: datetime | None = None,
+        until: datetime | None = None,
+        page_token: str | None = None,
+    ) -> AsyncIterator[Page[MarketplaceReview]]:
+        """Yield pages of reviews created in ``[since, until)``, starting at ``page_token``."""
+
+    @abstractmethod
+    def iter_questions(
+        self,
+        *,
+        since: datetime | None = None,
+        until: datetime | None = None,
+        page_token: str | None = None,
+    ) -> AsyncIterator[Page[MarketplaceQuestion]]:
+        """Yield pages of questions created in ``[since, until)``, starting at ``page_token``."""
+
+    async def fetch_reviews(
+        self, *, since: datetime | None = None
+    ) -> list[MarketplaceReview]:
+        """Return all normalized reviews created at or after ``since``."""
+        return [review async for page in self.iter_reviews(since=since) for review in page.items]
+
+    async def fetch_questions(
+        self, *, since: datetime | None = None
+    ) -> list[MarketplaceQuestion]:
+        """Return all normalized questions created at or after ``since``."""
+        return [question async for page in self.iter_questions(since=since) for question in page.items]
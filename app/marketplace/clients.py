@@ -1,14 +1,21 @@
 from __future__ import annotations
 
-from datetime import datetime
+import logging
+from datetime import datetime, timezone
+from typing import Any, AsyncIterator, Callable, Mapping
 
-from app.marketplace.base import MarketplaceClient
+import httpx
+
+from app.marketplace.base import AsyncMarketplaceClient, MarketplaceClient
 from app.marketplace.models import (
     MarketplaceActionResult,
     MarketplaceQuestion,
     MarketplaceReview,
+    Page,
 )
 
+logger = logging.getLogger(__name__)
+
 
 class WBClient(MarketplaceClient):
     """Wildberries marketplace client stub."""
@@ -52,3 +59,285 @@ class OzonClient(MarketplaceClient):
         self, *, question_id: str, text: str
     ) -> MarketplaceActionResult:
         raise NotImplementedError("OzonClient.send_question_answer is not implemented yet")
+
+
+WB_API_URL = "https://feedbacks-api.wildberries.ru"
+OZON_API_URL = "https://api-seller.ozon.ru"
+
+
+def parse_datetime(value: str | None) -> datetime | None:
+    """Parse marketplace ISO timestamps into naive UTC, the way the models store them."""
+    if not value:
+        return None
+    parsed = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+    return parsed
+
+
+def _is_newer(created_at: datetime | None, since: datetime | None) -> bool:
+    return since is None or created_at is None or created_at >= since
+
+
+def _is_older(created_at: datetime | None, until: datetime | None) -> bool:
+    return until is None or created_at is None or created_at < until
+
+
+def _unix(value: datetime) -> int:
+    return int(value.replace(tzinfo=timezone.utc).timestamp())
+
+
+def parse_wb_review(item: Mapping[str, Any]) -> MarketplaceReview:
+    product = item.get("productDetails") or {}
+    nm_id = product.get("nmId")
+    return MarketplaceReview(
+        marketplace_review_id=str(item["id"]),
+        text=item.get("text") or "",
+        rating=item.get("productValuation"),
+        created_at=parse_datetime(item.get("createdDate")),
+        sku=str(nm_id) if nm_id is not None else None,
+        raw_payload=item,
+    )
+
+
+def parse_wb_question(item: Mapping[str, Any]) -> MarketplaceQuestion:
+    product = item.get("productDetails") or {}
+    nm_id = product.get("nmId")
+    return MarketplaceQuestion(
+        marketplace_question_id=str(item["id"]),
+        text=item.get("text") or "",
+        created_at=parse_datetime(item.get("createdDate")),
+        sku=str(nm_id) if nm_id is not None else None,
+        raw_payload=item,
+    )
+
+
+def parse_ozon_review(item: Mapping[str, Any]) -> MarketplaceReview:
+    sku = item.get("sku")
+    return MarketplaceReview(
+        marketplace_review_id=str(item["id"]),
+        text=item.get("text") or "",
+        rating=item.get("rating"),
+        created_at=parse_datetime(item.get("published_at")),
+        sku=str(sku) if sku is not None else None,
+        raw_payload=item,
+    )
+
+
+def parse_ozon_question(item: Mapping[str, Any]) -> MarketplaceQuestion:
+    sku = item.get("sku")
+    return MarketplaceQuestion(
+        marketplace_question_id=str(item["id"]),
+        text=item.get("text") or "",
+        created_at=parse_datetime(item.get("published_at")),
+        sku=str(sku) if sku is not None else None,
+        raw_payload=item,
+    )
+
+
+def _wb_id(item: Any) -> str:
+    return str(item.raw_payload.get("id"))
+
+
+def _wb_cursor(page_token: str | None, since: datetime | None) -> tuple[int | None, frozenset[str], int]:
+    """(dateFrom, ids already returned for that second, skip) to resume from."""
+    if page_token and ":" in page_token:
+        date_from, _, ids = page_token.partition(":")
+        return int(date_from), frozenset(filter(None, ids.split(","))), 0
+    return (_unix(since) if since is not None else None), frozenset(), int(page_token or 0)
+
+
+def _wb_next_cursor(items: list, date_from: int | None, seen: frozenset[str]) -> tuple[int | None, frozenset[str]]:
+    """The cursor after ``items``: their last creation second and the ids returned for it."""
+    stamps = [(_unix(item.created_at), _wb_id(item)) for item in items if item.created_at is not None]
+    if not stamps:
+        return date_from, seen
+    last = max(stamp for stamp, _ in stamps)
+    ids = {item_id for stamp, item_id in stamps if stamp == last}
+    return last, frozenset(ids | seen if last == date_from else ids)
+
+
+class AsyncWBClient(AsyncMarketplaceClient):
+    """Wildberries feedbacks/questions API over a shared ``httpx.AsyncClient``.
+
+    Pages are requested oldest first and keyed by date, since answering a
+    review removes it from the ``isAnswered=false`` listing and would shift
+    any later offset. The page token is ``<unix ts>:<id>,<id>...``: the
+    creation second of the last item seen, from which the next page starts,
+    and the ids already returned for that second. A bare number is an
+    offset token from before.
+    """
+
+    marketplace = "WB"
+    rate_per_second = 3.0
+    burst = 6.0
+    page_size = 1000
+
+    def __init__(
+        self,
+        api_token: str,
+        client: httpx.AsyncClient,
+        base_url: str = WB_API_URL,
+        **limits: Any,
+    ) -> None:
+        super().__init__(client, **limits)
+        self.api_token = api_token
+        self.base_url = base_url.rstrip("/")
+
+    async def _pages(
+        self,
+        path: str,
+        key: str,
+        parse: Callable[[Mapping[str, Any]], Any],
+        since: datetime | None,
+        until: datetime | None,
+        page_token: str | None,
+    ) -> AsyncIterator[Page]:
+        date_from, seen, skip = _wb_cursor(page_token, since)
+        while True:
+            params: dict[str, Any] = {
+                "isAnswered": "false",
+                "take": self.page_size,
+                "skip": skip,
+                "order": "dateAsc",
+            }
+            if date_from is not None:
+                params["dateFrom"] = date_from
+            if until is not None:
+                params["dateTo"] = _unix(until)
+            response = await self._request(
+                "GET",
+                f"{self.base_url}{path}",
+                params=params,
+                headers={"Authorization": self.api_token},
+            )
+            items = [parse(item) for item in (response.json().get("data") or {}).get(key) or []]
+            has_next = len(items) >= self.page_size
+            fresh = [item for item in items if _wb_id(item) not in seen]
+            if has_next and date_from is not None and not fresh:
+                # A full page of one second that was already returned: move past it instead of looping.
+                logger.warning(
+                    "More than %s WB items created at %s; skipping the rest of that second", self.page_size, date_from
+                )
+                date_from, seen = date_from + 1, frozenset()
+            else:
+                date_from, seen = _wb_next_cursor(fresh, date_from, seen)
+            skip = skip + len(items) if date_from is None else 0
+            parsed = [
+                item for item in fresh if _is_newer(item.created_at, since) and _is_older(item.created_at, until)
+            ]
+            if not has_next:
+                token = None
+            elif date_from is None:
+                token = str(skip)
+            else:
+                token = f"{date_from}:{','.join(sorted(seen))}"
+            yield Page(parsed, token)
+            if not has_next:
+                return
+
+    def iter_reviews(
+        self,
+        *,
+        since: datetime | None = None,
+        until: datetime | None = None,
+        page_token: str | None = None,
+    ) -> AsyncIterator[Page[MarketplaceReview]]:
+        return self._pages("/api/v1/feedbacks", "feedbacks", parse_wb_review, since, until, page_token)
+
+    def iter_questions(
+        self,
+        *,
+        since: datetime | None = None,
+        until: datetime | None = None,
+        page_token: str | None = None,
+    ) -> AsyncIterator[Page[MarketplaceQuestion]]:
+        return self._pages("/api/v1/questions", "questions", parse_wb_question, since, until, page_token)
+
+
+class AsyncOzonClient(AsyncMarketplaceClient):
+    """Ozon Seller API reviews/questions over a shared ``httpx.AsyncClient``.
+
+    The cabinet token is stored as ``<client_id>:<api_key>``; the page token
+    is Ozon's ``last_id`` cursor. Reviews have no date filter, so they are
+    listed newest first, those at or after ``until`` are skipped and iteration
+    stops at the first one older than ``since``.
+    """
+
+    marketplace = "OZON"
+    rate_per_second = 5.0
+    burst = 10.0
+    page_size = 100
+    undated_listings = frozenset({"reviews"})
+
+    def __init__(
+        self,
+        api_token: str,
+        client: httpx.AsyncClient,
+        base_url: str = OZON_API_URL,
+        **limits: Any,
+    ) -> None:
+        super().__init__(client, **limits)
+        client_id, _, api_key = api_token.partition(":")
+        self.headers = {"Client-Id": client_id, "Api-Key": api_key}
+        self.base_url = base_url.rstrip("/")
+
+    async def _post(self, path: str, payload: dict) -> dict:
+        response = await self._request(
+            "POST", f"{self.base_url}{path}", json=payload, headers=self.headers
+        )
+        return response.json()
+
+    async def iter_reviews(
+        self,
+        *,
+        since: datetime | None = None,
+        until: datetime | None = None,
+        page_token: str | None = None,
+    ) -> AsyncIterator[Page[MarketplaceReview]]:
+        last_id = page_token or ""
+        while True:
+            data = await self._post(
+                "/v1/review/list",
+                {"limit": self.page_size, "sort_dir": "DESC", "status": "ALL", "last_id": last_id},
+            )
+            reviews = [parse_ozon_review(item) for item in data.get("reviews") or []]
+            fresh = [review for review in reviews if _is_newer(review.created_at, since)]
+            last_id = data.get("last_id") or ""
+            has_next = bool(data.get("has_next")) and bool(last_id) and len(fresh) == len(reviews)
+            yield Page(
+                [review for review in fresh if _is_older(review.created_at, until)],
+                last_id if has_next else None,
+            )
+            if not has_next:
+                return
+
+    async def iter_questions(
+        self,
+        *,
+        since: datetime | None = None,
+        until: datetime | None = None,
+        page_token: str | None = None,
+    ) -> AsyncIterator[Page[MarketplaceQuestion]]:
+        last_id = page_token or ""
+        while True:
+            payload: dict[str, Any] = {"filter": {"status": "ALL"}, "last_id": last_id}
+            if since is not None:
+                payload["filter"]["date_from"] = since.isoformat() + "Z"
+            if until is not None:
+                payload["filter"]["date_to"] = until.isoformat() + "Z"
+            data = await self._post("/v1/question/list", payload)
+            items = data.get("questions") or []
+            questions = [parse_ozon_question(item) for item in items]
+            last_id = data.get("last_id") or ""
+            has_next = bool(items) and bool(last_id)
+            yield Page(
+                [
+                    question
+                    for question in questions
+                    if _is_newer(question.created_at, since) and _is_older(question.created_at, until)
+                ],
+                last_id if has_next else None,
+            )
+            if not has_next:
+                return
@@ -2,10 +2,11 @@ from __future__ import annotations
 
 from dataclasses import dataclass
 from datetime import datetime
-from typing import Any, Mapping
+from typing import Any, Generic, Mapping, TypeVar
 
 
 RawPayload = Mapping[str, Any]
+T = TypeVar("T")
 
 
 @dataclass(frozen=True)
@@ -33,3 +34,11 @@ class MarketplaceActionResult:
     external_id: str | None
     raw_request: RawPayload
     raw_response: RawPayload
+
+
+@dataclass(frozen=True)
+class Page(Generic[T]):
+    """One page of a listing; ``next_token`` resumes right after it (``None`` on the last page)."""
+
+    items: list[T]
+    next_token: str | None
@@ -0,0 +1,210 @@
+from __future__ import annotations
+
+import asyncio
+import bisect
+import math
+import time
+from dataclasses import dataclass, field
+from email.utils import parsedate_to_datetime
+from typing import Awaitable, Callable
+
+WAIT_BUCKETS = (0.0, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, math.inf)
+
+RESERVE_SCRIPT = """
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local now = tonumber(ARGV[1])
+local rate = tonumber(ARGV[2])
+local burst = tonumber(ARGV[3])
+local tokens = tonumber(state[1]) or burst
+local ts = tonumber(state[2]) or now
+tokens = math.min(burst, tokens + math.max(0, now - ts) * rate / 1000) - 1
+ts = math.max(ts, now)
+local wait = math.max(0, ts - now - tokens * 1000 / rate)
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'ts', tostring(ts))
+redis.call('PEXPIRE', KEYS[1], math.ceil(wait + burst * 1000 / rate) + 1000)
+return math.ceil(wait)
+"""
+
+PENALIZE_SCRIPT = """
+local now = tonumber(ARGV[1])
+local until_ms = now + tonumber(ARGV[2])
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = math.min(tonumber(state[1]) or 1, 1)
+local ts = math.max(tonumber(state[2]) or now, until_ms)
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'ts', tostring(ts))
+redis.call('PEXPIRE', KEYS[1], math.ceil(ts - now) + 60000)
+return ts
+"""
+
+
+def parse_retry_after(value: str | None, default: float = 1.0) -> float:
+    """Seconds to back off from a ``Retry-After`` header (delta-seconds or HTTP date)."""
+    if not value:
+        return default
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return default
+
+
+@dataclass
+class WaitStats:
+    count: int = 0
+    total: float = 0.0
+    max: float = 0.0
+    throttled: int = 0
+    buckets: list[int] = field(default_factory=lambda: [0] * len(WAIT_BUCKETS))
+
+
+class WaitMetrics:
+    """Queue wait time per limiter scope (e.g. marketplace), as a cumulative histogram."""
+
+    def __init__(self) -> None:
+        self._stats: dict[str, WaitStats] = {}
+
+    def _get(self, scope: str) -> WaitStats:
+        return self._stats.setdefault(scope, WaitStats())
+
+    def observe(self, scope: str, seconds: float) -> None:
+        stats = self._get(scope)
+        stats.count += 1
+        stats.total += seconds
+        stats.max = max(stats.max, seconds)
+        stats.buckets[bisect.bisect_left(WAIT_BUCKETS, seconds)] += 1
+
+    def throttled(self, scope: str) -> None:
+        self._get(scope).throttled += 1
+
+    def snapshot(self) -> dict:
+        result = {}
+        for scope, stats in self._stats.items():
+            cumulative, histogram = 0, {}
+            for bound, count in zip(WAIT_BUCKETS, stats.buckets):
+                cumulative += count
+                histogram["+Inf" if math.isinf(bound) else str(bound)] = cumulative
+            result[scope] = {
+                "count": stats.count,
+                "wait_seconds_total": round(stats.total, 6),
+                "wait_seconds_max": round(stats.max, 6),
+                "throttled": stats.throttled,
+                "wait_seconds_bucket": histogram,
+            }
+        return result
+
+
+class LocalTokenBucket:
+    """In-process token buckets keyed by cabinet; callers reserve a token and sleep off any deficit.
+
+    Reservations are computed without awaiting, so concurrent coroutines on
+    one event loop queue up fairly without a lock. A bucket refills from its
+    timestamp on, and a penalty moves the timestamp to the end of the block,
+    so callers queued during a block go out ``1 / rate`` apart after it.
+    """
+
+    def __init__(
+        self,
+        metrics: WaitMetrics | None = None,
+        clock: Callable[[], float] = time.monotonic,
+        sleep: Callable[[float], Awaitable[None]] = asyncio.sleep,
+    ) -> None:
+        self.metrics = metrics or WaitMetrics()
+        self.clock = clock
+        self.sleep = sleep
+        self._state: dict[str, tuple[float, float]] = {}
+
+    def reserve(self, key: str, rate: float, burst: float) -> float:
+        now = self.clock()
+        tokens, updated = self._state.get(key, (burst, now))
+        tokens = min(burst, tokens + max(0.0, now - updated) * rate) - 1
+        updated = max(updated, now)
+        self._state[key] = (tokens, updated)
+        return max(0.0, updated - now - tokens / rate)
+
+    async def acquire(self, key: str, rate: float, burst: float, scope: str = "default") -> float:
+        wait = self.reserve(key, rate, burst)
+        self.metrics.observe(scope, wait)
+        if wait:
+            await self.sleep(wait)
+        return wait
+
+    async def penalize(self, key: str, retry_after: float, scope: str = "default") -> None:
+        """Block the bucket for ``retry_after`` seconds (a 429 was seen), leaving one token for the end of the block."""
+        now = self.clock()
+        tokens, updated = self._state.get(key, (1.0, now))
+        self._state[key] = (min(tokens, 1.0), max(updated, now + retry_after))
+        self.metrics.throttled(scope)
+
+
+class RedisTokenBucket:
+    """The same buckets in Redis, updated atomically by Lua, shared by every polling worker."""
+
+    def __init__(
+        self,
+        redis,
+        metrics: WaitMetrics | None = None,
+        prefix: str = "ratelimit",
+        clock: Callable[[], float] = time.time,
+        sleep: Callable[[float], Awaitable[None]] = asyncio.sleep,
+    ) -> None:
+        self.redis = redis
+        self.metrics = metrics or WaitMetrics()
+        self.prefix = prefix
+        self.clock = clock
+        self.sleep = sleep
+        self._reserve = redis.register_script(RESERVE_SCRIPT)
+        self._penalize = redis.register_script(PENALIZE_SCRIPT)
+
+    def _key(self, key: str) -> str:
+        return f"{self.prefix}:{key}"
+
+    async def acquire(self, key: str, rate: float, burst: float, scope: str = "default") -> float:
+        wait_ms = await self._reserve(
+            keys=[self._key(key)], args=[int(self.clock() * 1000), rate, burst]
+        )
+        wait = int(wait_ms) / 1000
+        self.metrics.observe(scope, wait)
+        if wait:
+            await self.sleep(wait)
+        return wait
+
+    async def penalize(self, key: str, retry_after: float, scope: str = "default") -> None:
+        await self._penalize(
+            keys=[self._key(key)], args=[int(self.clock() * 1000), int(retry_after * 1000)]
+        )
+        self.metrics.throttled(scope)
+
+
+class SubBudget:
+    """A limiter that charges every call to its own slower bucket before the shared one.
+
+    Background work such as the history backfill draws from a cabinet's
+    shared quota together with live polling, but never more than ``rate``
+    of it.
+    """
+
+    def __init__(
+        self, limiter: LocalTokenBucket | RedisTokenBucket, key: str, rate: float, burst: float, name: str = "backfill"
+    ) -> None:
+        self.limiter = limiter
+        self.key = key
+        self.rate = rate
+        self.burst = burst
+        self.name = name
+
+    @property
+    def metrics(self) -> WaitMetrics:
+        return self.limiter.metrics
+
+    async def acquire(self, key: str, rate: float, burst: float, scope: str = "default") -> float:
+        waited = await self.limiter.acquire(self.key, self.rate, self.burst, scope=f"{scope}:{self.name}")
+        return waited + await self.limiter.acquire(key, rate, burst, scope=scope)
+
+    async def penalize(self, key: str, retry_after: float, scope: str = "default") -> None:
+        await self.limiter.penalize(key, retry_after, scope=scope)
+
+
+RateLimiter = LocalTokenBucket | RedisTokenBucket | SubBudget
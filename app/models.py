@@ -1,7 +1,7 @@
 from datetime import datetime
 from enum import Enum
 
-from sqlalchemy import Boolean, Column, DateTime, ForeignKey, Integer, String, Text, JSON
+from sqlalchemy import Boolean, Column, DateTime, ForeignKey, Index, Integer, String, Text, JSON, UniqueConstraint
 from sqlalchemy.orm import relationship
 
 from app.db import Base
@@ -42,6 +42,8 @@ class Project(Base):
     id = Column(Integer, primary_key=True)
     owner_id = Column(Integer, ForeignKey("users.id"), nullable=False)
     name = Column(String, nullable=False)
+    tone_description = Column(Text, nullable=True)
+    kb_version = Column(Integer, default=0, nullable=False)
     created_at = Column(DateTime, default=datetime.utcnow)
 
     owner = relationship("User")
@@ -66,8 +68,39 @@ class Cabinet(Base):
     name = Column(String, nullable=False)
     api_token_encrypted = Column(Text, nullable=False)
     api_token_masked = Column(String, nullable=False)
+    reviews_since = Column(DateTime, nullable=True)
+    questions_since = Column(DateTime, nullable=True)
+    last_polled_at = Column(DateTime, nullable=True)
+    last_webhook_at = Column(DateTime, nullable=True)
     created_at = Column(DateTime, default=datetime.utcnow)
 
+    backfill = relationship("CabinetBackfill", uselist=False, lazy="selectin", back_populates="cabinet")
+
+
+class CabinetBackfill(Base):
+    """Import of a cabinet's history up to its creation, walked in windows from ``start_at``.
+
+    ``checkpoint`` maps a listing ("reviews"/"questions") to the page token to
+    resume the current window from; ``None`` marks the listing as finished.
+    """
+
+    __tablename__ = "cabinet_backfills"
+
+    id = Column(Integer, primary_key=True)
+    cabinet_id = Column(Integer, ForeignKey("cabinets.id"), nullable=False, unique=True)
+    status = Column(String, default="pending", nullable=False)
+    start_at = Column(DateTime, nullable=False)
+    end_at = Column(DateTime, nullable=False)
+    cursor_at = Column(DateTime, nullable=False)
+    checkpoint = Column(JSON, default=dict, nullable=False)
+    progress = Column(Integer, default=0, nullable=False)
+    imported = Column(Integer, default=0, nullable=False)
+    error = Column(Text, nullable=True)
+    leased_until = Column(DateTime, nullable=True)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    cabinet = relationship("Cabinet", back_populates="backfill")
+
 
 class SKUMap(Base):
     __tablename__ = "sku_maps"
@@ -93,8 +126,30 @@ class KBRule(Base):
     created_at = Column(DateTime, default=datetime.utcnow)
 
 
+class KBRuleConflict(Base):
+    """A pair of rules that contradict each other, stored once with ``rule_id < other_rule_id``."""
+
+    __tablename__ = "kb_rule_conflicts"
+    __table_args__ = (UniqueConstraint("rule_id", "other_rule_id", name="uq_kb_rule_conflicts_pair"),)
+
+    id = Column(Integer, primary_key=True)
+    project_id = Column(Integer, ForeignKey("projects.id"), nullable=False, index=True)
+    rule_id = Column(Integer, ForeignKey("kb_rules.id", ondelete="CASCADE"), nullable=False)
+    other_rule_id = Column(Integer, ForeignKey("kb_rules.id", ondelete="CASCADE"), nullable=False, index=True)
+
+
 class Event(Base):
     __tablename__ = "events"
+    __table_args__ = (
+        UniqueConstraint(
+            "cabinet_id",
+            "marketplace",
+            "marketplace_event_id",
+            name="uq_events_cabinet_marketplace_event",
+        ),
+        Index("ix_events_project_status_created_id", "project_id", "status", "created_at", "id"),
+        Index("ix_events_project_created_id", "project_id", "created_at", "id"),
+    )
 
     id = Column(Integer, primary_key=True)
     project_id = Column(Integer, ForeignKey("projects.id"), nullable=False)
@@ -113,10 +168,45 @@ class Event(Base):
     confidence = Column(Integer, nullable=True)
     kb_rule_ids = Column(JSON, nullable=True)
     conflict = Column(Boolean, default=False)
+    prompt_tokens = Column(Integer, nullable=True)
+    generation_error = Column(Text, nullable=True)
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow)
 
 
+class EventCounter(Base):
+    __tablename__ = "event_counters"
+    __table_args__ = (
+        UniqueConstraint(
+            "project_id",
+            "status",
+            "sentiment",
+            "event_type",
+            name="uq_event_counters_dimensions",
+        ),
+    )
+
+    id = Column(Integer, primary_key=True)
+    project_id = Column(Integer, ForeignKey("projects.id"), nullable=False)
+    status = Column(String, nullable=False)
+    sentiment = Column(String, nullable=False, default="")
+    event_type = Column(String, nullable=False)
+    count = Column(Integer, nullable=False, default=0)
+
+
+class WebhookInbox(Base):
+    __tablename__ = "webhook_inbox"
+    __table_args__ = (Index("ix_webhook_inbox_pending", "processed_at", "id"),)
+
+    id = Column(Integer, primary_key=True)
+    cabinet_id = Column(Integer, ForeignKey("cabinets.id"), nullable=False)
+    marketplace = Column(String, nullable=False)
+    payload = Column(JSON, nullable=False)
+    error = Column(Text, nullable=True)
+    received_at = Column(DateTime, default=datetime.utcnow)
+    processed_at = Column(DateTime, nullable=True)
+
+
 class ProjectSettings(Base):
     __tablename__ = "project_settings"
 
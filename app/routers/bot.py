@@ -1,11 +1,40 @@
+import asyncio
+import logging
+
 from fastapi import APIRouter, Depends, HTTPException
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
 
 from app import crud, models, schemas
-from app.db import get_db
+from app.config import settings
+from app.db import SessionLocal, get_db
+from app.services.generation import build_prompt
+from app.services.llm import AsyncLLMAdapter, get_async_adapter
+from app.services.prompts import Prompt
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/bot", tags=["bot"])
 
+# Regenerations outlive their request when the client disconnects; keep them referenced until done.
+_regenerations: set[asyncio.Task] = set()
+
+SCREEN_SECTIONS = {
+    "dashboard": ("dashboard",),
+    "feed": ("feed",),
+    "feed_filters": ("feed",),
+    "card": ("event",),
+    "edit": ("event",),
+    "regenerate": ("event",),
+    "kb_list": ("kb_rules",),
+    "kb_delete": ("kb_rules",),
+    "cabinets": ("cabinets",),
+    "onboarding": ("onboarding",),
+    "project_settings": ("settings",),
+    "balance": ("balance",),
+}
+
 
 def _get_user(db: Session, tg_user_id: int):
     return crud.get_or_create_user(db, str(tg_user_id))
@@ -18,9 +47,7 @@ def _get_project(db: Session, project_id: int, user_id: int):
     return project
 
 
-@router.get("/profile/{tg_user_id}", response_model=schemas.ProfileOut)
-def profile(tg_user_id: int, db: Session = Depends(get_db)):
-    user = _get_user(db, tg_user_id)
+def _profile_payload(user: models.User) -> dict:
     return {
         "user_id": user.id,
         "telegram_user_id": user.telegram_user_id,
@@ -28,24 +55,163 @@ def profile(tg_user_id: int, db: Session = Depends(get_db)):
     }
 
 
+def _dashboard_payload(db: Session, user: models.User, project_id: int) -> dict:
+    counts = crud.count_event_statuses(db, project_id)
+    balance = crud.get_balance(db, user.id)
+    return {
+        "new": counts["new"],
+        "without_answer": counts["without_answer"],
+        "escalated": counts["escalated"],
+        "balance_tokens": balance.tokens,
+    }
+
+
+def _feed_payload(
+    db: Session,
+    project_id: int,
+    status: str | None,
+    sentiment: str | None,
+    internal_sku: str | None,
+    limit: int,
+    offset: int,
+    cursor: str | None,
+    without_answer: bool,
+) -> dict:
+    status_filter = crud.WITHOUT_ANSWER_STATUSES if without_answer else status
+    try:
+        events, next_cursor = crud.list_events_page(
+            db,
+            project_id,
+            status=status_filter,
+            sentiment=sentiment,
+            internal_sku=internal_sku,
+            limit=limit,
+            offset=offset,
+            cursor=cursor,
+        )
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc)) from exc
+    total = crud.count_events(
+        db,
+        project_id,
+        status=status_filter,
+        sentiment=sentiment,
+        internal_sku=internal_sku,
+    )
+    return {
+        "items": events,
+        "total": total,
+        "limit": limit,
+        "offset": offset,
+        "next_cursor": next_cursor,
+    }
+
+
+def _event_payload(db: Session, event: models.Event) -> dict:
+    kb_sources = []
+    if event.kb_rule_ids:
+        rules = crud.list_kb_rules_by_ids(db, list(event.kb_rule_ids), event.project_id)
+        kb_sources = [rule.text for rule in rules]
+    payload = schemas.EventOut.model_validate(event).model_dump()
+    payload["kb_sources"] = kb_sources
+    return payload
+
+
+def _kb_rules_payload(db: Session, project_id: int, scope: str | None, limit: int):
+    rules = crud.list_kb_rules(db, project_id)
+    if scope == "project":
+        rules = [rule for rule in rules if not rule.internal_sku]
+    if scope == "sku":
+        rules = [rule for rule in rules if rule.internal_sku]
+    rules = sorted(rules, key=lambda item: item.created_at, reverse=True)
+    return rules[:limit]
+
+
+def _onboarding_payload(db: Session, project_id: int) -> dict:
+    cabinets = crud.list_cabinets(db, project_id)
+    return {
+        "has_cabinets": bool(cabinets),
+        "cabinets_count": len(cabinets),
+    }
+
+
+def _balance_payload(db: Session, user: models.User) -> dict:
+    balance = crud.get_balance(db, user.id)
+    ledger = crud.list_token_ledger(db, user.id)
+    return {
+        "owner_id": balance.owner_id,
+        "tokens": balance.tokens,
+        "ledger": ledger,
+    }
+
+
+@router.get("/profile/{tg_user_id}", response_model=schemas.ProfileOut)
+def profile(tg_user_id: int, db: Session = Depends(get_db)):
+    return _profile_payload(_get_user(db, tg_user_id))
+
+
 @router.get("/projects/{tg_user_id}", response_model=list[schemas.ProjectOut])
 def list_projects(tg_user_id: int, db: Session = Depends(get_db)):
     user = _get_user(db, tg_user_id)
     return crud.list_projects_for_user(db, user.id)
 
 
+@router.get("/screen/{tg_user_id}", response_model=schemas.ScreenOut)
+def screen(
+    tg_user_id: int,
+    action: str,
+    project_id: int | None = None,
+    event_id: int | None = None,
+    status: str | None = None,
+    sentiment: str | None = None,
+    internal_sku: str | None = None,
+    limit: int = 10,
+    offset: int = 0,
+    cursor: str | None = None,
+    without_answer: bool = False,
+    scope: str | None = None,
+    db: Session = Depends(get_db),
+):
+    user = _get_user(db, tg_user_id)
+    projects = crud.list_projects_for_user(db, user.id)
+    project_ids = {project.id for project in projects}
+    payload = {"profile": _profile_payload(user), "projects": projects}
+    sections = SCREEN_SECTIONS.get(action, ())
+    if "event" in sections:
+        if event_id is not None:
+            event = db.get(models.Event, event_id)
+            if not event or event.project_id not in project_ids:
+                raise HTTPException(status_code=404, detail="Event not found")
+            payload["event"] = _event_payload(db, event)
+        return payload
+    if not sections or project_id is None:
+        return payload
+    if project_id not in project_ids:
+        raise HTTPException(status_code=404, detail="Project not found")
+    if "dashboard" in sections:
+        payload["dashboard"] = _dashboard_payload(db, user, project_id)
+    if "feed" in sections:
+        payload["feed"] = _feed_payload(
+            db, project_id, status, sentiment, internal_sku, limit, offset, cursor, without_answer
+        )
+    if "kb_rules" in sections:
+        payload["kb_rules"] = _kb_rules_payload(db, project_id, scope, limit)
+    if "cabinets" in sections:
+        payload["cabinets"] = crud.list_cabinets(db, project_id)
+    if "onboarding" in sections:
+        payload["onboarding"] = _onboarding_payload(db, project_id)
+    if "settings" in sections:
+        payload["settings"] = crud.get_settings(db, project_id)
+    if "balance" in sections:
+        payload["balance"] = _balance_payload(db, user)
+    return payload
+
+
 @router.get("/projects/{tg_user_id}/{project_id}/dashboard", response_model=schemas.DashboardOut)
 def project_dashboard(tg_user_id: int, project_id: int, db: Session = Depends(get_db)):
     user = _get_user(db, tg_user_id)
     _get_project(db, project_id, user.id)
-    counts = crud.count_event_statuses(db, project_id)
-    balance = crud.get_balance(db, user.id)
-    return {
-        "new": counts["new"],
-        "without_answer": counts["without_answer"],
-        "escalated": counts["escalated"],
-        "balance_tokens": balance.tokens,
-    }
+    return _dashboard_payload(db, user, project_id)
 
 
 @router.get("/projects/{tg_user_id}/{project_id}/feed", response_model=schemas.FeedOut)
@@ -57,52 +223,15 @@ def project_feed(
     internal_sku: str | None = None,
     limit: int = 10,
     offset: int = 0,
+    cursor: str | None = None,
     without_answer: bool = False,
     db: Session = Depends(get_db),
 ):
     user = _get_user(db, tg_user_id)
     _get_project(db, project_id, user.id)
-    if without_answer:
-        status_filter = ["new", "drafted", "approved"]
-        events = crud.list_events(
-            db,
-            project_id,
-            status=status_filter,
-            sentiment=sentiment,
-            internal_sku=internal_sku,
-            limit=limit,
-            offset=offset,
-        )
-        total = crud.count_events(
-            db,
-            project_id,
-            status=status_filter,
-            sentiment=sentiment,
-            internal_sku=internal_sku,
-        )
-    else:
-        events = crud.list_events(
-            db,
-            project_id,
-            status=status,
-            sentiment=sentiment,
-            internal_sku=internal_sku,
-            limit=limit,
-            offset=offset,
-        )
-        total = crud.count_events(
-            db,
-            project_id,
-            status=status,
-            sentiment=sentiment,
-            internal_sku=internal_sku,
-        )
-    return {
-        "items": events,
-        "total": total,
-        "limit": limit,
-        "offset": offset,
-    }
+    return _feed_payload(
+        db, project_id, status, sentiment, internal_sku, limit, offset, cursor, without_answer
+    )
 
 
 @router.get("/events/{tg_user_id}/{event_id}", response_model=schemas.EventDetailOut)
@@ -112,13 +241,82 @@ def event_detail(tg_user_id: int, event_id: int, db: Session = Depends(get_db)):
     if not event:
         raise HTTPException(status_code=404, detail="Event not found")
     _get_project(db, event.project_id, user.id)
-    kb_sources = []
-    if event.kb_rule_ids:
-        rules = crud.list_kb_rules_by_ids(db, list(event.kb_rule_ids))
-        kb_sources = [rule.text for rule in rules]
-    payload = schemas.EventOut.model_validate(event).model_dump()
-    payload["kb_sources"] = kb_sources
-    return payload
+    return _event_payload(db, event)
+
+
+def _regenerate_target(db: Session, tg_user_id: int, event_id: int) -> tuple[int, Prompt]:
+    user = _get_user(db, tg_user_id)
+    event = db.get(models.Event, event_id)
+    if not event:
+        raise HTTPException(status_code=404, detail="Event not found")
+    _get_project(db, event.project_id, user.id)
+    return event.project_id, build_prompt(db, event, settings.kb_top_k)
+
+
+def _save_regenerated(event_id: int, text: str, prompt_tokens: int) -> None:
+    """Store the streamed reply; runs after the response started, when the request's session is closed."""
+    db = SessionLocal()
+    try:
+        event = db.get(models.Event, event_id)
+        event.suggested_reply = text
+        event.prompt_tokens = prompt_tokens
+        event.generation_error = None
+        if event.status == "new":
+            crud.set_event_status(db, event, "drafted")
+        db.commit()
+    finally:
+        db.close()
+
+
+@router.post("/events/{tg_user_id}/{event_id}/regenerate")
+async def regenerate_reply(
+    tg_user_id: int,
+    event_id: int,
+    db: Session = Depends(get_db),
+    llm: AsyncLLMAdapter = Depends(get_async_adapter),
+):
+    """Stream a freshly generated reply as plain text chunks, then store it as the draft."""
+    project_id, prompt = await run_in_threadpool(_regenerate_target, db, tg_user_id, event_id)
+    queue: asyncio.Queue[str | None] = asyncio.Queue()
+    task = asyncio.create_task(_regenerate(llm, event_id, project_id, prompt, queue))
+    _regenerations.add(task)
+    task.add_done_callback(_regenerations.discard)
+
+    async def chunks():
+        while (chunk := await queue.get()) is not None:
+            yield chunk
+
+    return StreamingResponse(chunks(), media_type="text/plain; charset=utf-8")
+
+
+async def _regenerate(
+    llm: AsyncLLMAdapter, event_id: int, project_id: int, prompt: Prompt, queue: asyncio.Queue
+) -> None:
+    """Generate into ``queue`` within ``llm.timeout`` and save the draft, whether or not anyone still reads it."""
+    parts: list[str] = []
+
+    async def collect() -> None:
+        async for chunk in llm.stream(prompt.text, project_id=project_id):
+            parts.append(chunk)
+            queue.put_nowait(chunk)
+
+    try:
+        await asyncio.wait_for(collect(), llm.timeout)
+    except Exception as exc:
+        logger.warning("Regenerating event %s failed", event_id, exc_info=True)
+        await run_in_threadpool(_fail_regenerated, event_id, repr(exc))
+    else:
+        await run_in_threadpool(_save_regenerated, event_id, "".join(parts), prompt.tokens)
+    finally:
+        queue.put_nowait(None)
+
+
+def _fail_regenerated(event_id: int, error: str) -> None:
+    db = SessionLocal()
+    try:
+        crud.mark_generation_failed(db, [event_id], error)
+    finally:
+        db.close()
 
 
 @router.get("/projects/{tg_user_id}/{project_id}/kb", response_model=list[schemas.KBRuleOut])
@@ -131,13 +329,7 @@ def list_kb_rules(
 ):
     user = _get_user(db, tg_user_id)
     _get_project(db, project_id, user.id)
-    rules = crud.list_kb_rules(db, project_id)
-    if scope == "project":
-        rules = [rule for rule in rules if not rule.internal_sku]
-    if scope == "sku":
-        rules = [rule for rule in rules if rule.internal_sku]
-    rules = sorted(rules, key=lambda item: item.created_at, reverse=True)
-    return rules[:limit]
+    return _kb_rules_payload(db, project_id, scope, limit)
 
 
 @router.post("/projects/{tg_user_id}/{project_id}/kb", response_model=schemas.KBRuleOut)
@@ -176,11 +368,7 @@ def list_cabinets(tg_user_id: int, project_id: int, db: Session = Depends(get_db
 def onboarding_state(tg_user_id: int, project_id: int, db: Session = Depends(get_db)):
     user = _get_user(db, tg_user_id)
     _get_project(db, project_id, user.id)
-    cabinets = crud.list_cabinets(db, project_id)
-    return {
-        "has_cabinets": bool(cabinets),
-        "cabinets_count": len(cabinets),
-    }
+    return _onboarding_payload(db, project_id)
 
 
 @router.get("/projects/{tg_user_id}/{project_id}/settings", response_model=schemas.SettingsOut)
@@ -194,10 +382,4 @@ def project_settings(tg_user_id: int, project_id: int, db: Session = Depends(get
 def project_balance(tg_user_id: int, project_id: int, db: Session = Depends(get_db)):
     user = _get_user(db, tg_user_id)
     _get_project(db, project_id, user.id)
-    balance = crud.get_balance(db, user.id)
-    ledger = crud.list_token_ledger(db, user.id)
-    return {
-        "owner_id": balance.owner_id,
-        "tokens": balance.tokens,
-        "ledger": ledger,
-    }
+    return _balance_payload(db, user)
@@ -2,6 +2,7 @@ from fastapi import APIRouter, Depends
 from sqlalchemy.orm import Session
 
 from app import crud, schemas
+from app.config import settings
 from app.db import get_db
 
 router = APIRouter(prefix="/cabinets", tags=["cabinets"])
@@ -9,7 +10,14 @@ router = APIRouter(prefix="/cabinets", tags=["cabinets"])
 
 @router.post("", response_model=schemas.CabinetOut)
 def create_cabinet(payload: schemas.CabinetCreate, db: Session = Depends(get_db)):
-    return crud.create_cabinet(db, payload.project_id, payload.marketplace, payload.name, payload.api_token)
+    return crud.create_cabinet(
+        db,
+        payload.project_id,
+        payload.marketplace,
+        payload.name,
+        payload.api_token,
+        backfill_days=settings.backfill_days,
+    )
 
 
 @router.get("/{project_id}", response_model=list[schemas.CabinetOut])
@@ -1,4 +1,4 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Response
 from sqlalchemy.orm import Session
 
 from app import crud, schemas, models
@@ -15,25 +15,40 @@ def create_event(payload: schemas.EventCreate, db: Session = Depends(get_db)):
     return event
 
 
+@router.post("/bulk", response_model=schemas.EventBulkOut)
+def create_events_bulk(payload: schemas.EventBulkCreate, db: Session = Depends(get_db)):
+    created, duplicates = crud.create_events_bulk(db, [item.model_dump() for item in payload.items])
+    return {"created": created, "duplicates": duplicates}
+
+
 @router.get("/{project_id}", response_model=list[schemas.EventOut])
 def list_events(
     project_id: int,
+    response: Response,
     status: str | None = None,
     sentiment: str | None = None,
     internal_sku: str | None = None,
     limit: int = 100,
     offset: int = 0,
+    cursor: str | None = None,
     db: Session = Depends(get_db),
 ):
-    return crud.list_events(
-        db,
-        project_id,
-        status=status,
-        sentiment=sentiment,
-        internal_sku=internal_sku,
-        limit=limit,
-        offset=offset,
-    )
+    try:
+        events, next_cursor = crud.list_events_page(
+            db,
+            project_id,
+            status=status,
+            sentiment=sentiment,
+            internal_sku=internal_sku,
+            limit=limit,
+            offset=offset,
+            cursor=cursor,
+        )
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc)) from exc
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    return events
 
 
 @router.post("/{event_id}/approve")
@@ -41,6 +56,6 @@ def approve_event(event_id: int, db: Session = Depends(get_db)):
     event = db.get(models.Event, event_id)
     if not event:
         raise HTTPException(status_code=404, detail="Not found")
-    event.status = "approved"
+    crud.set_event_status(db, event, "approved")
     db.commit()
     return {"status": event.status}
@@ -9,7 +9,7 @@ router = APIRouter(prefix="/projects", tags=["projects"])
 
 @router.post("", response_model=schemas.ProjectOut)
 def create_project(payload: schemas.ProjectCreate, db: Session = Depends(get_db)):
-    return crud.create_project(db, payload.name, payload.owner_id)
+    return crud.create_project(db, payload.name, payload.owner_id, payload.tone_description)
 
 
 @router.get("", response_model=list[schemas.ProjectOut])
@@ -0,0 +1,49 @@
+import secrets
+from typing import Any
+
+from fastapi import APIRouter, Body, Depends, Header, HTTPException
+from sqlalchemy.orm import Session
+
+from app import crud, models
+from app.config import settings
+from app.db import get_db
+
+router = APIRouter(prefix="/webhooks", tags=["webhooks"])
+
+
+def _accept(marketplace: str, cabinet_id: int, payload: Any, token: str | None, db: Session):
+    """Validate and store the raw payload; normalization happens in ``worker.tasks.process_event``.
+
+    Webhooks are refused until ``marketplace_webhook_token`` is configured.
+    """
+    if not settings.marketplace_webhook_token:
+        raise HTTPException(status_code=403, detail="Webhooks are disabled")
+    if not secrets.compare_digest(token or "", settings.marketplace_webhook_token):
+        raise HTTPException(status_code=403, detail="Invalid webhook token")
+    cabinet = db.get(models.Cabinet, cabinet_id)
+    if not cabinet or cabinet.marketplace != marketplace:
+        raise HTTPException(status_code=404, detail="Cabinet not found")
+    if not payload:
+        raise HTTPException(status_code=400, detail="Empty payload")
+    item = crud.enqueue_webhook(db, cabinet, payload)
+    return {"accepted": item.id}
+
+
+@router.post("/wb/{cabinet_id}")
+def wb_webhook(
+    cabinet_id: int,
+    payload: dict | list = Body(...),
+    x_webhook_token: str | None = Header(default=None),
+    db: Session = Depends(get_db),
+):
+    return _accept("WB", cabinet_id, payload, x_webhook_token, db)
+
+
+@router.post("/ozon/{cabinet_id}")
+def ozon_webhook(
+    cabinet_id: int,
+    payload: dict | list = Body(...),
+    x_webhook_token: str | None = Header(default=None),
+    db: Session = Depends(get_db),
+):
+    return _accept("OZON", cabinet_id, payload, x_webhook_token, db)
@@ -7,12 +7,14 @@ from pydantic import BaseModel, Field
 class ProjectCreate(BaseModel):
     name: str
     owner_id: int
+    tone_description: Optional[str] = None
 
 
 class ProjectOut(BaseModel):
     id: int
     name: str
     owner_id: int
+    tone_description: Optional[str] = None
     created_at: datetime
 
     class Config:
@@ -26,6 +28,19 @@ class CabinetCreate(BaseModel):
     api_token: str
 
 
+class BackfillOut(BaseModel):
+    status: str
+    progress: int
+    imported: int
+    start_at: datetime
+    end_at: datetime
+    cursor_at: datetime
+    error: Optional[str] = None
+
+    class Config:
+        from_attributes = True
+
+
 class CabinetOut(BaseModel):
     id: int
     project_id: int
@@ -33,6 +48,7 @@ class CabinetOut(BaseModel):
     name: str
     api_token_masked: str
     created_at: datetime
+    backfill: Optional[BackfillOut] = None
 
     class Config:
         from_attributes = True
@@ -111,6 +127,8 @@ class EventOut(BaseModel):
     confidence: Optional[int]
     kb_rule_ids: Optional[list]
     conflict: bool
+    prompt_tokens: Optional[int] = None
+    generation_error: Optional[str] = None
     created_at: datetime
     updated_at: datetime
 
@@ -118,6 +136,21 @@ class EventOut(BaseModel):
         from_attributes = True
 
 
+class EventBulkCreate(BaseModel):
+    items: List[EventCreate]
+
+
+class EventKeyOut(BaseModel):
+    cabinet_id: int
+    marketplace: str
+    marketplace_event_id: str
+
+
+class EventBulkOut(BaseModel):
+    created: List[EventOut]
+    duplicates: List[EventKeyOut]
+
+
 class SettingsOut(BaseModel):
     project_id: int
     autogen_positive: bool
@@ -171,6 +204,7 @@ class FeedOut(BaseModel):
     total: int
     limit: int
     offset: int
+    next_cursor: Optional[str] = None
 
 
 class EventDetailOut(EventOut):
@@ -200,6 +234,19 @@ class OnboardingOut(BaseModel):
     has_cabinets: bool
     cabinets_count: int
 
+
+class ScreenOut(BaseModel):
+    profile: ProfileOut
+    projects: List[ProjectOut]
+    dashboard: Optional[DashboardOut] = None
+    feed: Optional[FeedOut] = None
+    event: Optional[EventDetailOut] = None
+    kb_rules: Optional[List[KBRuleOut]] = None
+    cabinets: Optional[List[CabinetOut]] = None
+    onboarding: Optional[OnboardingOut] = None
+    settings: Optional[SettingsOut] = None
+    balance: Optional[BalanceDetailOut] = None
+
 class AdminMetricsOut(BaseModel):
     projects: int
     events: int
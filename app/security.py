@@ -25,3 +25,8 @@ def mask_token(token: str) -> str:
     if len(token) <= 4:
         return "****"
     return f"{token[:2]}***{token[-2:]}"
+
+
+def decrypt_token(token_encrypted: str) -> str:
+    fernet = get_fernet()
+    return fernet.decrypt(token_encrypted.encode("utf-8")).decode("utf-8")
@@ -0,0 +1,211 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+
+import httpx
+
+from app import crud, models
+from app.config import settings
+from app.db import SessionLocal
+from app.marketplace.ratelimit import RateLimiter, SubBudget
+from app.services.poller import (
+    PollTarget,
+    SessionFactory,
+    build_client,
+    load_targets,
+    local_rate_limiter,
+    persist_page,
+    shared_rate_limiter,
+)
+
+logger = logging.getLogger(__name__)
+
+LISTINGS = ("reviews", "questions")
+# Pages per window of budget that a listing without a date filter may read in one run.
+UNDATED_PAGES_PER_WINDOW = 5
+
+
+@dataclass
+class BackfillState:
+    backfill_id: int
+    target: PollTarget
+    start_at: datetime
+    end_at: datetime
+    cursor_at: datetime
+    checkpoint: dict
+    imported: int
+
+
+def window_progress(start_at: datetime, end_at: datetime, cursor_at: datetime) -> int:
+    """Share of the history window already imported, in whole percent."""
+    total = (end_at - start_at).total_seconds()
+    if total <= 0:
+        return 100
+    return max(0, min(100, int((cursor_at - start_at).total_seconds() * 100 // total)))
+
+
+def load_state(session_factory: SessionFactory, backfill_id: int) -> BackfillState:
+    db = session_factory()
+    try:
+        backfill = db.get(models.CabinetBackfill, backfill_id)
+        (target,) = load_targets(db, [backfill.cabinet_id])
+        return BackfillState(
+            backfill_id=backfill.id,
+            target=target,
+            start_at=backfill.start_at,
+            end_at=backfill.end_at,
+            cursor_at=backfill.cursor_at,
+            checkpoint=dict(backfill.checkpoint or {}),
+            imported=backfill.imported,
+        )
+    finally:
+        db.close()
+
+
+def save_state(session_factory: SessionFactory, backfill_id: int, **values) -> None:
+    db = session_factory()
+    try:
+        crud.update_backfill(db, backfill_id, **values)
+    finally:
+        db.close()
+
+
+async def backfill_cabinet(
+    backfill_id: int,
+    http: httpx.AsyncClient,
+    session_factory: SessionFactory = SessionLocal,
+    limiter: RateLimiter | None = None,
+    window: timedelta | None = None,
+    max_windows: int = 4,
+) -> int:
+    """Import up to ``max_windows`` windows of a cabinet's history, oldest first.
+
+    The page token is checkpointed after every page and the cursor after
+    every window, so an interrupted run resumes mid-window; a page stored
+    twice is dropped by the event dedupe constraint. Listings the client can
+    only read newest first (Ozon reviews) are instead read in one pass over
+    the whole history, checkpointed under ``<listing>:all``. Calls draw from
+    the cabinet's shared bucket, capped at ``backfill_rate_per_second`` so
+    live polling keeps most of the quota.
+    """
+    window = window or timedelta(days=settings.backfill_window_days)
+    state = await asyncio.to_thread(load_state, session_factory, backfill_id)
+    target = state.target
+    client = build_client(
+        target,
+        http,
+        SubBudget(
+            limiter or local_rate_limiter,
+            f"backfill:{target.marketplace}:{target.cabinet_id}",
+            settings.backfill_rate_per_second,
+            settings.backfill_rate_burst,
+        ),
+    )
+    undated = [listing for listing in LISTINGS if listing in client.undated_listings]
+    dated = [listing for listing in LISTINGS if listing not in undated]
+
+    async def store(listing: str, page, checkpoint_key: str) -> int:
+        reviews, questions = (page.items, []) if listing == "reviews" else ([], page.items)
+        created, _ = await asyncio.to_thread(persist_page, session_factory, target, reviews, questions)
+        state.imported += created
+        state.checkpoint = {**state.checkpoint, checkpoint_key: page.next_token}
+        await asyncio.to_thread(
+            save_state, session_factory, backfill_id, checkpoint=state.checkpoint, imported=state.imported
+        )
+        return created
+
+    imported = 0
+    for _ in range(max_windows):
+        if state.cursor_at >= state.end_at:
+            break
+        until = min(state.cursor_at + window, state.end_at)
+        for listing in dated:
+            if listing in state.checkpoint and state.checkpoint[listing] is None:
+                continue
+            pages = getattr(client, f"iter_{listing}")(
+                since=state.cursor_at, until=until, page_token=state.checkpoint.get(listing)
+            )
+            async for page in pages:
+                imported += await store(listing, page, listing)
+        state.cursor_at = until
+        state.checkpoint = {key: value for key, value in state.checkpoint.items() if key.endswith(":all")}
+        await asyncio.to_thread(
+            save_state,
+            session_factory,
+            backfill_id,
+            cursor_at=until,
+            checkpoint=state.checkpoint,
+            progress=window_progress(state.start_at, state.end_at, until),
+        )
+    for listing in undated:
+        key = f"{listing}:all"
+        if key in state.checkpoint and state.checkpoint[key] is None:
+            continue
+        pages = getattr(client, f"iter_{listing}")(
+            since=state.start_at, until=state.end_at, page_token=state.checkpoint.get(key)
+        )
+        budget = max_windows * UNDATED_PAGES_PER_WINDOW
+        async for page in pages:
+            imported += await store(listing, page, key)
+            budget -= 1
+            if budget <= 0:
+                break
+    finished = state.cursor_at >= state.end_at and all(
+        f"{listing}:all" in state.checkpoint and state.checkpoint[f"{listing}:all"] is None for listing in undated
+    )
+    await asyncio.to_thread(save_state, session_factory, backfill_id, status="done" if finished else "running")
+    return imported
+
+
+async def backfill_claimed(
+    backfill_ids: list[int],
+    session_factory: SessionFactory = SessionLocal,
+    http: httpx.AsyncClient | None = None,
+    limiter: RateLimiter | None = None,
+    max_windows: int = 4,
+) -> dict:
+    owns_http = http is None
+    if http is None:
+        http = httpx.AsyncClient(timeout=settings.poll_timeout_seconds)
+    summary = {"backfills": len(backfill_ids), "imported": 0, "failed": 0}
+    try:
+        async with shared_rate_limiter(limiter) as limiter:
+            results = await asyncio.gather(
+                *(
+                    backfill_cabinet(backfill_id, http, session_factory, limiter, max_windows=max_windows)
+                    for backfill_id in backfill_ids
+                ),
+                return_exceptions=True,
+            )
+    finally:
+        if owns_http:
+            await http.aclose()
+    for backfill_id, result in zip(backfill_ids, results):
+        if isinstance(result, BaseException):
+            summary["failed"] += 1
+            logger.warning("Backfill %s failed: %r", backfill_id, result)
+            save_state(session_factory, backfill_id, error=repr(result), leased_until=None)
+            continue
+        summary["imported"] += result
+        save_state(session_factory, backfill_id, error=None, leased_until=None)
+    return summary
+
+
+def run_backfills(
+    session_factory: SessionFactory = SessionLocal,
+    limit: int = 1,
+    max_windows: int = 4,
+    clock=datetime.utcnow,
+) -> dict:
+    """Lease up to ``limit`` unfinished backfills and advance each by a few windows."""
+    db = session_factory()
+    try:
+        backfill_ids = crud.claim_backfills(db, clock(), settings.backfill_lease_seconds, limit)
+    finally:
+        db.close()
+    if not backfill_ids:
+        return {"backfills": 0, "imported": 0, "failed": 0}
+    return asyncio.run(backfill_claimed(backfill_ids, session_factory, max_windows=max_windows))
@@ -0,0 +1,258 @@
+from __future__ import annotations
+
+import os
+import socket
+import time
+from typing import Callable, Iterable
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from app import crud, models
+from app.schemas import LLMResponse
+from app.services.kb_conflicts import conflict_matrices
+from app.services.kb_index import kb_indexes
+from app.services.kb_semantic import SemanticKBIndex
+from app.services.llm import LLMAdapter
+from app.services.prompts import Prompt, PromptBuilder, get_prompt_builder
+from app.services.reply_cache import ReplyCache, ReplyKey, kb_version, reply_key
+
+
+class GenerationBatcher:
+    """Events waiting for a drafted reply, queued in a Redis list shared by all projects.
+
+    A batch is released once ``max_items`` are queued or the oldest entry has
+    waited ``max_wait_ms``, so a quiet queue still drafts well inside the SLA.
+    Entries are ``<event_id>:<enqueued_ms>``; ``LMOVE`` hands each one to
+    exactly one worker by parking it in that worker's processing list until
+    :meth:`ack` or :meth:`fail`, either of which can settle just some of the
+    batch. Processing lists of workers whose lease ran
+    out (e.g. killed mid-batch) are put back by :meth:`recover`. An event
+    that failed ``max_attempts`` times is dropped from the queue.
+    """
+
+    def __init__(
+        self,
+        redis,
+        key: str = "llm:pending",
+        max_items: int = 32,
+        max_wait_ms: int = 2000,
+        clock: Callable[[], float] = time.time,
+        sleep: Callable[[float], None] = time.sleep,
+        worker_id: str | None = None,
+        lease_seconds: int = 600,
+        max_attempts: int = 3,
+    ) -> None:
+        self.redis = redis
+        self.key = key
+        self.max_items = max_items
+        self.max_wait = max_wait_ms / 1000
+        self.clock = clock
+        self.sleep = sleep
+        self.worker_id = worker_id or f"{socket.gethostname()}:{os.getpid()}"
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self.processing_key = self._processing_key(self.worker_id)
+
+    def _processing_key(self, worker_id: str) -> str:
+        return f"{self.key}:processing:{worker_id}"
+
+    def _lease_key(self, worker_id: str) -> str:
+        return f"{self.key}:lease:{worker_id}"
+
+    def push(self, event_id: int) -> None:
+        self.redis.rpush(self.key, f"{event_id}:{int(self.clock() * 1000)}")
+
+    def next_batch(self) -> list[int]:
+        """Wait until a batch is due and take it; an empty queue returns ``[]`` at once."""
+        while True:
+            head = self.redis.lindex(self.key, 0)
+            if head is None:
+                return []
+            waited = self.clock() - _enqueued_at(head)
+            if waited >= self.max_wait or self.redis.llen(self.key) >= self.max_items:
+                self.redis.sadd(f"{self.key}:workers", self.worker_id)
+                self.redis.set(self._lease_key(self.worker_id), 1, ex=self.lease_seconds)
+                entries = []
+                for _ in range(self.max_items):
+                    entry = self.redis.lmove(self.key, self.processing_key, "LEFT", "RIGHT")
+                    if entry is None:
+                        break
+                    entries.append(entry)
+                return [_event_id(entry) for entry in entries]
+            self.sleep(self.max_wait - waited)
+
+    def _taken(self, event_ids: Iterable[int] | None) -> list[bytes | str]:
+        entries = self.redis.lrange(self.processing_key, 0, -1)
+        if event_ids is None:
+            return entries
+        wanted = set(event_ids)
+        return [entry for entry in entries if _event_id(entry) in wanted]
+
+    def _release(self, pipe, entries: list[bytes | str], everything: bool) -> None:
+        if everything:
+            pipe.delete(self.processing_key)
+            return
+        for entry in entries:
+            pipe.lrem(self.processing_key, 1, entry)
+
+    def ack(self, event_ids: Iterable[int] | None = None) -> None:
+        """The taken events (or just ``event_ids``) are drafted: forget them."""
+        entries = self._taken(event_ids)
+        pipe = self.redis.pipeline()
+        self._release(pipe, entries, event_ids is None)
+        if entries:
+            pipe.hdel(f"{self.key}:attempts", *{_event_id(entry) for entry in entries})
+        pipe.execute()
+
+    def fail(self, event_ids: Iterable[int] | None = None) -> list[int]:
+        """Requeue the taken events (or just ``event_ids``); returns the ids that used up ``max_attempts``."""
+        entries = self._taken(event_ids)
+        retry, dropped = [], []
+        for entry in entries:
+            event_id = _event_id(entry)
+            if self.redis.hincrby(f"{self.key}:attempts", event_id, 1) >= self.max_attempts:
+                dropped.append(event_id)
+            else:
+                retry.append(entry)
+        pipe = self.redis.pipeline()
+        if retry:
+            pipe.rpush(self.key, *retry)
+        if dropped:
+            pipe.hdel(f"{self.key}:attempts", *dropped)
+        self._release(pipe, entries, event_ids is None)
+        pipe.execute()
+        return dropped
+
+    def recover(self) -> int:
+        """Put back the events of workers whose lease expired; returns how many were requeued."""
+        recovered = 0
+        for raw in self.redis.smembers(f"{self.key}:workers"):
+            worker_id = _decode(raw)
+            if self.redis.exists(self._lease_key(worker_id)):
+                continue
+            while self.redis.lmove(self._processing_key(worker_id), self.key, "RIGHT", "LEFT") is not None:
+                recovered += 1
+            self.redis.srem(f"{self.key}:workers", worker_id)
+        return recovered
+
+
+def _decode(entry: bytes | str) -> str:
+    return entry.decode("utf-8") if isinstance(entry, bytes) else entry
+
+
+def _event_id(entry: bytes | str) -> int:
+    return int(_decode(entry).partition(":")[0])
+
+
+def _enqueued_at(entry: bytes | str) -> float:
+    return int(_decode(entry).partition(":")[2]) / 1000
+
+
+def draft_replies(
+    db: Session,
+    event_ids: list[int],
+    llm: LLMAdapter,
+    cache: ReplyCache | None = None,
+    kb_top_k: int = 5,
+    semantic: SemanticKBIndex | None = None,
+    builder: PromptBuilder | None = None,
+    failures: dict[int, Exception] | None = None,
+) -> int:
+    """Draft replies for the still-new events among ``event_ids`` with one LLM call and one commit.
+
+    Events the LLM failed on stay ``new`` and are reported in ``failures``; without it the first failure is raised.
+    """
+    events = list(
+        db.scalars(
+            select(models.Event)
+            .where(models.Event.id.in_(event_ids), models.Event.status == "new")
+            .order_by(models.Event.id)
+        ).all()
+    )
+    if not events:
+        return 0
+    related = _relevant_rule_ids(db, events, kb_top_k, semantic)
+    prompts = (builder or get_prompt_builder()).build_batch(db, events, related)
+    if cache is None:
+        responses = llm.generate_batch(
+            [prompt.text for prompt in prompts], [event.project_id for event in events]
+        )
+    else:
+        responses = _cached_responses(db, events, prompts, llm, cache)
+    failed = {event.id: response for event, response in zip(events, responses) if isinstance(response, Exception)}
+    if failed and failures is None:
+        raise next(iter(failed.values()))
+    for event, prompt, response in zip(events, prompts, responses):
+        if event.id in failed:
+            continue
+        event.suggested_reply = response.text
+        event.confidence = response.confidence
+        event.kb_rule_ids = response.kb_rule_ids or list(prompt.rule_ids)
+        event.prompt_tokens = prompt.tokens
+        event.conflict = response.conflict or conflict_matrices.has_conflict(db, event.project_id, event.kb_rule_ids)
+        crud.set_event_status(db, event, "drafted")
+    db.commit()
+    if failures is not None:
+        failures.update(failed)
+    return len(events) - len(failed)
+
+
+def build_prompt(
+    db: Session,
+    event: models.Event,
+    kb_top_k: int = 5,
+    semantic: SemanticKBIndex | None = None,
+    builder: PromptBuilder | None = None,
+) -> Prompt:
+    """The prompt :func:`draft_replies` would send for ``event``."""
+    related = _relevant_rule_ids(db, [event], kb_top_k, semantic)
+    return (builder or get_prompt_builder()).build_batch(db, [event], related)[0]
+
+
+def _relevant_rule_ids(
+    db: Session, events: list[models.Event], k: int, semantic: SemanticKBIndex | None = None
+) -> dict[int, list[int]]:
+    events = [event for event in events if event.text]
+    if k <= 0 or not events:
+        return {}
+    if semantic is not None:
+        queries = [(event.project_id, event.internal_sku, event.text) for event in events]
+        hits = semantic.search_batch(db, queries, k)
+        return {event.id: [rule_id for _, rule_id in found] for event, found in zip(events, hits)}
+    return {
+        event.id: [
+            hit.rule_id for hit in kb_indexes.search(db, event.project_id, event.text, event.internal_sku, k)
+        ]
+        for event in events
+    }
+
+
+def _cached_responses(
+    db: Session, events: list[models.Event], prompts: list[Prompt], llm: LLMAdapter, cache: ReplyCache
+) -> list[LLMResponse | Exception]:
+    versions: dict[tuple[int, str], str] = {}
+    keys = []
+    for event, prompt in zip(events, prompts):
+        scope = (event.project_id, event.internal_sku)
+        if scope not in versions:
+            versions[scope] = kb_version(db, *scope)
+        keys.append(reply_key(event, f"{versions[scope]}:{prompt.context}"))
+    found: dict[ReplyKey, LLMResponse | Exception] = {}
+    missing: dict[ReplyKey, tuple[models.Event, Prompt]] = {}
+    for key, event, prompt in zip(keys, events, prompts):
+        if key in found or key in missing:
+            continue
+        cached = cache.get(key)
+        if cached is None:
+            missing[key] = (event, prompt)
+        else:
+            found[key] = cached
+    if missing:
+        texts = [prompt.text for _, prompt in missing.values()]
+        project_ids = [event.project_id for event, _ in missing.values()]
+        for key, response in zip(missing, llm.generate_batch(texts, project_ids)):
+            if not isinstance(response, Exception):
+                cache.set(key, response)
+            found[key] = response
+    return [found[key] for key in keys]
@@ -0,0 +1,95 @@
+from __future__ import annotations
+
+from collections import defaultdict
+from datetime import datetime
+from typing import Any
+
+from sqlalchemy.orm import Session
+
+from app import crud
+from app.marketplace.clients import (
+    parse_ozon_question,
+    parse_ozon_review,
+    parse_wb_question,
+    parse_wb_review,
+)
+from app.marketplace.models import MarketplaceQuestion, MarketplaceReview
+from app.services.poller import event_rows
+
+PARSERS = {
+    "WB": (parse_wb_review, parse_wb_question, "feedbacks", "productValuation"),
+    "OZON": (parse_ozon_review, parse_ozon_question, "reviews", "rating"),
+}
+
+
+def normalize_payload(
+    marketplace: str, payload: Any
+) -> tuple[list[MarketplaceReview], list[MarketplaceQuestion]]:
+    """Turn a webhook body into reviews/questions with the same parsers the poller uses.
+
+    Accepts the list-API envelope (``{"feedbacks"|"reviews": [...], "questions": [...]}``,
+    optionally under ``data``), a bare list of items, or a single item.
+    """
+    parse_review, parse_question, review_key, review_marker = PARSERS[marketplace]
+    if isinstance(payload, dict) and isinstance(payload.get("data"), dict):
+        payload = payload["data"]
+    if isinstance(payload, dict) and (review_key in payload or "questions" in payload):
+        return (
+            [parse_review(item) for item in payload.get(review_key) or []],
+            [parse_question(item) for item in payload.get("questions") or []],
+        )
+    items = payload if isinstance(payload, list) else [payload]
+    reviews: list[MarketplaceReview] = []
+    questions: list[MarketplaceQuestion] = []
+    for item in items:
+        if not isinstance(item, dict) or "id" not in item or "text" not in item:
+            raise ValueError("Unrecognized webhook item")
+        if review_marker in item:
+            reviews.append(parse_review(item))
+        else:
+            questions.append(parse_question(item))
+    return reviews, questions
+
+
+def drain_inbox(db: Session, limit: int = 500) -> dict:
+    """Normalize one batch of queued webhooks into events in a single transaction.
+
+    Rows are claimed with ``FOR UPDATE SKIP LOCKED`` so several workers can
+    drain in parallel; unparseable payloads are marked processed with an error.
+    """
+    batch = crud.claim_webhook_batch(db, limit)
+    if not batch:
+        db.commit()
+        return {"processed": 0, "created": 0, "duplicates": 0, "failed": 0}
+    cabinets = {
+        cabinet.id: cabinet
+        for cabinet in crud.list_all_cabinets(db, sorted({item.cabinet_id for item in batch}))
+    }
+    now = datetime.utcnow()
+    grouped: dict[tuple, tuple[list, list]] = defaultdict(lambda: ([], []))
+    failed = 0
+    for item in batch:
+        item.processed_at = now
+        try:
+            reviews, questions = normalize_payload(item.marketplace, item.payload)
+        except (KeyError, TypeError, ValueError, AttributeError) as exc:
+            item.error = repr(exc)
+            failed += 1
+            continue
+        cabinet = cabinets[item.cabinet_id]
+        group = grouped[(cabinet.project_id, cabinet.id, cabinet.marketplace)]
+        group[0].extend(reviews)
+        group[1].extend(questions)
+    rows = []
+    for (project_id, cabinet_id, marketplace), (reviews, questions) in grouped.items():
+        item_ids = sorted({item.sku for item in (*reviews, *questions) if item.sku})
+        internal_skus = crud.internal_skus_by_item_id(db, project_id, marketplace, item_ids)
+        rows.extend(event_rows(project_id, cabinet_id, marketplace, reviews, questions, internal_skus))
+    created, duplicates = crud.create_events_bulk(db, rows) if rows else ([], [])
+    db.commit()
+    return {
+        "processed": len(batch),
+        "created": len(created),
+        "duplicates": len(duplicates),
+        "failed": failed,
+    }
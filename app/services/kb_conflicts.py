@@ -0,0 +1,210 @@
+from __future__ import annotations
+
+import threading
+from dataclasses import dataclass
+from functools import lru_cache
+from itertools import combinations
+from typing import Iterable
+
+from sqlalchemy import delete, or_, select
+from sqlalchemy.orm import Session
+
+from app import models
+from app.services.kb_index import STOP_WORDS, kb_indexes, stem, words
+from app.services.kb_snapshot import kb_snapshots
+
+NEGATIONS = frozenset({"не", "нет", "без", "нельзя"})
+# Duration units by stem, in days, so "1 год" and "12 месяцев" state the same fact.
+DURATION_DAYS = {
+    "год": 365.0,
+    "лет": 365.0,
+    "месяц": 30.4,
+    "недел": 7.0,
+    "ден": 1.0,
+    "дне": 1.0,
+    "дня": 1.0,
+    "сут": 1.0,
+    "час": 1 / 24,
+    "минут": 1 / 1440,
+}
+MIN_TOPIC_OVERLAP = 0.5
+QUANTITY_TOLERANCE = 0.05
+
+
+@dataclass(frozen=True)
+class Claim:
+    """What a rule asserts: its topic terms, the quantities it names, and whether it is negated."""
+
+    topic: frozenset[str]
+    quantities: tuple[tuple[str, float], ...]
+    negated: bool
+
+
+@lru_cache(maxsize=100_000)
+def parse_claim(text: str) -> Claim:
+    raw = words(text)
+    negated = any(word in NEGATIONS for word in raw)
+    tokens = [stem(word) for word in raw if word not in STOP_WORDS and word not in NEGATIONS]
+    topic: set[str] = set()
+    quantities = []
+    for position, token in enumerate(tokens):
+        if token.isdigit():
+            unit = tokens[position + 1] if position + 1 < len(tokens) else ""
+            if unit in DURATION_DAYS:
+                quantities.append(("days", int(token) * DURATION_DAYS[unit]))
+            else:
+                quantities.append(("number", float(token)))
+        elif token not in DURATION_DAYS:
+            topic.add(token)
+    return Claim(frozenset(topic), tuple(sorted(quantities)), negated)
+
+
+def _same_quantities(left: tuple[tuple[str, float], ...], right: tuple[tuple[str, float], ...]) -> bool:
+    if len(left) != len(right):
+        return False
+    return all(
+        kind == other_kind and abs(value - other) <= QUANTITY_TOLERANCE * max(abs(value), abs(other))
+        for (kind, value), (other_kind, other) in zip(left, right)
+    )
+
+
+def claims_conflict(left: Claim, right: Claim) -> bool:
+    """Two claims about the same topic that disagree on a quantity or on negation."""
+    shared = len(left.topic & right.topic)
+    if not shared or shared / len(left.topic | right.topic) < MIN_TOPIC_OVERLAP:
+        return False
+    if left.negated != right.negated:
+        return True
+    return bool(left.quantities and right.quantities) and not _same_quantities(left.quantities, right.quantities)
+
+
+def rules_conflict(left: str, right: str) -> bool:
+    return claims_conflict(parse_claim(left), parse_claim(right))
+
+
+class ConflictMatrix:
+    """Sparse symmetric matrix of contradicting rule pairs (adjacency sets)."""
+
+    def __init__(self, pairs: Iterable[tuple[int, int]] = ()) -> None:
+        self.adjacent: dict[int, set[int]] = {}
+        for rule_id, other_rule_id in pairs:
+            self.add(rule_id, other_rule_id)
+
+    def add(self, rule_id: int, other_rule_id: int) -> None:
+        self.adjacent.setdefault(rule_id, set()).add(other_rule_id)
+        self.adjacent.setdefault(other_rule_id, set()).add(rule_id)
+
+    def pairs(self, rule_ids: Iterable[int]) -> list[tuple[int, int]]:
+        """Conflicting pairs among ``rule_ids``: O(k²) set lookups for k rules."""
+        return [
+            (rule_id, other)
+            for rule_id, other in combinations(sorted(set(rule_ids)), 2)
+            if other in self.adjacent.get(rule_id, ())
+        ]
+
+    def has_conflict(self, rule_ids: Iterable[int]) -> bool:
+        return bool(self.pairs(rule_ids))
+
+
+class ConflictRegistry:
+    """Per-process cache of each project's :class:`ConflictMatrix`.
+
+    Pairs only change when rules do, so a project is reloaded from
+    ``kb_rule_conflicts`` whenever its KB version moves.
+    """
+
+    def __init__(self) -> None:
+        self._matrices: dict[int, tuple[int, ConflictMatrix]] = {}
+        self._lock = threading.Lock()
+
+    def get(self, db: Session, project_id: int) -> ConflictMatrix:
+        version = kb_snapshots.get(db, project_id).version
+        cached = self._matrices.get(project_id)
+        if cached is not None and cached[0] == version:
+            return cached[1]
+        rows = db.execute(
+            select(models.KBRuleConflict.rule_id, models.KBRuleConflict.other_rule_id).where(
+                models.KBRuleConflict.project_id == project_id
+            )
+        ).all()
+        matrix = ConflictMatrix(rows)
+        with self._lock:
+            self._matrices[project_id] = (version, matrix)
+        return matrix
+
+    def forget(self, project_id: int) -> None:
+        with self._lock:
+            self._matrices.pop(project_id, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._matrices.clear()
+
+    def has_conflict(self, db: Session, project_id: int, rule_ids: Iterable[int] | None) -> bool:
+        rule_ids = list(rule_ids or [])
+        if len(rule_ids) < 2:
+            return False
+        return self.get(db, project_id).has_conflict(rule_ids)
+
+
+conflict_matrices = ConflictRegistry()
+
+
+def find_conflicts(db: Session, rule: models.KBRule) -> list[int]:
+    """Ids of stored rules that contradict ``rule`` and can be retrieved together with it.
+
+    Only rules sharing a topic term are compared, taken from the KB index
+    postings: a SKU rule meets project-wide rules and its own SKU, a
+    project-wide rule meets every partition. Call it before a new rule is
+    flushed, so the project's index is reused rather than rebuilt.
+    """
+    claim = parse_claim(rule.text)
+    index = kb_indexes.get(db, rule.project_id)
+    scopes = [None, rule.internal_sku] if rule.internal_sku else list(index.partitions)
+    candidates: set[int] = set()
+    for sku in scopes:
+        partition = index.partitions.get(sku)
+        if partition is None:
+            continue
+        for term in claim.topic:
+            candidates.update(partition.postings.get(term, ()))
+    candidates.discard(rule.id)
+    return [
+        other for other in sorted(candidates) if claims_conflict(claim, parse_claim(index.rules[other][1]))
+    ]
+
+
+def add_conflicts(db: Session, rule: models.KBRule, conflicting: Iterable[int]) -> None:
+    """Stage the pairs of a flushed ``rule``; they commit with the rule itself."""
+    db.add_all(
+        models.KBRuleConflict(
+            project_id=rule.project_id, rule_id=min(rule.id, other), other_rule_id=max(rule.id, other)
+        )
+        for other in conflicting
+    )
+
+
+def forget_conflicts(db: Session, rule_id: int) -> None:
+    db.execute(
+        delete(models.KBRuleConflict).where(
+            or_(models.KBRuleConflict.rule_id == rule_id, models.KBRuleConflict.other_rule_id == rule_id)
+        )
+    )
+
+
+def rebuild_conflicts(db: Session, project_id: int) -> int:
+    """Recompute every pair of a project, e.g. for rules written before verdicts were stored."""
+    db.execute(delete(models.KBRuleConflict).where(models.KBRuleConflict.project_id == project_id))
+    rules = db.scalars(
+        select(models.KBRule).where(models.KBRule.project_id == project_id).order_by(models.KBRule.id)
+    ).all()
+    pairs = {
+        (min(rule.id, other), max(rule.id, other)) for rule in rules for other in find_conflicts(db, rule)
+    }
+    db.add_all(
+        models.KBRuleConflict(project_id=project_id, rule_id=rule_id, other_rule_id=other_rule_id)
+        for rule_id, other_rule_id in sorted(pairs)
+    )
+    db.commit()
+    conflict_matrices.forget(project_id)
+    return len(pairs)
@@ -0,0 +1,323 @@
+from __future__ import annotations
+
+import heapq
+import math
+import re
+import threading
+from bisect import bisect_left, insort
+from collections import Counter
+from dataclasses import dataclass
+from functools import lru_cache
+from itertools import chain
+from typing import Iterable
+
+from sqlalchemy.orm import Session
+
+from app import models
+from app.services.kb_snapshot import kb_snapshots
+
+_WORD = re.compile(r"[а-яa-z0-9]+")
+_RV = re.compile(r"^(.*?[аеиоуыэюя])(.*)$")
+_PERFECTIVE_GERUND = re.compile(r"((ив|ивши|ившись|ыв|ывши|ывшись)|((?<=[ая])(в|вши|вшись)))$")
+_REFLEXIVE = re.compile(r"(с[яь])$")
+_ADJECTIVE = re.compile(r"(ее|ие|ые|ое|ими|ыми|ей|ий|ый|ой|ем|им|ым|ом|его|ого|ему|ому|их|ых|ую|юю|ая|яя|ою|ею)$")
+_PARTICIPLE = re.compile(r"((ивш|ывш|ующ)|((?<=[ая])(ем|нн|вш|ющ|щ)))$")
+_VERB = re.compile(
+    r"((ила|ыла|ена|ейте|уйте|ите|или|ыли|ей|уй|ил|ыл|им|ым|ен|ило|ыло|ено|ят|ует|уют|ит|ыт|ены|ить|ыть|ишь|ую|ю)"
+    r"|((?<=[ая])(ла|на|ете|йте|ли|й|л|ем|н|ло|но|ет|ют|ны|ть|ешь|нно)))$"
+)
+_NOUN = re.compile(r"(а|ев|ов|ие|ье|е|иями|ями|ами|еи|ии|и|ией|ей|ой|ий|й|иям|ям|ием|ем|ам|ом|о|у|ах|иях|ях|ы|ь|ию|ью|ю|ия|ья|я)$")
+_DERIVATIONAL = re.compile(r".*[^аеиоуыэюя]+[аеиоуыэюя].*ость?$")
+_DER = re.compile(r"ость?$")
+_SUPERLATIVE = re.compile(r"(ейше|ейш)$")
+
+STOP_WORDS = frozenset(
+    "и в во не что он на я с со как а то все она так его но да ты к у же вы за бы по только ее мне было вот от "
+    "меня еще нет о из ему теперь когда даже ну вдруг ли если уже или ни быть был него до вас нибудь опять уж "
+    "вам ведь там потом себя ничего ей может они тут где есть надо ней для мы тебя их чем была сам чтоб без "
+    "будто чего раз тоже себе под будет ж тогда кто этот того потому этого какой совсем ним здесь этом один "
+    "почти мой тем чтобы нее сейчас были куда зачем всех никогда можно при наконец два об другой хоть после "
+    "над больше тот через эти нас про всего них какая много разве три эту моя впрочем хорошо свою этой перед "
+    "иногда лучше чуть том нельзя такой им более всегда конечно всю между".split()
+)
+
+
+@lru_cache(maxsize=100_000)
+def stem(word: str) -> str:
+    """Snowball (Porter) Russian stemmer; non-Cyrillic tokens are returned as is."""
+    match = _RV.match(word)
+    if not match:
+        return word
+    prefix, rv = match.groups()
+    stripped = _PERFECTIVE_GERUND.sub("", rv, 1)
+    if stripped == rv:
+        rv = _REFLEXIVE.sub("", rv, 1)
+        stripped = _ADJECTIVE.sub("", rv, 1)
+        if stripped != rv:
+            rv = _PARTICIPLE.sub("", stripped, 1)
+        else:
+            stripped = _VERB.sub("", rv, 1)
+            rv = _NOUN.sub("", rv, 1) if stripped == rv else stripped
+    else:
+        rv = stripped
+    rv = re.sub(r"и$", "", rv)
+    if _DERIVATIONAL.match(rv):
+        rv = _DER.sub("", rv, 1)
+    stripped = re.sub(r"ь$", "", rv)
+    if stripped == rv:
+        rv = re.sub(r"нн$", "н", _SUPERLATIVE.sub("", rv, 1))
+    else:
+        rv = stripped
+    return prefix + rv
+
+
+def words(text: str) -> list[str]:
+    return _WORD.findall(text.lower().replace("ё", "е"))
+
+
+def tokenize(text: str) -> list[str]:
+    return [stem(word) for word in words(text) if word not in STOP_WORDS]
+
+
+class BM25Index:
+    """Inverted index scored with Okapi BM25, updated in place.
+
+    Each posting stores the term's saturated BM25 weight for the document and
+    every term keeps its postings sorted by that weight, so a query walks the
+    lists best-first and stops as soon as no unseen document can beat the
+    current k-th score (Fagin's threshold algorithm). Long runs of equal
+    weights defeat that stop, so after ``walk_budget`` documents the query
+    switches to scoring only documents that match enough query terms to beat
+    the k-th score found so far.
+    Weights use a pinned average document length that is refreshed when the
+    real one drifts by more than ``reweigh_drift``.
+    """
+
+    def __init__(
+        self, k1: float = 1.2, b: float = 0.75, reweigh_drift: float = 0.2, walk_budget: int = 64
+    ) -> None:
+        self.k1 = k1
+        self.b = b
+        self.reweigh_drift = reweigh_drift
+        self.walk_budget = walk_budget
+        self.postings: dict[str, dict[int, float]] = {}
+        self.impacts: dict[str, list[tuple[float, int]]] = {}
+        self.doc_terms: dict[int, dict[str, int]] = {}
+        self.doc_len: dict[int, int] = {}
+        self.total_len = 0
+        self._avgdl = 0.0
+
+    def __len__(self) -> int:
+        return len(self.doc_len)
+
+    def _weight(self, tf: int, length: int) -> float:
+        norm = self.k1 * (1 - self.b + self.b * length / (self._avgdl or 1.0))
+        return tf * (self.k1 + 1) / (tf + norm)
+
+    def _post(self, doc_id: int, counts: dict[str, int]) -> None:
+        length = self.doc_len[doc_id]
+        for token, tf in counts.items():
+            weight = self._weight(tf, length)
+            self.postings.setdefault(token, {})[doc_id] = weight
+            insort(self.impacts.setdefault(token, []), (-weight, doc_id))
+
+    def _reweigh(self) -> None:
+        self._avgdl = self.total_len / len(self.doc_len)
+        self.postings = {}
+        self.impacts = {}
+        for doc_id, counts in self.doc_terms.items():
+            length = self.doc_len[doc_id]
+            for token, tf in counts.items():
+                self.postings.setdefault(token, {})[doc_id] = self._weight(tf, length)
+        for token, posting in self.postings.items():
+            self.impacts[token] = sorted((-weight, doc_id) for doc_id, weight in posting.items())
+
+    def add(self, doc_id: int, tokens: list[str]) -> None:
+        if doc_id in self.doc_len:
+            self.remove(doc_id)
+        counts: dict[str, int] = {}
+        for token in tokens:
+            counts[token] = counts.get(token, 0) + 1
+        self.doc_terms[doc_id] = counts
+        self.doc_len[doc_id] = len(tokens)
+        self.total_len += len(tokens)
+        avgdl = self.total_len / len(self.doc_len)
+        if abs(avgdl - self._avgdl) > self.reweigh_drift * max(self._avgdl, 1.0):
+            self._reweigh()
+        else:
+            self._post(doc_id, counts)
+
+    def remove(self, doc_id: int) -> None:
+        counts = self.doc_terms.pop(doc_id, None)
+        if counts is None:
+            return
+        for token in counts:
+            posting = self.postings[token]
+            impacts = self.impacts[token]
+            del impacts[bisect_left(impacts, (-posting.pop(doc_id), doc_id))]
+            if not posting:
+                del self.postings[token]
+                del self.impacts[token]
+        self.total_len -= self.doc_len.pop(doc_id)
+
+    def _idf(self, df: int) -> float:
+        return math.log(1 + (len(self.doc_len) - df + 0.5) / (df + 0.5))
+
+    def search(self, tokens: Iterable[str], k: int = 5) -> list[tuple[float, int]]:
+        """Top ``k`` ``(score, doc_id)`` pairs, best first."""
+        terms = [token for token in set(tokens) if token in self.postings]
+        if not terms or k <= 0:
+            return []
+        idfs = [self._idf(len(self.postings[term])) for term in terms]
+        postings = [self.postings[term] for term in terms]
+        lists = [self.impacts[term] for term in terms]
+        top: list[tuple[float, int]] = []
+        seen: set[int] = set()
+        depth = 0
+        while True:
+            threshold = 0.0
+            for idf, impacts in zip(idfs, lists):
+                if depth >= len(impacts):
+                    continue
+                neg_weight, doc_id = impacts[depth]
+                threshold -= idf * neg_weight
+                if doc_id in seen:
+                    continue
+                seen.add(doc_id)
+                score = sum(idf_ * posting.get(doc_id, 0.0) for idf_, posting in zip(idfs, postings))
+                if len(top) < k:
+                    heapq.heappush(top, (score, doc_id))
+                elif (score, doc_id) > top[0]:
+                    heapq.heapreplace(top, (score, doc_id))
+            if threshold == 0.0 or (len(top) == k and top[0][0] >= threshold):
+                return sorted(top, reverse=True)
+            if len(seen) > self.walk_budget:
+                floor = top[0][0] if len(top) == k else 0.0
+                rest = self._score_all(idfs, postings, [-impacts[0][0] for impacts in lists], k, floor)
+                return heapq.nlargest(k, set(top).union(rest))
+            depth += 1
+
+    @staticmethod
+    def _score_all(
+        idfs: list[float], postings: list[dict[int, float]], max_weights: list[float], k: int, floor: float
+    ) -> list[tuple[float, int]]:
+        """Score every document that can still beat ``floor``.
+
+        A document holding ``c`` query terms scores at most the sum of the
+        ``c`` largest term bounds, which gives the fewest terms a contender must
+        match; counting term hits per document runs in C, unlike BM25 scoring.
+        """
+        bounds = sorted((idf * weight for idf, weight in zip(idfs, max_weights)), reverse=True)
+        needed, reach = 0, 0.0
+        while needed < len(bounds) and reach <= floor:
+            reach += bounds[needed]
+            needed += 1
+        hits = Counter(chain.from_iterable(postings))
+        candidates = hits if needed <= 1 else [doc_id for doc_id, count in hits.items() if count >= needed]
+        scored = (
+            (sum(idf * posting.get(doc_id, 0.0) for idf, posting in zip(idfs, postings)), doc_id)
+            for doc_id in candidates
+        )
+        return heapq.nlargest(k, scored)
+
+
+@dataclass(frozen=True)
+class RuleHit:
+    rule_id: int
+    internal_sku: str | None
+    text: str
+    score: float
+
+
+class ProjectKBIndex:
+    """BM25 over one project's KB: a project-wide partition plus one partition per SKU."""
+
+    def __init__(self, rules: Iterable[models.KBRule] = ()) -> None:
+        self.partitions: dict[str | None, BM25Index] = {}
+        self.rules: dict[int, tuple[str | None, str]] = {}
+        for rule in rules:
+            self.add(rule.id, rule.internal_sku, rule.text)
+
+    def __len__(self) -> int:
+        return len(self.rules)
+
+    def add(self, rule_id: int, internal_sku: str | None, text: str) -> None:
+        self.remove(rule_id)
+        sku = internal_sku or None
+        self.rules[rule_id] = (sku, text)
+        self.partitions.setdefault(sku, BM25Index()).add(rule_id, tokenize(text))
+
+    def remove(self, rule_id: int) -> None:
+        entry = self.rules.pop(rule_id, None)
+        if entry is not None:
+            self.partitions[entry[0]].remove(rule_id)
+
+    def search(self, text: str, internal_sku: str | None = None, k: int = 5) -> list[RuleHit]:
+        """Top ``k`` rules for ``text`` among project-wide rules and those of ``internal_sku``."""
+        tokens = tokenize(text)
+        hits: list[tuple[float, int]] = []
+        for sku in {None, internal_sku or None}:
+            partition = self.partitions.get(sku)
+            if partition is not None:
+                hits.extend(partition.search(tokens, k))
+        return [
+            RuleHit(rule_id, *self.rules[rule_id], score=score) for score, rule_id in heapq.nlargest(k, hits)
+        ]
+
+
+class KBIndexRegistry:
+    """Per-process cache of project indexes.
+
+    Each index is tagged with the KB version it was built from. A rule write
+    in this process is applied incrementally when the index was current just
+    before it; any other version change (e.g. a write made by another
+    process) rebuilds the project from its KB snapshot on the next lookup.
+    """
+
+    def __init__(self) -> None:
+        self._indexes: dict[int, tuple[int, ProjectKBIndex]] = {}
+        self._lock = threading.Lock()
+
+    def get(self, db: Session, project_id: int) -> ProjectKBIndex:
+        snapshot = kb_snapshots.get(db, project_id)
+        cached = self._indexes.get(project_id)
+        if cached is not None and cached[0] == snapshot.version:
+            return cached[1]
+        index = ProjectKBIndex(snapshot.rules)
+        with self._lock:
+            self._indexes[project_id] = (snapshot.version, index)
+        return index
+
+    def search(
+        self, db: Session, project_id: int, text: str, internal_sku: str | None = None, k: int = 5
+    ) -> list[RuleHit]:
+        return self.get(db, project_id).search(text, internal_sku, k)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._indexes.clear()
+
+    def rule_added(self, rule: models.KBRule, version: int) -> None:
+        index = self._advance(rule.project_id, version)
+        if index is not None:
+            with self._lock:
+                index.add(rule.id, rule.internal_sku, rule.text)
+
+    def rule_deleted(self, rule: models.KBRule, version: int) -> None:
+        index = self._advance(rule.project_id, version)
+        if index is not None:
+            with self._lock:
+                index.remove(rule.id)
+
+    def _advance(self, project_id: int, version: int) -> ProjectKBIndex | None:
+        """The cached index, retagged as ``version``, if it was at the version right before it."""
+        with self._lock:
+            cached = self._indexes.get(project_id)
+            if cached is None or cached[0] != version - 1:
+                self._indexes.pop(project_id, None)
+                return None
+            self._indexes[project_id] = (version, cached[1])
+            return cached[1]
+
+
+kb_indexes = KBIndexRegistry()
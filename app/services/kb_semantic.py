@@ -0,0 +1,245 @@
+from __future__ import annotations
+
+import logging
+import os
+import tempfile
+import threading
+import zlib
+from dataclasses import dataclass
+from typing import Iterable, Optional, Protocol
+
+import numpy as np
+from sqlalchemy.orm import Session
+
+from app.services.kb_index import tokenize
+from app.services.kb_snapshot import KBSnapshot, kb_snapshots
+from app.services.reply_cache import normalize_text
+
+logger = logging.getLogger(__name__)
+
+
+class Embedder(Protocol):
+    name: str
+    dim: int
+
+    def encode(self, texts: list[str]) -> np.ndarray:
+        """``(len(texts), dim)`` float32 matrix of L2-normalized rows."""
+
+
+def _normalize_rows(matrix: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+class HashingEmbedder:
+    """Signed feature hashing of character n-grams and stemmed words.
+
+    Needs no model download and is stable across processes (crc32, not
+    ``hash()``). Character n-grams tolerate inflections and typos the stemmer
+    misses, e.g. "маломерит" / "маломерка".
+    """
+
+    def __init__(self, dim: int = 512, ngrams: tuple[int, ...] = (3, 4, 5)) -> None:
+        self.dim = dim
+        self.ngrams = ngrams
+        self.name = f"hashing-{dim}-{'-'.join(map(str, ngrams))}"
+
+    def _features(self, text: str) -> Iterable[str]:
+        for word in tokenize(text):
+            yield f"w:{word}"
+        padded = f" {normalize_text(text)} "
+        for n in self.ngrams:
+            for start in range(len(padded) - n + 1):
+                yield padded[start:start + n]
+
+    def encode(self, texts: list[str]) -> np.ndarray:
+        matrix = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            hashes = np.fromiter(
+                (zlib.crc32(feature.encode("utf-8")) for feature in self._features(text)), dtype=np.uint32
+            )
+            if hashes.size:
+                signs = np.where(hashes & 0x80000000, 1.0, -1.0)
+                matrix[row] = np.bincount(hashes % self.dim, weights=signs, minlength=self.dim)
+        return _normalize_rows(matrix)
+
+
+class SentenceEmbedder:
+    """Small CPU sentence-transformers model, e.g. ``cointegrated/rubert-tiny2``."""
+
+    def __init__(self, model_name: str, batch_size: int = 64) -> None:
+        from sentence_transformers import SentenceTransformer
+
+        self.model = SentenceTransformer(model_name, device="cpu")
+        self.batch_size = batch_size
+        self.name = model_name
+        self.dim = self.model.get_sentence_embedding_dimension()
+
+    def encode(self, texts: list[str]) -> np.ndarray:
+        vectors = self.model.encode(
+            texts, batch_size=self.batch_size, normalize_embeddings=True, convert_to_numpy=True
+        )
+        return np.asarray(vectors, dtype=np.float32)
+
+
+def build_embedder(settings) -> Embedder:
+    if settings.kb_embedding_model:
+        try:
+            return SentenceEmbedder(settings.kb_embedding_model)
+        except ImportError:
+            logger.warning("sentence-transformers is not installed, falling back to hashed n-gram vectors")
+    return HashingEmbedder(settings.kb_embedding_dim)
+
+
+@dataclass
+class ProjectVectors:
+    """One project's rule vectors; ``skus`` holds ``""`` for project-wide rules.
+
+    ``version`` is the KB version the vectors match, ``-1`` when unknown.
+    """
+
+    ids: np.ndarray
+    skus: np.ndarray
+    vectors: np.ndarray
+    version: int = -1
+
+    @classmethod
+    def empty(cls, dim: int) -> "ProjectVectors":
+        return cls(np.empty(0, dtype=np.int64), np.empty(0, dtype=str), np.empty((0, dim), dtype=np.float32))
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def save(self, path: str, model: str) -> None:
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path) or ".", suffix=".npz")
+        try:
+            with os.fdopen(fd, "wb") as handle:
+                np.savez(
+                    handle,
+                    ids=self.ids,
+                    skus=self.skus,
+                    vectors=self.vectors,
+                    model=np.array(model),
+                    version=np.array(self.version),
+                )
+            os.replace(tmp, path)
+        except BaseException:
+            try:
+                os.unlink(tmp)
+            except FileNotFoundError:
+                pass
+            raise
+
+    @classmethod
+    def load(cls, path: str, model: str) -> Optional["ProjectVectors"]:
+        """Vectors saved by the same embedder, or ``None`` when missing or stale."""
+        try:
+            with np.load(path, allow_pickle=False) as data:
+                if str(data["model"]) != model:
+                    return None
+                version = int(data["version"]) if "version" in data.files else -1
+                return cls(data["ids"], data["skus"], data["vectors"], version)
+        except FileNotFoundError:
+            return None
+        except (OSError, KeyError, ValueError):
+            logger.warning("Ignoring unreadable KB vectors at %s", path, exc_info=True)
+            return None
+
+
+class SemanticKBIndex:
+    """Cosine top-k over KB rule embeddings, one NumPy matrix per project.
+
+    When a project's KB version moves, its matrix is brought up to date with
+    the snapshot by rule id: deleted rules are dropped and only new rules
+    are embedded. With a ``directory``
+    the matrix is saved as ``<project_id>.npz`` after every change so other
+    workers and restarts load it instead of re-embedding the whole KB.
+    """
+
+    def __init__(self, embedder: Embedder, directory: str = "", min_score: float = 0.0) -> None:
+        self.embedder = embedder
+        self.directory = directory
+        self.min_score = min_score
+        self._projects: dict[int, ProjectVectors] = {}
+        self._lock = threading.Lock()
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    def _path(self, project_id: int) -> str:
+        return os.path.join(self.directory, f"{project_id}.npz")
+
+    def get(self, db: Session, project_id: int) -> ProjectVectors:
+        vectors = self._projects.get(project_id)
+        if vectors is None and self.directory:
+            vectors = ProjectVectors.load(self._path(project_id), self.embedder.name)
+        if vectors is None:
+            vectors = ProjectVectors.empty(self.embedder.dim)
+        snapshot = kb_snapshots.get(db, project_id)
+        if vectors.version != snapshot.version:
+            vectors = self._sync(snapshot, vectors)
+            if self.directory:
+                vectors.save(self._path(project_id), self.embedder.name)
+        with self._lock:
+            self._projects[project_id] = vectors
+        return vectors
+
+    def _sync(self, snapshot: KBSnapshot, vectors: ProjectVectors) -> ProjectVectors:
+        keep = np.fromiter(
+            (int(rule_id) in snapshot.by_id for rule_id in vectors.ids), dtype=bool, count=len(vectors)
+        )
+        known = set(vectors.ids.tolist())
+        new = [rule for rule in snapshot.rules if rule.id not in known]
+        if new:
+            embedded = self.embedder.encode([rule.text for rule in new])
+        else:
+            embedded = np.empty((0, vectors.vectors.shape[1]), dtype=np.float32)
+        return ProjectVectors(
+            np.concatenate([vectors.ids[keep], np.array([rule.id for rule in new], dtype=np.int64)]),
+            np.concatenate([vectors.skus[keep], np.array([rule.internal_sku or "" for rule in new], dtype=str)]),
+            np.vstack([vectors.vectors[keep], embedded.astype(np.float32)]),
+            snapshot.version,
+        )
+
+    def search_batch(
+        self,
+        db: Session,
+        queries: list[tuple[int, str | None, str]],
+        k: int = 5,
+        min_score: float | None = None,
+    ) -> list[list[tuple[float, int]]]:
+        """Top ``k`` ``(score, rule_id)`` pairs for each ``(project_id, internal_sku, text)`` query.
+
+        All query texts are embedded in one call; each project then scores its
+        queries with a single matrix product, limited to project-wide rules and
+        the query's SKU. Hits at or below ``min_score`` (the index default when
+        not given) are dropped.
+        """
+        min_score = self.min_score if min_score is None else min_score
+        results: list[list[tuple[float, int]]] = [[] for _ in queries]
+        if not queries or k <= 0:
+            return results
+        encoded = self.embedder.encode([text for _, _, text in queries])
+        by_project: dict[int, list[int]] = {}
+        for position, (project_id, _, _) in enumerate(queries):
+            by_project.setdefault(project_id, []).append(position)
+        for project_id, positions in by_project.items():
+            vectors = self.get(db, project_id)
+            if not len(vectors):
+                continue
+            scores = encoded[positions] @ vectors.vectors.T
+            wanted = np.array([queries[position][1] or "" for position in positions], dtype=str)
+            allowed = (vectors.skus == "")[None, :] | (vectors.skus[None, :] == wanted[:, None])
+            scores[~allowed] = -np.inf
+            top = min(k, scores.shape[1])
+            best = np.argpartition(-scores, top - 1, axis=1)[:, :top]
+            for row, position in enumerate(positions):
+                order = best[row][np.argsort(-scores[row, best[row]], kind="stable")]
+                results[position] = [
+                    (float(scores[row, col]), int(vectors.ids[col])) for col in order if scores[row, col] > min_score
+                ]
+        return results
+
+
+def build_semantic_index(settings) -> SemanticKBIndex:
+    return SemanticKBIndex(build_embedder(settings), settings.kb_vector_dir, settings.kb_semantic_min_score)
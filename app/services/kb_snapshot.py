@@ -0,0 +1,193 @@
+from __future__ import annotations
+
+import hashlib
+import logging
+import threading
+import time
+from datetime import datetime
+from typing import Iterable
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from app import models
+
+logger = logging.getLogger(__name__)
+
+INVALIDATION_CHANNEL = "kb:invalidate"
+
+
+class KBRuleView:
+    """Read-only copy of a :class:`models.KBRule`, detached from any session."""
+
+    __slots__ = ("id", "project_id", "internal_sku", "rule_type", "text", "created_at")
+
+    id: int
+    project_id: int
+    internal_sku: str | None
+    rule_type: str
+    text: str
+    created_at: datetime | None
+
+    def __init__(self, rule: models.KBRule) -> None:
+        for name in self.__slots__:
+            object.__setattr__(self, name, getattr(rule, name))
+
+    def __setattr__(self, name, value):
+        raise AttributeError(f"{type(self).__name__} is read-only")
+
+    def __repr__(self) -> str:
+        return f"KBRuleView(id={self.id}, internal_sku={self.internal_sku!r})"
+
+
+class KBSnapshot:
+    """Immutable view of one project's KB at ``version``.
+
+    Rules are kept in id order with lookups by id and by SKU (``None`` for
+    project-wide rules), plus a digest per SKU scope for reply cache keys.
+    """
+
+    __slots__ = ("project_id", "version", "rules", "by_id", "by_sku", "_digests", "_project_digest")
+
+    def __init__(self, project_id: int, version: int, rules: Iterable[models.KBRule]) -> None:
+        views = tuple(sorted((KBRuleView(rule) for rule in rules), key=lambda view: view.id))
+        by_sku: dict[str | None, list[KBRuleView]] = {}
+        for view in views:
+            by_sku.setdefault(view.internal_sku or None, []).append(view)
+        base = hashlib.blake2b(digest_size=8)
+        for view in by_sku.get(None, ()):
+            base.update(f"{view.id}\x1f{view.text}\x1e".encode("utf-8"))
+        digests = {}
+        for sku, scoped in by_sku.items():
+            if sku is None:
+                continue
+            digest = base.copy()
+            for view in scoped:
+                digest.update(f"{view.id}\x1f{view.text}\x1e".encode("utf-8"))
+            digests[sku] = digest.hexdigest()
+        setattr_ = object.__setattr__
+        setattr_(self, "project_id", project_id)
+        setattr_(self, "version", version)
+        setattr_(self, "rules", views)
+        setattr_(self, "by_id", {view.id: view for view in views})
+        setattr_(self, "by_sku", {sku: tuple(scoped) for sku, scoped in by_sku.items()})
+        setattr_(self, "_digests", digests)
+        setattr_(self, "_project_digest", base.hexdigest())
+
+    def __setattr__(self, name, value):
+        raise AttributeError(f"{type(self).__name__} is read-only")
+
+    def __len__(self) -> int:
+        return len(self.rules)
+
+    def rules_by_ids(self, rule_ids: Iterable[int]) -> list[KBRuleView]:
+        return [self.by_id[rule_id] for rule_id in rule_ids if rule_id in self.by_id]
+
+    def digest(self, internal_sku: str | None) -> str:
+        """Hash of the rules a reply for this SKU can draw on (project-wide and SKU rules)."""
+        if not internal_sku:
+            return self._project_digest
+        return self._digests.get(internal_sku, self._project_digest)
+
+
+def current_version(db: Session, project_id: int) -> int:
+    return db.scalar(select(models.Project.kb_version).where(models.Project.id == project_id)) or 0
+
+
+class KBSnapshotCache:
+    """Per-process cache of :class:`KBSnapshot`, one per project.
+
+    Rule writes bump ``projects.kb_version`` and publish ``<project_id>:<version>``
+    on ``channel``. While :meth:`listen` is subscribed, cached snapshots are
+    served without touching the database and a message only marks its project
+    stale; otherwise every lookup compares the cached version with the
+    project row first. A dropped subscription clears the cache, since
+    messages may have been missed.
+    """
+
+    def __init__(self, channel: str = INVALIDATION_CHANNEL, retry_seconds: float = 1.0) -> None:
+        self.channel = channel
+        self.retry_seconds = retry_seconds
+        self.redis = None
+        self._snapshots: dict[int, KBSnapshot] = {}
+        self._latest: dict[int, int] = {}
+        self._listening = threading.Event()
+        self._listener: threading.Thread | None = None
+        self._lock = threading.Lock()
+
+    def get(self, db: Session, project_id: int) -> KBSnapshot:
+        snapshot = self._snapshots.get(project_id)
+        if snapshot is not None and snapshot.version >= self._latest.get(project_id, 0):
+            if self._listening.is_set():
+                return snapshot
+            version = current_version(db, project_id)
+            if snapshot.version == version:
+                return snapshot
+        else:
+            version = current_version(db, project_id)
+        rules = db.scalars(
+            select(models.KBRule).where(models.KBRule.project_id == project_id).order_by(models.KBRule.id)
+        ).all()
+        snapshot = KBSnapshot(project_id, version, rules)
+        with self._lock:
+            self._snapshots[project_id] = snapshot
+        return snapshot
+
+    def invalidate(self, project_id: int, version: int | None = None) -> None:
+        with self._lock:
+            if version is None:
+                self._snapshots.pop(project_id, None)
+            else:
+                self._latest[project_id] = max(version, self._latest.get(project_id, 0))
+                snapshot = self._snapshots.get(project_id)
+                if snapshot is not None and snapshot.version < version:
+                    del self._snapshots[project_id]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._snapshots.clear()
+            self._latest.clear()
+
+    def publish(self, project_id: int, version: int) -> None:
+        """Drop this process's copy and tell the other processes about ``version``."""
+        self.invalidate(project_id)
+        self.invalidate(project_id, version)
+        if self.redis is None:
+            return
+        try:
+            self.redis.publish(self.channel, f"{project_id}:{version}")
+        except Exception:
+            logger.warning("KB invalidation publish failed", exc_info=True)
+
+    def handle_message(self, data: bytes | str) -> None:
+        raw = data.decode("utf-8") if isinstance(data, bytes) else data
+        project_id, _, version = raw.partition(":")
+        self.invalidate(int(project_id), int(version) if version else None)
+
+    def listen(self, redis) -> None:
+        """Subscribe to invalidations on a daemon thread (once per process)."""
+        self.redis = redis
+        if self._listener is not None:
+            return
+        self._listener = threading.Thread(target=self._listen_forever, name="kb-invalidations", daemon=True)
+        self._listener.start()
+
+    def _listen_forever(self) -> None:
+        while True:
+            pubsub = self.redis.pubsub(ignore_subscribe_messages=True)
+            try:
+                pubsub.subscribe(self.channel)
+                self.clear()
+                self._listening.set()
+                for message in pubsub.listen():
+                    if message.get("type") == "message":
+                        self.handle_message(message["data"])
+            except Exception:
+                logger.warning("KB invalidation subscription lost", exc_info=True)
+            finally:
+                self._listening.clear()
+                pubsub.close()
+            time.sleep(self.retry_seconds)
+
+
+kb_snapshots = KBSnapshotCache()
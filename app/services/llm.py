@@ -1,6 +1,257 @@
+from __future__ import annotations
+
+import asyncio
+import json
+import threading
+from abc import ABC, abstractmethod
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Optional
+
+import httpx
+
 from app.schemas import LLMResponse
 
 
 class LLMAdapter:
     def generate(self, prompt: str) -> LLMResponse:
         return LLMResponse(text="", confidence=0, kb_rule_ids=[], conflict=False)
+
+    def generate_batch(
+        self, prompts: list[str], project_ids: Optional[list[int]] = None
+    ) -> list[LLMResponse | Exception]:
+        """One response per prompt, in order; a failed prompt gets its exception instead.
+
+        Providers with a batch endpoint send the prompts in one request.
+        """
+        responses: list[LLMResponse | Exception] = []
+        for prompt in prompts:
+            try:
+                responses.append(self.generate(prompt))
+            except Exception as exc:
+                responses.append(exc)
+        return responses
+
+
+class AsyncLLMAdapter(ABC):
+    """Non-blocking LLM provider client, meant to live for the whole process.
+
+    Requests are capped per provider (``max_in_flight``) and per project
+    (``max_in_flight_per_project``) so one busy project cannot starve the rest.
+    Each generation gets ``timeout`` seconds overall; if an attempt has not
+    answered after ``hedge_after`` seconds (or fails) another one is started,
+    up to ``max_attempts``, and the first success wins.
+    """
+
+    def __init__(
+        self,
+        max_in_flight: int = 256,
+        max_in_flight_per_project: int = 16,
+        timeout: float = 30.0,
+        hedge_after: Optional[float] = None,
+        max_attempts: int = 2,
+    ) -> None:
+        if max_attempts < 1:
+            raise ValueError("max_attempts must be at least 1")
+        self.max_in_flight_per_project = max_in_flight_per_project
+        self.timeout = timeout
+        self.hedge_after = hedge_after
+        self.max_attempts = max_attempts
+        self._slots = asyncio.Semaphore(max_in_flight)
+        self._project_slots: dict[int, asyncio.Semaphore] = {}
+
+    @abstractmethod
+    async def _complete(self, prompt: str) -> LLMResponse:
+        """Run one completion request."""
+
+    async def _stream(self, prompt: str) -> AsyncIterator[str]:
+        """Yield the reply in chunks; providers without streaming send it whole."""
+        yield (await self._complete(prompt)).text
+
+    async def aclose(self) -> None:
+        pass
+
+    @asynccontextmanager
+    async def _slot(self, project_id: Optional[int]):
+        project_slot = None
+        if project_id is not None:
+            project_slot = self._project_slots.setdefault(
+                project_id, asyncio.Semaphore(self.max_in_flight_per_project)
+            )
+            await project_slot.acquire()
+        try:
+            async with self._slots:
+                yield
+        finally:
+            if project_slot is not None:
+                project_slot.release()
+
+    async def _hedged(self, prompt: str) -> LLMResponse:
+        pending: set[asyncio.Task] = set()
+        errors: list[BaseException] = []
+        try:
+            for attempt in range(self.max_attempts):
+                pending.add(asyncio.create_task(self._complete(prompt)))
+                last = attempt == self.max_attempts - 1
+                while pending:
+                    done, pending = await asyncio.wait(
+                        pending,
+                        timeout=None if last else self.hedge_after,
+                        return_when=asyncio.FIRST_COMPLETED,
+                    )
+                    for task in done:
+                        if task.exception() is None:
+                            return task.result()
+                        errors.append(task.exception())
+                    if not last:
+                        break
+            raise errors[-1]
+        finally:
+            for task in pending:
+                task.cancel()
+
+    async def generate(self, prompt: str, project_id: Optional[int] = None) -> LLMResponse:
+        async with self._slot(project_id):
+            return await asyncio.wait_for(self._hedged(prompt), self.timeout)
+
+    async def generate_batch(
+        self, prompts: list[str], project_ids: Optional[list[int]] = None
+    ) -> list[LLMResponse | Exception]:
+        """One response per prompt, in order; a prompt that failed or timed out gets its exception instead."""
+        project_ids = project_ids or [None] * len(prompts)
+        results = await asyncio.gather(
+            *(self.generate(prompt, project_id) for prompt, project_id in zip(prompts, project_ids)),
+            return_exceptions=True,
+        )
+        for result in results:
+            if isinstance(result, BaseException) and not isinstance(result, Exception):
+                raise result
+        return list(results)
+
+    async def stream(self, prompt: str, project_id: Optional[int] = None) -> AsyncIterator[str]:
+        """Yield partial reply text as the provider produces it (no hedging)."""
+        async with self._slot(project_id):
+            async for chunk in self._stream(prompt):
+                yield chunk
+
+
+class HTTPLLMAdapter(AsyncLLMAdapter):
+    """OpenAI-compatible ``/chat/completions`` provider over one pooled ``httpx.AsyncClient``."""
+
+    def __init__(
+        self,
+        base_url: str,
+        api_key: str,
+        model: str,
+        client: Optional[httpx.AsyncClient] = None,
+        **limits,
+    ) -> None:
+        super().__init__(**limits)
+        self.model = model
+        max_in_flight = limits.get("max_in_flight", 256)
+        self._client = client or httpx.AsyncClient(
+            base_url=base_url.rstrip("/"),
+            headers={"Authorization": f"Bearer {api_key}"},
+            timeout=httpx.Timeout(self.timeout, connect=5.0),
+            limits=httpx.Limits(max_connections=max_in_flight, max_keepalive_connections=max_in_flight),
+        )
+
+    def _payload(self, prompt: str, stream: bool = False) -> dict:
+        return {
+            "model": self.model,
+            "messages": [{"role": "user", "content": prompt}],
+            "stream": stream,
+        }
+
+    async def _complete(self, prompt: str) -> LLMResponse:
+        response = await self._client.post("/chat/completions", json=self._payload(prompt))
+        response.raise_for_status()
+        text = response.json()["choices"][0]["message"]["content"] or ""
+        return LLMResponse(text=text, confidence=0, kb_rule_ids=[], conflict=False)
+
+    async def _stream(self, prompt: str) -> AsyncIterator[str]:
+        async with self._client.stream("POST", "/chat/completions", json=self._payload(prompt, stream=True)) as response:
+            response.raise_for_status()
+            async for line in response.aiter_lines():
+                if not line.startswith("data:"):
+                    continue
+                data = line[len("data:"):].strip()
+                if data == "[DONE]":
+                    return
+                delta = json.loads(data)["choices"][0].get("delta", {}).get("content")
+                if delta:
+                    yield delta
+
+    async def aclose(self) -> None:
+        await self._client.aclose()
+
+
+class StubLLMAdapter(AsyncLLMAdapter):
+    """Async face of the placeholder :class:`LLMAdapter`, used until a provider is configured."""
+
+    async def _complete(self, prompt: str) -> LLMResponse:
+        return LLMAdapter().generate(prompt)
+
+
+class BlockingLLMAdapter(LLMAdapter):
+    """Sync facade for Celery workers: runs an async adapter on a private event loop thread.
+
+    The loop, and with it the connection pool, lives as long as the worker
+    process, so a batch fans out to many concurrent requests.
+    """
+
+    def __init__(self, adapter: AsyncLLMAdapter) -> None:
+        self.adapter = adapter
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever, name="llm-loop", daemon=True)
+        self._thread.start()
+
+    def _run(self, coro):
+        return asyncio.run_coroutine_threadsafe(coro, self._loop).result()
+
+    def generate(self, prompt: str) -> LLMResponse:
+        return self._run(self.adapter.generate(prompt))
+
+    def generate_batch(
+        self, prompts: list[str], project_ids: Optional[list[int]] = None
+    ) -> list[LLMResponse | Exception]:
+        return self._run(self.adapter.generate_batch(prompts, project_ids))
+
+    def close(self) -> None:
+        self._run(self.adapter.aclose())
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+
+
+def build_async_adapter(settings) -> AsyncLLMAdapter:
+    if not settings.llm_api_url:
+        return StubLLMAdapter()
+    return HTTPLLMAdapter(
+        settings.llm_api_url,
+        settings.llm_api_key,
+        settings.llm_model,
+        max_in_flight=settings.llm_max_in_flight,
+        max_in_flight_per_project=settings.llm_max_in_flight_per_project,
+        timeout=settings.llm_timeout_seconds,
+        hedge_after=settings.llm_hedge_after_seconds or None,
+        max_attempts=settings.llm_max_attempts,
+    )
+
+
+def build_llm_adapter(settings) -> LLMAdapter:
+    """Process-wide adapter for workers: the configured provider, or the stub when none is set."""
+    if not settings.llm_api_url:
+        return LLMAdapter()
+    return BlockingLLMAdapter(build_async_adapter(settings))
+
+
+_async_adapter: Optional[AsyncLLMAdapter] = None
+
+
+def get_async_adapter() -> AsyncLLMAdapter:
+    """FastAPI dependency: the API process's shared async adapter."""
+    global _async_adapter
+    if _async_adapter is None:
+        from app.config import settings
+
+        _async_adapter = build_async_adapter(settings)
+    return _async_adapter
@@ -0,0 +1,120 @@
+from __future__ import annotations
+
+import heapq
+from dataclasses import dataclass
+from typing import Iterable
+
+CLAIM_DUE_SCRIPT = """
+local due = redis.call('ZRANGEBYSCORE', KEYS[1], '-inf', ARGV[1], 'LIMIT', 0, ARGV[2])
+for _, member in ipairs(due) do
+    redis.call('ZADD', KEYS[1], ARGV[3], member)
+end
+return due
+"""
+
+
+@dataclass(frozen=True)
+class AdaptiveBackoff:
+    """Per-cabinet poll interval: halve after new events, double while idle.
+
+    ``max_interval`` caps the back-off so a dormant cabinet is still polled
+    well inside the 5-minute SLA (publication to drafted reply).
+    """
+
+    base: float = 60.0
+    min_interval: float = 15.0
+    max_interval: float = 240.0
+
+    def next(self, current: float, new_events: int | None) -> float:
+        if new_events is None:
+            return current
+        if new_events > 0:
+            return max(self.min_interval, current / 2)
+        return min(self.max_interval, current * 2)
+
+
+class HeapPollScheduler:
+    """In-process schedule of cabinets keyed by next due time (binary heap)."""
+
+    def __init__(self, backoff: AdaptiveBackoff | None = None) -> None:
+        self.backoff = backoff or AdaptiveBackoff()
+        self._heap: list[tuple[float, int]] = []
+        self._due_at: dict[int, float] = {}
+        self._intervals: dict[int, float] = {}
+
+    def _push(self, cabinet_id: int, due_at: float) -> None:
+        self._due_at[cabinet_id] = due_at
+        heapq.heappush(self._heap, (due_at, cabinet_id))
+
+    def sync(self, cabinet_ids: Iterable[int], now: float) -> None:
+        for cabinet_id in cabinet_ids:
+            if cabinet_id not in self._due_at:
+                self._intervals[cabinet_id] = self.backoff.base
+                self._push(cabinet_id, now)
+
+    def remove(self, cabinet_id: int) -> None:
+        self._due_at.pop(cabinet_id, None)
+        self._intervals.pop(cabinet_id, None)
+
+    def interval(self, cabinet_id: int) -> float:
+        return self._intervals.get(cabinet_id, self.backoff.base)
+
+    def due(self, now: float, limit: int | None = None) -> list[int]:
+        """Claim cabinets due by ``now``; each stays claimed for ``max_interval`` until recorded."""
+        claimed: list[int] = []
+        while self._heap and self._heap[0][0] <= now and (limit is None or len(claimed) < limit):
+            due_at, cabinet_id = heapq.heappop(self._heap)
+            if self._due_at.get(cabinet_id) != due_at:
+                continue
+            claimed.append(cabinet_id)
+        for cabinet_id in claimed:
+            self._push(cabinet_id, now + self.backoff.max_interval)
+        return claimed
+
+    def record(self, cabinet_id: int, new_events: int | None, now: float) -> float:
+        interval = self.backoff.next(self.interval(cabinet_id), new_events)
+        self._intervals[cabinet_id] = interval
+        self._push(cabinet_id, now + interval)
+        return interval
+
+
+class RedisPollScheduler:
+    """The same schedule kept in a Redis ZSET (score = due time) so every worker shares it."""
+
+    def __init__(self, redis, backoff: AdaptiveBackoff | None = None, prefix: str = "poll") -> None:
+        self.redis = redis
+        self.backoff = backoff or AdaptiveBackoff()
+        self.due_key = f"{prefix}:due"
+        self.interval_key = f"{prefix}:interval"
+        self._claim = redis.register_script(CLAIM_DUE_SCRIPT)
+
+    def sync(self, cabinet_ids: Iterable[int], now: float) -> None:
+        mapping = {str(cabinet_id): now for cabinet_id in cabinet_ids}
+        if mapping:
+            self.redis.zadd(self.due_key, mapping, nx=True)
+
+    def remove(self, cabinet_id: int) -> None:
+        pipe = self.redis.pipeline()
+        pipe.zrem(self.due_key, cabinet_id)
+        pipe.hdel(self.interval_key, cabinet_id)
+        pipe.execute()
+
+    def interval(self, cabinet_id: int) -> float:
+        raw = self.redis.hget(self.interval_key, cabinet_id)
+        return float(raw) if raw is not None else self.backoff.base
+
+    def due(self, now: float, limit: int | None = None) -> list[int]:
+        """Atomically claim due cabinets by pushing their score ``max_interval`` ahead."""
+        claimed = self._claim(
+            keys=[self.due_key],
+            args=[now, limit if limit is not None else -1, now + self.backoff.max_interval],
+        )
+        return [int(member) for member in claimed]
+
+    def record(self, cabinet_id: int, new_events: int | None, now: float) -> float:
+        interval = self.backoff.next(self.interval(cabinet_id), new_events)
+        pipe = self.redis.pipeline()
+        pipe.hset(self.interval_key, cabinet_id, interval)
+        pipe.zadd(self.due_key, {str(cabinet_id): now + interval})
+        pipe.execute()
+        return interval
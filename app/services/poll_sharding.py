@@ -0,0 +1,72 @@
+from __future__ import annotations
+
+import bisect
+import hashlib
+import time
+from collections import defaultdict
+from typing import Callable, Iterable
+
+
+def _hash(value: str) -> int:
+    return int.from_bytes(hashlib.blake2b(value.encode("utf-8"), digest_size=8).digest(), "big")
+
+
+class HashRing:
+    """Consistent-hash ring of polling nodes.
+
+    Each node gets ``vnodes`` points on the ring, so when a node joins or
+    leaves only ~1/N of the cabinets change owner.
+    """
+
+    def __init__(self, nodes: Iterable[str], vnodes: int = 64) -> None:
+        self.nodes = sorted(set(nodes))
+        points = sorted(
+            (_hash(f"{node}#{replica}"), node) for node in self.nodes for replica in range(vnodes)
+        )
+        self._hashes = [point for point, _ in points]
+        self._owners = [node for _, node in points]
+
+    def owner(self, key: int | str) -> str:
+        if not self._hashes:
+            raise LookupError("Hash ring is empty")
+        index = bisect.bisect(self._hashes, _hash(str(key))) % len(self._hashes)
+        return self._owners[index]
+
+    def partition(self, keys: Iterable[int]) -> dict[str, list[int]]:
+        shards: dict[str, list[int]] = defaultdict(list)
+        for key in keys:
+            shards[self.owner(key)].append(key)
+        return dict(shards)
+
+
+class RedisMembership:
+    """Live polling nodes tracked as heartbeats in a Redis ZSET (score = last beat)."""
+
+    def __init__(
+        self,
+        redis,
+        ttl: float = 30.0,
+        key: str = "poll:nodes",
+        clock: Callable[[], float] = time.time,
+    ) -> None:
+        self.redis = redis
+        self.ttl = ttl
+        self.key = key
+        self.clock = clock
+
+    def heartbeat(self, node: str) -> None:
+        now = self.clock()
+        pipe = self.redis.pipeline()
+        pipe.zadd(self.key, {node: now})
+        pipe.zremrangebyscore(self.key, "-inf", now - self.ttl)
+        pipe.execute()
+
+    def leave(self, node: str) -> None:
+        self.redis.zrem(self.key, node)
+
+    def members(self) -> list[str]:
+        raw = self.redis.zrangebyscore(self.key, self.clock() - self.ttl, "+inf")
+        return [item.decode("utf-8") if isinstance(item, bytes) else item for item in raw]
+
+    def ring(self) -> HashRing:
+        return HashRing(self.members())
@@ -0,0 +1,354 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import AsyncIterator, Callable, Iterable
+
+import httpx
+from sqlalchemy.orm import Session
+
+from app import crud
+from app.config import settings
+from app.db import SessionLocal
+from app.marketplace.base import AsyncMarketplaceClient
+from app.marketplace.clients import AsyncOzonClient, AsyncWBClient
+from app.marketplace.models import MarketplaceQuestion, MarketplaceReview, Page
+from app.marketplace.ratelimit import LocalTokenBucket, RateLimiter, RedisTokenBucket, WaitMetrics
+from app.security import decrypt_token
+from app.services.poll_schedule import HeapPollScheduler, RedisPollScheduler
+from app.services.sentiment import sentiment_for_rating
+
+logger = logging.getLogger(__name__)
+
+SessionFactory = Callable[[], Session]
+
+rate_limit_metrics = WaitMetrics()
+local_rate_limiter = LocalTokenBucket(rate_limit_metrics)
+
+
+@dataclass(frozen=True)
+class PollTarget:
+    cabinet_id: int
+    project_id: int
+    marketplace: str
+    api_token: str
+    reviews_since: datetime | None
+    questions_since: datetime | None
+
+
+@dataclass
+class PollSummary:
+    cabinets: int = 0
+    created: int = 0
+    duplicates: int = 0
+    failed: int = 0
+    new_events: dict[int, int] = field(default_factory=dict)
+    rate_limit: dict = field(default_factory=dict)
+
+
+@asynccontextmanager
+async def shared_rate_limiter(limiter: RateLimiter | None = None) -> AsyncIterator[RateLimiter]:
+    """The limiter cabinet quotas are drawn from: ``limiter`` if given, else Redis-backed or in-process per settings."""
+    if limiter is not None:
+        yield limiter
+        return
+    if not settings.marketplace_rate_limit_redis:
+        yield local_rate_limiter
+        return
+    from redis.asyncio import Redis
+
+    redis = Redis.from_url(settings.redis_url)
+    try:
+        yield RedisTokenBucket(redis, rate_limit_metrics)
+    finally:
+        await redis.aclose()
+
+
+def build_client(
+    target: PollTarget,
+    http: httpx.AsyncClient,
+    limiter: RateLimiter | None = None,
+    **limits,
+) -> AsyncMarketplaceClient:
+    """Client for ``target``; ``limits`` override the live-polling limiter key and rate."""
+    options = {"limiter": limiter, "limiter_key": f"{target.marketplace}:{target.cabinet_id}"}
+    if target.marketplace == "WB":
+        options.update(rate_per_second=settings.wb_rate_per_second, burst=settings.wb_rate_burst)
+        return AsyncWBClient(target.api_token, http, base_url=settings.wb_api_base_url, **{**options, **limits})
+    if target.marketplace == "OZON":
+        options.update(rate_per_second=settings.ozon_rate_per_second, burst=settings.ozon_rate_burst)
+        return AsyncOzonClient(
+            target.api_token, http, base_url=settings.ozon_api_base_url, **{**options, **limits}
+        )
+    raise ValueError(f"Unsupported marketplace: {target.marketplace}")
+
+
+def load_targets(db: Session, cabinet_ids: list[int] | None = None) -> list[PollTarget]:
+    return [
+        PollTarget(
+            cabinet_id=cabinet.id,
+            project_id=cabinet.project_id,
+            marketplace=cabinet.marketplace,
+            api_token=decrypt_token(cabinet.api_token_encrypted),
+            reviews_since=cabinet.reviews_since,
+            questions_since=cabinet.questions_since,
+        )
+        for cabinet in crud.list_all_cabinets(db, cabinet_ids)
+    ]
+
+
+def _latest(items: Iterable[MarketplaceReview | MarketplaceQuestion]) -> datetime | None:
+    return max((item.created_at for item in items if item.created_at), default=None)
+
+
+def event_rows(
+    project_id: int,
+    cabinet_id: int,
+    marketplace: str,
+    reviews: list[MarketplaceReview],
+    questions: list[MarketplaceQuestion],
+    internal_skus: dict[str, str],
+) -> list[dict]:
+    def base(sku: str | None) -> dict:
+        return {
+            "project_id": project_id,
+            "cabinet_id": cabinet_id,
+            "marketplace": marketplace,
+            "internal_sku": internal_skus.get(sku or "", sku or ""),
+        }
+
+    rows = [
+        {
+            **base(review.sku),
+            "marketplace_event_id": review.marketplace_review_id,
+            "event_type": "review",
+            "text": review.text,
+            "rating": review.rating,
+            "sentiment": sentiment_for_rating(review.rating),
+            "raw_payload": dict(review.raw_payload),
+        }
+        for review in reviews
+    ]
+    rows.extend(
+        {
+            **base(question.sku),
+            "marketplace_event_id": question.marketplace_question_id,
+            "event_type": "question",
+            "text": question.text,
+            "rating": None,
+            "sentiment": None,
+            "raw_payload": dict(question.raw_payload),
+        }
+        for question in questions
+    )
+    return rows
+
+
+def persist_page(
+    session_factory: SessionFactory,
+    target: PollTarget,
+    reviews: list[MarketplaceReview],
+    questions: list[MarketplaceQuestion],
+) -> tuple[int, int]:
+    """Store one page of a cabinet's listing in its own session, as a single bulk insert."""
+    if not reviews and not questions:
+        return 0, 0
+    db = session_factory()
+    try:
+        item_ids = sorted({item.sku for item in (*reviews, *questions) if item.sku})
+        internal_skus = crud.internal_skus_by_item_id(db, target.project_id, target.marketplace, item_ids)
+        rows = event_rows(
+            target.project_id, target.cabinet_id, target.marketplace, reviews, questions, internal_skus
+        )
+        created, duplicates = crud.create_events_bulk(db, rows)
+        return len(created), len(duplicates)
+    finally:
+        db.close()
+
+
+def advance_watermarks(
+    session_factory: SessionFactory,
+    target: PollTarget,
+    polled_at: datetime,
+    reviews_since: datetime | None,
+    questions_since: datetime | None,
+) -> None:
+    db = session_factory()
+    try:
+        crud.update_cabinet_watermarks(
+            db,
+            target.cabinet_id,
+            polled_at,
+            reviews_since=reviews_since,
+            questions_since=questions_since,
+        )
+    finally:
+        db.close()
+
+
+async def ingest_pages(
+    pages: AsyncIterator[Page],
+    persist: Callable[[list], tuple[int, int]],
+) -> tuple[int, int, datetime | None]:
+    """Write each page as it arrives, so only one page per listing is held in memory."""
+    created = duplicates = 0
+    latest: datetime | None = None
+    async for page in pages:
+        page_created, page_duplicates = await asyncio.to_thread(persist, page.items)
+        created += page_created
+        duplicates += page_duplicates
+        latest = max(filter(None, (latest, _latest(page.items))), default=None)
+    return created, duplicates, latest
+
+
+async def poll_cabinet(
+    target: PollTarget,
+    http: httpx.AsyncClient,
+    semaphore: asyncio.Semaphore,
+    session_factory: SessionFactory,
+    limiter: RateLimiter | None = None,
+) -> tuple[int, int]:
+    """Stream both listings page by page, then advance the watermarks.
+
+    Watermarks move only after every page was written; if a listing fails
+    halfway the next poll re-reads the window and the dedupe constraint
+    drops the pages already stored.
+    """
+    client = build_client(target, http, limiter)
+    async with semaphore:
+        polled_at = datetime.utcnow()
+        reviews, questions = await asyncio.gather(
+            ingest_pages(
+                client.iter_reviews(since=target.reviews_since),
+                lambda items: persist_page(session_factory, target, items, []),
+            ),
+            ingest_pages(
+                client.iter_questions(since=target.questions_since),
+                lambda items: persist_page(session_factory, target, [], items),
+            ),
+        )
+    await asyncio.to_thread(
+        advance_watermarks, session_factory, target, polled_at, reviews[2], questions[2]
+    )
+    return reviews[0] + questions[0], reviews[1] + questions[1]
+
+
+async def poll_all(
+    session_factory: SessionFactory = SessionLocal,
+    concurrency: int | None = None,
+    http: httpx.AsyncClient | None = None,
+    cabinet_ids: list[int] | None = None,
+    limiter: RateLimiter | None = None,
+) -> PollSummary:
+    """Poll cabinets (all, or ``cabinet_ids``) concurrently, at most ``concurrency`` talking to marketplaces at once."""
+    concurrency = concurrency or settings.poll_concurrency
+    db = session_factory()
+    try:
+        targets = load_targets(db, cabinet_ids)
+    finally:
+        db.close()
+    owns_http = http is None
+    if http is None:
+        http = httpx.AsyncClient(
+            timeout=settings.poll_timeout_seconds,
+            limits=httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency),
+        )
+    semaphore = asyncio.Semaphore(concurrency)
+    summary = PollSummary(cabinets=len(targets))
+    try:
+        async with shared_rate_limiter(limiter) as limiter:
+            results = await asyncio.gather(
+                *(poll_cabinet(target, http, semaphore, session_factory, limiter) for target in targets),
+                return_exceptions=True,
+            )
+    finally:
+        if owns_http:
+            await http.aclose()
+    for target, result in zip(targets, results):
+        if isinstance(result, BaseException):
+            summary.failed += 1
+            logger.warning("Polling cabinet %s failed: %r", target.cabinet_id, result)
+            continue
+        summary.created += result[0]
+        summary.duplicates += result[1]
+        summary.new_events[target.cabinet_id] = result[0]
+    summary.rate_limit = limiter.metrics.snapshot()
+    return summary
+
+
+Scheduler = HeapPollScheduler | RedisPollScheduler
+
+
+def claim_due_cabinets(
+    scheduler: Scheduler,
+    session_factory: SessionFactory = SessionLocal,
+    clock=time.time,
+) -> list[int]:
+    """Register new cabinets with the schedule and claim the ones whose interval has elapsed."""
+    db = session_factory()
+    try:
+        cabinet_ids = crud.list_cabinet_ids(
+            db,
+            webhook_fresh_seconds=settings.webhook_fresh_seconds,
+            safety_poll_seconds=settings.webhook_safety_poll_seconds,
+        )
+    finally:
+        db.close()
+    scheduler.sync(cabinet_ids, clock())
+    known = set(cabinet_ids)
+    due = []
+    for cabinet_id in scheduler.due(clock()):
+        if cabinet_id in known:
+            due.append(cabinet_id)
+        else:
+            scheduler.remove(cabinet_id)
+    return due
+
+
+def poll_claimed(
+    scheduler: Scheduler,
+    cabinet_ids: list[int],
+    session_factory: SessionFactory = SessionLocal,
+    clock=time.time,
+) -> PollSummary:
+    """Poll claimed cabinets and reschedule them from the number of new events.
+
+    Cabinets that produced new events are polled twice as often next time,
+    idle ones back off; failed polls keep their interval.
+    """
+    if not cabinet_ids:
+        return PollSummary()
+    summary = asyncio.run(poll_all(session_factory, cabinet_ids=cabinet_ids))
+    finished_at = clock()
+    for cabinet_id in cabinet_ids:
+        scheduler.record(cabinet_id, summary.new_events.get(cabinet_id), finished_at)
+    return summary
+
+
+def poll_scheduled(
+    scheduler: Scheduler,
+    session_factory: SessionFactory = SessionLocal,
+    clock=time.time,
+) -> PollSummary:
+    """Poll only the cabinets whose adaptive interval has elapsed, then reschedule them."""
+    due = claim_due_cabinets(scheduler, session_factory, clock)
+    return poll_claimed(scheduler, due, session_factory, clock)
+
+
+def summary_dict(summary: PollSummary) -> dict:
+    return {
+        "cabinets": summary.cabinets,
+        "created": summary.created,
+        "duplicates": summary.duplicates,
+        "failed": summary.failed,
+        "rate_limit": summary.rate_limit,
+    }
+
+
+def run_poll(scheduler: Scheduler | None = None) -> dict:
+    summary = asyncio.run(poll_all()) if scheduler is None else poll_scheduled(scheduler)
+    return summary_dict(summary)
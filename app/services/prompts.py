@@ -0,0 +1,238 @@
+from __future__ import annotations
+
+import hashlib
+import re
+import threading
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Iterable, Optional, Sequence
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from app import models
+from app.services.kb_snapshot import KBRuleView, kb_snapshots
+
+INSTRUCTIONS = (
+    "Ты помогаешь продавцу на маркетплейсе отвечать покупателям. "
+    "Ответь на отзыв или вопрос коротко, вежливо и по существу, на языке покупателя. "
+    "Опирайся только на правила магазина из запроса и не обещай того, чего в них нет; "
+    "если правил не хватает для ответа, поблагодари покупателя и предложи написать в поддержку."
+)
+
+RULES_HEADER = "Правила магазина:"
+
+# Word runs and single punctuation marks: BPE vocabularies almost never merge across them.
+_PIECES = re.compile(r"\w+|[^\w\s]", re.UNICODE)
+# Characters per token for word runs: Latin and digits pack into longer tokens than Cyrillic.
+ASCII_CHARS_PER_TOKEN = 4
+OTHER_CHARS_PER_TOKEN = 3
+
+
+def estimate_tokens(text: str) -> int:
+    """Approximate provider token count of ``text`` without a tokenizer.
+
+    Errs slightly high for Russian with cl100k/o200k-style vocabularies,
+    which is the safe side for a budget.
+    """
+    count = 0
+    for piece in _PIECES.findall(text):
+        per_token = ASCII_CHARS_PER_TOKEN if piece.isascii() else OTHER_CHARS_PER_TOKEN
+        count += -(-len(piece) // per_token)
+    return count
+
+
+_line_tokens = lru_cache(maxsize=100_000)(estimate_tokens)
+
+
+def truncate_tokens(text: str, limit: int) -> str:
+    """Longest leading part of ``text`` estimated at no more than ``limit`` tokens."""
+    count = 0
+    end = 0
+    for match in _PIECES.finditer(text):
+        piece = match.group()
+        per_token = ASCII_CHARS_PER_TOKEN if piece.isascii() else OTHER_CHARS_PER_TOKEN
+        count += -(-len(piece) // per_token)
+        if count > limit:
+            return text[:end].rstrip() + "…"
+        end = match.end()
+    return text
+
+
+@dataclass(frozen=True)
+class PromptPrefix:
+    """The part of a project's prompts that does not depend on the event."""
+
+    text: str
+    tokens: int
+    digest: str
+
+
+@dataclass(frozen=True)
+class Prompt:
+    text: str
+    tokens: int
+    prefix_tokens: int
+    rule_ids: tuple[int, ...]
+    # Identifies everything but the rules and the review text, for reply cache keys.
+    context: str
+
+
+class PromptBuilder:
+    """Assembles the LLM prompt of an event within ``max_tokens`` (estimated locally).
+
+    The static part (instructions and the project's tone) comes first and is
+    cached per project, so all requests of a project share a byte-identical
+    leading segment that providers with prompt prefix caching can reuse.
+    After it come the product name, the retrieved KB rules and, last, the
+    review itself. The review is always included, cut to
+    ``max_review_tokens`` or further if the prefix leaves less room; the
+    product name and then the rules, in relevance order, take whatever
+    budget is left. ``tokens`` never exceeds ``max_tokens``.
+    """
+
+    def __init__(self, max_tokens: int = 1500, max_review_tokens: int = 600, instructions: str = INSTRUCTIONS) -> None:
+        self.max_tokens = max_tokens
+        self.max_review_tokens = max_review_tokens
+        self.instructions = instructions
+        self._prefixes: dict[int, tuple[Optional[str], PromptPrefix]] = {}
+        self._lock = threading.Lock()
+
+    def prefix(self, project_id: int, tone: Optional[str]) -> PromptPrefix:
+        cached = self._prefixes.get(project_id)
+        if cached is not None and cached[0] == tone:
+            return cached[1]
+        text = self.instructions
+        if tone:
+            text += f"\nТон ответов бренда: {tone.strip()}"
+        prefix = PromptPrefix(
+            text=text,
+            tokens=estimate_tokens(text),
+            digest=hashlib.blake2b(text.encode("utf-8"), digest_size=8).hexdigest(),
+        )
+        with self._lock:
+            self._prefixes[project_id] = (tone, prefix)
+        return prefix
+
+    def clear(self) -> None:
+        with self._lock:
+            self._prefixes.clear()
+
+    def build(
+        self,
+        prefix: PromptPrefix,
+        event: models.Event,
+        product_name: Optional[str],
+        rules: Sequence[KBRuleView],
+    ) -> Prompt:
+        limit = self.max_review_tokens
+        review = _review_block(event, truncate_tokens(event.text or "", limit))
+        left = self.max_tokens - prefix.tokens - estimate_tokens(review)
+        while left < 0 and limit > 0:
+            limit = max(0, limit + left)
+            review = _review_block(event, truncate_tokens(event.text or "", limit))
+            left = self.max_tokens - prefix.tokens - estimate_tokens(review)
+        lines = [prefix.text, ""]
+        product = f"Товар: {product_name}" if product_name else ""
+        if product and _line_tokens(product) <= left:
+            lines.append(product)
+            left -= _line_tokens(product)
+        packed = []
+        for rule in rules:
+            line = f"- {rule.text}"
+            cost = _line_tokens(line) + (0 if packed else _line_tokens(RULES_HEADER))
+            if cost > left:
+                continue
+            if not packed:
+                lines.append(RULES_HEADER)
+            packed.append(rule.id)
+            lines.append(line)
+            left -= cost
+        lines.append(review)
+        text = "\n".join(lines)
+        if left < 0:
+            # Not even the prefix and the review's frame fit: hold the budget anyway.
+            text = truncate_tokens(text, self.max_tokens - 1)
+            left = self.max_tokens - estimate_tokens(text)
+        context = hashlib.blake2b(f"{prefix.digest}\x1f{product}".encode("utf-8"), digest_size=8).hexdigest()
+        return Prompt(
+            text=text,
+            tokens=self.max_tokens - left,
+            prefix_tokens=prefix.tokens,
+            rule_ids=tuple(packed),
+            context=context,
+        )
+
+    def build_batch(
+        self, db: Session, events: Sequence[models.Event], rule_ids: dict[int, list[int]]
+    ) -> list[Prompt]:
+        """Prompts for ``events`` in order, with ``rule_ids`` (by event id) in relevance order.
+
+        Tones and product names are loaded with one query each for the whole batch.
+        """
+        tones = _project_tones(db, {event.project_id for event in events})
+        products = _product_names(db, {(event.project_id, event.internal_sku) for event in events})
+        prompts = []
+        for event in events:
+            snapshot = kb_snapshots.get(db, event.project_id)
+            prompts.append(
+                self.build(
+                    self.prefix(event.project_id, tones.get(event.project_id)),
+                    event,
+                    products.get((event.project_id, event.internal_sku)),
+                    snapshot.rules_by_ids(rule_ids.get(event.id, ())),
+                )
+            )
+        return prompts
+
+
+def _review_block(event: models.Event, text: str) -> str:
+    if event.event_type == "question":
+        return f"Вопрос покупателя:\n{text}"
+    if event.rating:
+        return f"Отзыв покупателя, оценка {event.rating} из 5:\n{text}"
+    return f"Отзыв покупателя:\n{text}"
+
+
+def _project_tones(db: Session, project_ids: Iterable[int]) -> dict[int, Optional[str]]:
+    rows = db.execute(
+        select(models.Project.id, models.Project.tone_description).where(models.Project.id.in_(list(project_ids)))
+    ).all()
+    return dict(rows)
+
+
+def _product_names(db: Session, scopes: set[tuple[int, str]]) -> dict[tuple[int, str], str]:
+    skus = {sku for _, sku in scopes if sku}
+    if not skus:
+        return {}
+    rows = db.execute(
+        select(models.SKUMap.project_id, models.SKUMap.internal_sku, models.SKUMap.product_name)
+        .where(
+            models.SKUMap.project_id.in_(sorted({project_id for project_id, _ in scopes})),
+            models.SKUMap.internal_sku.in_(sorted(skus)),
+            models.SKUMap.product_name.is_not(None),
+        )
+        .order_by(models.SKUMap.id)
+    ).all()
+    names: dict[tuple[int, str], str] = {}
+    for project_id, internal_sku, product_name in rows:
+        if (project_id, internal_sku) in scopes and product_name.strip():
+            names.setdefault((project_id, internal_sku), product_name.strip())
+    return names
+
+
+def build_prompt_builder(settings) -> PromptBuilder:
+    return PromptBuilder(settings.prompt_max_tokens, settings.prompt_max_review_tokens)
+
+
+_prompt_builder: Optional[PromptBuilder] = None
+
+
+def get_prompt_builder() -> PromptBuilder:
+    """The process-wide builder, configured from settings on first use."""
+    global _prompt_builder
+    if _prompt_builder is None:
+        from app.config import settings
+
+        _prompt_builder = build_prompt_builder(settings)
+    return _prompt_builder
@@ -0,0 +1,155 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import re
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Callable, Optional
+
+from sqlalchemy.orm import Session
+
+from app import models
+from app.schemas import LLMResponse
+from app.services.kb_snapshot import kb_snapshots
+from app.services.sentiment import sentiment_for_rating
+
+logger = logging.getLogger(__name__)
+
+_NON_WORD = re.compile(r"[\W_]+", re.UNICODE)
+
+
+def normalize_text(text: str) -> str:
+    """Case, punctuation, emoji and whitespace insensitive form of a review text."""
+    return _NON_WORD.sub(" ", text.lower().replace("ё", "е")).strip()
+
+
+def rating_bucket(rating: int | None) -> str:
+    return sentiment_for_rating(rating) or "none"
+
+
+def kb_version(db: Session, project_id: int, internal_sku: str | None) -> str:
+    """Hash of the KB rules a reply for this SKU can draw on (project-wide and SKU rules).
+
+    Any rule added to or removed from the project or SKU changes the hash, so
+    cached replies built on the old rules stop matching and age out. The hash
+    comes precomputed with the project's KB snapshot.
+    """
+    return kb_snapshots.get(db, project_id).digest(internal_sku)
+
+
+@dataclass(frozen=True)
+class ReplyKey:
+    project_id: int
+    event_type: str
+    internal_sku: str
+    rating_bucket: str
+    kb_version: str
+    text: str
+
+    def digest(self) -> str:
+        raw = "\x1f".join(
+            (str(self.project_id), self.event_type, self.internal_sku, self.rating_bucket, self.kb_version, self.text)
+        )
+        return hashlib.blake2b(raw.encode("utf-8"), digest_size=16).hexdigest()
+
+
+def reply_key(event: models.Event, version: str) -> ReplyKey:
+    return ReplyKey(
+        project_id=event.project_id,
+        event_type=event.event_type,
+        internal_sku=event.internal_sku or "",
+        rating_bucket=rating_bucket(event.rating),
+        kb_version=version,
+        text=normalize_text(event.text),
+    )
+
+
+class ReplyCache:
+    """LRU of generated replies with a TTL and an optional Redis tier shared by workers."""
+
+    def __init__(
+        self,
+        maxsize: int = 10000,
+        ttl: float = 86400.0,
+        redis=None,
+        prefix: str = "reply",
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.redis = redis
+        self.prefix = prefix
+        self.clock = clock
+        self.hits = 0
+        self.redis_hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[str, tuple[LLMResponse, float]]" = OrderedDict()
+
+    def _redis_key(self, key: ReplyKey) -> str:
+        return f"{self.prefix}:{key.project_id}:{key.digest()}"
+
+    def _remember(self, digest: str, response: LLMResponse) -> None:
+        self._entries[digest] = (response, self.clock() + self.ttl)
+        self._entries.move_to_end(digest)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    def get(self, key: ReplyKey) -> Optional[LLMResponse]:
+        digest = key.digest()
+        entry = self._entries.get(digest)
+        if entry:
+            response, expires_at = entry
+            if expires_at > self.clock():
+                self._entries.move_to_end(digest)
+                self.hits += 1
+                return response
+            del self._entries[digest]
+        raw = None
+        if self.redis is not None:
+            try:
+                raw = self.redis.get(self._redis_key(key))
+            except Exception:
+                logger.warning("Reply cache read from redis failed", exc_info=True)
+        if raw is None:
+            self.misses += 1
+            return None
+        response = LLMResponse(**json.loads(raw))
+        self._remember(digest, response)
+        self.hits += 1
+        self.redis_hits += 1
+        return response
+
+    def set(self, key: ReplyKey, response: LLMResponse) -> None:
+        self._remember(key.digest(), response)
+        if self.redis is None:
+            return
+        try:
+            self.redis.set(self._redis_key(key), response.model_dump_json(), ex=max(1, int(self.ttl)))
+        except Exception:
+            logger.warning("Reply cache write to redis failed", exc_info=True)
+
+    def snapshot(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "redis_hits": self.redis_hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+            "size": len(self._entries),
+        }
+
+
+def build_reply_cache(settings) -> ReplyCache:
+    redis = None
+    if settings.reply_cache_redis:
+        from redis import Redis
+
+        redis = Redis.from_url(settings.redis_url)
+    return ReplyCache(
+        maxsize=settings.reply_cache_size,
+        ttl=settings.reply_cache_ttl_seconds,
+        redis=redis,
+    )
@@ -0,0 +1,11 @@
+from __future__ import annotations
+
+
+def sentiment_for_rating(rating: int | None) -> str | None:
+    if rating is None:
+        return None
+    if rating >= 4:
+        return "positive"
+    if rating == 3:
+        return "neutral"
+    return "negative"
@@ -0,0 +1,118 @@
+"""Dashboard screen render latency: per-call clients, a shared pooled client, and the single /bot/screen call.
+
+Usage:
+    python -m benchmarks.bot_screen_latency --renders 300
+
+Starts a stub backend with uvicorn on a free local port and replays the
+calls the bot makes for the dashboard screen: profile, projects and dashboard
+as three requests, or one aggregated ``/bot/screen`` request.
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import socket
+import statistics
+import threading
+import time
+
+import httpx
+import uvicorn
+from fastapi import FastAPI
+
+from bot.api import BotAPI
+
+stub = FastAPI()
+
+
+@stub.get("/bot/profile/{tg_user_id}")
+def profile(tg_user_id: int):
+    return {"user_id": 1, "telegram_user_id": str(tg_user_id), "is_admin": True}
+
+
+@stub.get("/bot/projects/{tg_user_id}")
+def projects(tg_user_id: int):
+    return [{"id": idx, "name": f"Проект {idx}", "owner_id": 1, "created_at": "2024-01-01T00:00:00"} for idx in range(5)]
+
+
+@stub.get("/bot/projects/{tg_user_id}/{project_id}/dashboard")
+def dashboard(tg_user_id: int, project_id: int):
+    return {"new": 3, "without_answer": 5, "escalated": 1, "balance_tokens": 100}
+
+
+@stub.get("/bot/screen/{tg_user_id}")
+def screen(tg_user_id: int, action: str, project_id: int):
+    return {
+        "profile": profile(tg_user_id),
+        "projects": projects(tg_user_id),
+        "dashboard": dashboard(tg_user_id, project_id),
+    }
+
+
+class PerCallBotAPI(BotAPI):
+    """The previous behaviour: a fresh AsyncClient (and TCP connection) per request."""
+
+    async def _request(self, method: str, path: str, **kwargs) -> dict:
+        async with httpx.AsyncClient(timeout=10) as client:
+            response = await client.request(method, f"{self.base_url}{path}", **kwargs)
+            response.raise_for_status()
+            return response.json()
+
+
+async def render_dashboard(api: BotAPI) -> None:
+    await api.profile(1)
+    await api.projects(1)
+    await api.dashboard(1, 1)
+
+
+async def render_dashboard_screen(api: BotAPI) -> None:
+    await api.screen(1, {"action": "dashboard", "project_id": 1})
+
+
+async def measure(api: BotAPI, renders: int, render=render_dashboard) -> list[float]:
+    await render(api)
+    timings = []
+    for _ in range(renders):
+        started = time.perf_counter()
+        await render(api)
+        timings.append((time.perf_counter() - started) * 1000)
+    await api.aclose()
+    return timings
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--renders", type=int, default=300)
+    args = parser.parse_args()
+    port = _free_port()
+    server = uvicorn.Server(uvicorn.Config(stub, host="127.0.0.1", port=port, log_level="warning"))
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        time.sleep(0.05)
+    base_url = f"http://127.0.0.1:{port}"
+    try:
+        runs = (
+            ("per-call clients", PerCallBotAPI(base_url), render_dashboard),
+            ("shared client", BotAPI(base_url), render_dashboard),
+            ("screen endpoint", BotAPI(base_url), render_dashboard_screen),
+        )
+        for label, api, render in runs:
+            timings = sorted(asyncio.run(measure(api, args.renders, render)))
+            print(
+                f"{label:>16}: p50={statistics.median(timings):.2f} ms "
+                f"p95={timings[int(len(timings) * 0.95)]:.2f} ms"
+            )
+    finally:
+        server.should_exit = True
+        thread.join()
+
+
+if __name__ == "__main__":
+    main()
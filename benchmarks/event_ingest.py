@@ -0,0 +1,135 @@
+"""Ingest latency of crud.create_event / create_events_bulk as the events table grows.
+
+Usage:
+    python -m benchmarks.event_ingest --database-url postgresql+psycopg2://... --sizes 10000,100000,1000000
+
+With the unique (cabinet_id, marketplace, marketplace_event_id) index the
+per-event cost should stay flat across table sizes. The benchmark seeds its
+own user, project and cabinets and deletes them, with their events, when done.
+"""
+from __future__ import annotations
+
+import argparse
+import statistics
+import tempfile
+import time
+from datetime import datetime
+
+from sqlalchemy import create_engine, delete, func, insert, select
+from sqlalchemy.orm import sessionmaker
+
+from app import crud, models
+from app.db import Base
+
+FILL_CHUNK = 10_000
+SAMPLES = 200
+BULK_SIZE = 200
+FILL_CABINETS = 50
+
+
+def _seed(db) -> tuple[models.Project, list[int]]:
+    """A throwaway owner, project and cabinets; the first cabinet takes the measured inserts."""
+    user = models.User(telegram_user_id=f"bench-{time.time_ns()}")
+    db.add(user)
+    db.flush()
+    project = models.Project(name="event ingest benchmark", owner_id=user.id)
+    db.add(project)
+    db.flush()
+    cabinets = [
+        models.Cabinet(
+            project_id=project.id,
+            marketplace="WB",
+            name=f"bench-{idx}",
+            api_token_encrypted="-",
+            api_token_masked="-",
+        )
+        for idx in range(FILL_CABINETS + 1)
+    ]
+    db.add_all(cabinets)
+    db.commit()
+    return project, [cabinet.id for cabinet in cabinets]
+
+
+def _cleanup(db, project: models.Project) -> None:
+    db.rollback()
+    db.execute(delete(models.Event).where(models.Event.project_id == project.id))
+    db.execute(delete(models.EventCounter).where(models.EventCounter.project_id == project.id))
+    db.execute(delete(models.Cabinet).where(models.Cabinet.project_id == project.id))
+    owner_id = project.owner_id
+    db.execute(delete(models.Project).where(models.Project.id == project.id))
+    db.execute(delete(models.User).where(models.User.id == owner_id))
+    db.commit()
+
+
+def _event(idx: int, project_id: int, cabinet_id: int) -> dict:
+    return {
+        "project_id": project_id,
+        "cabinet_id": cabinet_id,
+        "marketplace": "WB",
+        "marketplace_event_id": f"evt-{idx}",
+        "event_type": "review",
+        "text": "Всё отлично, спасибо!",
+        "rating": 5,
+        "sentiment": "positive",
+        "internal_sku": "SKU1",
+        "raw_payload": {"id": idx},
+        "media_links": [],
+    }
+
+
+def _fill(db, project_id: int, cabinet_ids: list[int], start: int, stop: int) -> None:
+    now = datetime.utcnow()
+    fill_ids = cabinet_ids[1:]
+    for chunk_start in range(start, stop, FILL_CHUNK):
+        rows = [
+            {
+                **_event(idx, project_id, fill_ids[idx % len(fill_ids)]),
+                "status": "new",
+                "created_at": now,
+                "updated_at": now,
+            }
+            for idx in range(chunk_start, min(chunk_start + FILL_CHUNK, stop))
+        ]
+        db.execute(insert(models.Event), rows)
+        db.commit()
+
+
+def _measure(db, project_id: int, cabinet_id: int, size: int) -> tuple[float, float, float]:
+    single = []
+    for idx in range(SAMPLES):
+        started = time.perf_counter()
+        crud.create_event(db, _event(size * 10 + idx, project_id, cabinet_id))
+        single.append((time.perf_counter() - started) * 1000)
+    batch = [_event(size * 10 + SAMPLES + idx, project_id, cabinet_id) for idx in range(BULK_SIZE)]
+    started = time.perf_counter()
+    crud.create_events_bulk(db, batch)
+    bulk_per_event = (time.perf_counter() - started) * 1000 / BULK_SIZE
+    single.sort()
+    return statistics.median(single), single[int(len(single) * 0.95)], bulk_per_event
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--database-url", default=None)
+    parser.add_argument("--sizes", default="10000,100000,1000000")
+    args = parser.parse_args()
+    url = args.database_url or f"sqlite:///{tempfile.mkdtemp()}/bench.db"
+    engine = create_engine(url)
+    Base.metadata.create_all(bind=engine)
+    db = sessionmaker(bind=engine, autocommit=False, autoflush=False)()
+    project, cabinet_ids = _seed(db)
+
+    print(f"{'rows':>10} {'single p50 ms':>14} {'single p95 ms':>14} {'bulk ms/event':>14}")
+    try:
+        for size in (int(item) for item in args.sizes.split(",")):
+            current = db.scalar(select(func.count(models.Event.id)).where(models.Event.project_id == project.id)) or 0
+            _fill(db, project.id, cabinet_ids, current, size)
+            p50, p95, bulk = _measure(db, project.id, cabinet_ids[0], size)
+            print(f"{size:>10} {p50:>14.3f} {p95:>14.3f} {bulk:>14.3f}")
+    finally:
+        _cleanup(db, project)
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+"""Top-k KB rule retrieval latency for one project as the knowledge base grows.
+
+Usage:
+    python -m benchmarks.kb_retrieval --rules 50000 --skus 500 --queries 1000
+
+Builds a ProjectKBIndex over synthetic Russian rules (a quarter project-wide,
+the rest spread over SKUs), then times search() for review-like queries and
+incremental add/remove of single rules. The median query should stay under
+a millisecond at 50k rules; ``--skus 1`` puts every rule in one partition,
+the worst case for the near-duplicate rules generated here.
+"""
+from __future__ import annotations
+
+import argparse
+import random
+import statistics
+import time
+
+from app.services.kb_index import ProjectKBIndex
+
+TOPICS = [
+    "гарантия на товар составляет {n} месяцев с даты покупки",
+    "доставка по России занимает от {n} до {m} рабочих дней",
+    "размер маломерит, рекомендуем брать на {n} размер больше",
+    "возврат возможен в течение {n} дней при сохранении упаковки",
+    "ткань состоит из хлопка {n}% и полиэстера {m}%",
+    "стирка при температуре не выше {n} градусов",
+    "батарея держит заряд до {n} часов в активном режиме",
+    "в комплекте идут {n} насадки и зарядный кабель",
+    "цвет может немного отличаться от фотографии из-за освещения",
+    "упаковка защищает товар от повреждений при транспортировке",
+    "мы отвечаем на вопросы покупателей в течение {n} часов",
+    "крем подходит для сухой и чувствительной кожи",
+    "срок годности {n} месяцев, хранить в сухом месте",
+    "сборка мебели занимает около {n} минут по инструкции",
+    "экран с разрешением {n} точек и защитным стеклом",
+    "обувь из натуральной кожи, подошва не скользит",
+    "игрушка безопасна для детей старше {n} лет",
+    "аромат стойкий и держится до {n} часов",
+    "корпус выдерживает падение с высоты {n} метров",
+    "чехол совместим с моделями {n} и {m} серии",
+    "сертификат соответствия можно запросить в поддержке",
+    "рукава регулируются, длина изделия {n} сантиметров",
+    "чайник закипает за {n} минут, объем {m} литра",
+    "пылесос работает тихо, мощность всасывания {n} ватт",
+]
+WORDS = (
+    "качество модель материал подарок коробка инструкция производитель замена брак скидка сетка рост вес "
+    "длина ширина объем вкус состав хранение мощность фильтр крышка ручка колесо ремень молния пуговица "
+    "подкладка утеплитель капюшон карман стекло пластик металл дерево керамика силикон резина шнур адаптер "
+    "пульт датчик дисплей динамик микрофон камера объектив штатив зарядка аккумулятор лампа плафон матрас "
+    "подушка одеяло полотенце шампунь бальзам маска сыворотка тоник помада тушь кисть расческа"
+).split()
+QUERIES = [
+    "Какая гарантия на эту модель?",
+    "Маломерит, пришлось возвращать и брать размер больше",
+    "Долго ждал доставку, упаковка помята",
+    "Сколько держит заряд батарея?",
+    "Можно ли стирать в машинке при 60 градусах?",
+    "Цвет не такой как на фото",
+    "Отличный крем, кожа не сохнет",
+    "Сломалась ручка через неделю, брак",
+    "Подходит ли чехол к моему телефону?",
+    "Пылесос шумный, фильтр быстро забивается",
+]
+
+
+def _rule_text(rng: random.Random) -> str:
+    text = rng.choice(TOPICS).format(n=rng.randint(1, 90), m=rng.randint(1, 90))
+    return f"{text}, {' '.join(rng.sample(WORDS, 3))}"
+
+
+def _percentile(samples: list[float], pct: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct))]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rules", type=int, default=50_000)
+    parser.add_argument("--skus", type=int, default=500)
+    parser.add_argument("--queries", type=int, default=1000)
+    parser.add_argument("--top-k", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    skus = [f"SKU{idx}" for idx in range(args.skus)]
+    index = ProjectKBIndex()
+    started = time.perf_counter()
+    for rule_id in range(1, args.rules + 1):
+        sku = None if rng.random() < 0.25 else rng.choice(skus)
+        index.add(rule_id, sku, _rule_text(rng))
+    build_s = time.perf_counter() - started
+
+    search = []
+    for _ in range(args.queries):
+        query, sku = rng.choice(QUERIES), rng.choice(skus)
+        started = time.perf_counter()
+        index.search(query, sku, args.top_k)
+        search.append((time.perf_counter() - started) * 1000)
+
+    add, remove = [], []
+    for offset in range(1, 201):
+        rule_id = args.rules + offset
+        started = time.perf_counter()
+        index.add(rule_id, rng.choice(skus), _rule_text(rng))
+        add.append((time.perf_counter() - started) * 1000)
+        started = time.perf_counter()
+        index.remove(rule_id)
+        remove.append((time.perf_counter() - started) * 1000)
+
+    print(f"rules={args.rules} skus={args.skus} partitions={len(index.partitions)} build={build_s:.2f}s")
+    print(f"{'operation':>10} | {'p50 ms':>8} | {'p99 ms':>8}")
+    for name, samples in (("search", search), ("add", add), ("remove", remove)):
+        print(f"{name:>10} | {statistics.median(samples):>8.3f} | {_percentile(samples, 0.99):>8.3f}")
+
+
+if __name__ == "__main__":
+    main()
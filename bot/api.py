@@ -0,0 +1,102 @@
+from __future__ import annotations
+
+import importlib.util
+from typing import AsyncIterator, Optional
+
+import httpx
+
+from app.config import settings
+
+
+def http2_available() -> bool:
+    return importlib.util.find_spec("h2") is not None
+
+
+def build_client(base_url: str) -> httpx.AsyncClient:
+    return httpx.AsyncClient(
+        base_url=base_url.rstrip("/"),
+        timeout=httpx.Timeout(
+            settings.bot_api_timeout_seconds,
+            connect=settings.bot_api_connect_timeout_seconds,
+        ),
+        limits=httpx.Limits(
+            max_connections=settings.bot_api_max_connections,
+            max_keepalive_connections=settings.bot_api_max_keepalive_connections,
+            keepalive_expiry=settings.bot_api_keepalive_expiry_seconds,
+        ),
+        http2=http2_available(),
+    )
+
+
+class BotAPI:
+    """Backend API client for the bot; one pooled keep-alive client per process."""
+
+    def __init__(self, base_url: str, client: Optional[httpx.AsyncClient] = None) -> None:
+        self.base_url = base_url.rstrip("/")
+        self._client = client or build_client(self.base_url)
+
+    async def aclose(self) -> None:
+        await self._client.aclose()
+
+    async def _request(self, method: str, path: str, **kwargs) -> dict:
+        response = await self._client.request(method, f"{self.base_url}{path}", **kwargs)
+        response.raise_for_status()
+        return response.json()
+
+    async def _get(self, path: str, params: Optional[dict] = None) -> dict:
+        return await self._request("GET", path, params=params)
+
+    async def _delete(self, path: str) -> dict:
+        return await self._request("DELETE", path)
+
+    async def profile(self, tg_user_id: int) -> dict:
+        return await self._get(f"/bot/profile/{tg_user_id}")
+
+    async def projects(self, tg_user_id: int) -> list[dict]:
+        return await self._get(f"/bot/projects/{tg_user_id}")
+
+    async def screen(self, tg_user_id: int, params: dict) -> dict:
+        return await self._get(f"/bot/screen/{tg_user_id}", params=params)
+
+    async def dashboard(self, tg_user_id: int, project_id: int) -> dict:
+        return await self._get(f"/bot/projects/{tg_user_id}/{project_id}/dashboard")
+
+    async def feed(self, tg_user_id: int, project_id: int, params: dict) -> dict:
+        return await self._get(f"/bot/projects/{tg_user_id}/{project_id}/feed", params=params)
+
+    async def event(self, tg_user_id: int, event_id: int) -> dict:
+        return await self._get(f"/bot/events/{tg_user_id}/{event_id}")
+
+    async def regenerate_stream(self, tg_user_id: int, event_id: int) -> AsyncIterator[str]:
+        """Yield reply text chunks as the backend generates them."""
+        async with self._client.stream(
+            "POST", f"{self.base_url}/bot/events/{tg_user_id}/{event_id}/regenerate", timeout=None
+        ) as response:
+            response.raise_for_status()
+            async for chunk in response.aiter_text():
+                yield chunk
+
+    async def kb_rules(self, tg_user_id: int, project_id: int, params: dict) -> list[dict]:
+        return await self._get(f"/bot/projects/{tg_user_id}/{project_id}/kb", params=params)
+
+    async def delete_kb_rule(self, tg_user_id: int, rule_id: int) -> dict:
+        return await self._delete(f"/bot/kb/{tg_user_id}/{rule_id}")
+
+    async def create_kb_rule(self, tg_user_id: int, project_id: int, payload: dict) -> dict:
+        return await self._request(
+            "POST",
+            f"/bot/projects/{tg_user_id}/{project_id}/kb",
+            json=payload,
+        )
+
+    async def cabinets(self, tg_user_id: int, project_id: int) -> list[dict]:
+        return await self._get(f"/bot/projects/{tg_user_id}/{project_id}/cabinets")
+
+    async def onboarding(self, tg_user_id: int, project_id: int) -> dict:
+        return await self._get(f"/bot/projects/{tg_user_id}/{project_id}/onboarding")
+
+    async def settings(self, tg_user_id: int, project_id: int) -> dict:
+        return await self._get(f"/bot/projects/{tg_user_id}/{project_id}/settings")
+
+    async def balance(self, tg_user_id: int, project_id: int) -> dict:
+        return await self._get(f"/bot/projects/{tg_user_id}/{project_id}/balance")
@@ -0,0 +1,135 @@
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Optional
+
+from aiogram.fsm.context import FSMContext
+
+from . import constants
+from .api import BotAPI
+from .types import UserContext
+
+CARD_ACTIONS = {constants.ACTION_CARD, constants.ACTION_EDIT, constants.ACTION_REGENERATE}
+
+
+@dataclass(frozen=True)
+class ScreenData:
+    """Query params a screen adds to ``/bot/screen`` and how its response maps onto UserContext fields."""
+
+    params: Callable[[dict], dict]
+    apply: Callable[[dict, dict], Dict[str, Any]]
+    needs_project: bool = True
+
+
+def feed_params(filters: dict) -> dict:
+    return {key: value for key, value in filters.items() if key != "cursors" and value is not None}
+
+
+def _no_params(data: dict) -> dict:
+    return {}
+
+
+def _section(name: str, field_name: Optional[str] = None) -> Callable[[dict, dict], Dict[str, Any]]:
+    def apply(screen: dict, data: dict) -> Dict[str, Any]:
+        if screen.get(name) is None:
+            return {}
+        return {field_name or name: screen[name]}
+
+    return apply
+
+
+def _feed_request(data: dict) -> dict:
+    return feed_params(data.get("feed_filters") or {"limit": 10})
+
+
+def _apply_feed(screen: dict, data: dict) -> Dict[str, Any]:
+    feed = screen.get("feed")
+    if feed is None:
+        return {}
+    filters = data.get("feed_filters") or {"limit": 10}
+    return {
+        "feed": feed.get("items", []),
+        "feed_filters": {
+            **filters,
+            "total": feed.get("total", 0),
+            "limit": feed.get("limit", filters.get("limit", 10)),
+            "next_cursor": feed.get("next_cursor"),
+            "has_next": bool(feed.get("next_cursor")),
+        },
+    }
+
+
+def _card_request(data: dict) -> dict:
+    event_id = data.get("current_event_id")
+    return {"event_id": event_id} if event_id else {}
+
+
+def _kb_request(data: dict) -> dict:
+    return data.get("kb_filters") or {"limit": 10}
+
+
+FEED_SCREEN = ScreenData(_feed_request, _apply_feed)
+CARD_SCREEN = ScreenData(_card_request, _section("event", "card"), needs_project=False)
+KB_SCREEN = ScreenData(_kb_request, _section("kb_rules"))
+
+SCREEN_DATA: Dict[str, ScreenData] = {
+    constants.ACTION_DASHBOARD: ScreenData(_no_params, _section("dashboard")),
+    constants.ACTION_FEED: FEED_SCREEN,
+    constants.ACTION_FEED_FILTERS: FEED_SCREEN,
+    constants.ACTION_CARD: CARD_SCREEN,
+    constants.ACTION_EDIT: CARD_SCREEN,
+    constants.ACTION_REGENERATE: CARD_SCREEN,
+    constants.ACTION_KB_LIST: KB_SCREEN,
+    constants.ACTION_KB_DELETE: KB_SCREEN,
+    constants.ACTION_CABINETS: ScreenData(_no_params, _section("cabinets")),
+    constants.ACTION_ONBOARDING: ScreenData(_no_params, _section("onboarding")),
+    constants.ACTION_PROJECT_SETTINGS: ScreenData(_no_params, _section("settings")),
+    constants.ACTION_BALANCE: ScreenData(_no_params, _section("balance")),
+}
+
+
+async def build_context(
+    action: str,
+    user_id: int,
+    state: FSMContext,
+    api: BotAPI,
+    payload: Optional[str] = None,
+) -> UserContext:
+    """Load everything the screen for ``action`` needs in a single ``/bot/screen`` round trip."""
+    data = await state.get_data()
+    if action in CARD_ACTIONS and payload and payload.isdigit():
+        data["current_event_id"] = int(payload)
+        await state.update_data(current_event_id=data["current_event_id"])
+    current_project_id = data.get("current_project_id")
+    spec = SCREEN_DATA.get(action)
+    params: Dict[str, Any] = {"action": action}
+    if current_project_id:
+        params["project_id"] = current_project_id
+    if spec and (current_project_id or not spec.needs_project):
+        params.update(spec.params(data))
+    else:
+        spec = None
+    screen = await api.screen(user_id, params)
+    projects = screen.get("projects", [])
+    await state.update_data(projects=projects)
+    current_project_name = data.get("current_project_name")
+    if current_project_id and not current_project_name:
+        project = next((item for item in projects if item["id"] == current_project_id), None)
+        if project:
+            current_project_name = project["name"]
+            await state.update_data(current_project_name=current_project_name)
+    ctx = UserContext(
+        user_id=user_id,
+        is_admin=screen.get("profile", {}).get("is_admin", False),
+        has_subscription=data.get("has_subscription"),
+        current_project_id=current_project_id,
+        current_project_name=current_project_name,
+        projects=projects,
+        feed_filters=data.get("feed_filters"),
+        edit_draft=data.get("draft_reply"),
+        kb_rule_draft=data.get("kb_rule_draft"),
+    )
+    if spec:
+        for field_name, value in spec.apply(screen, data).items():
+            setattr(ctx, field_name, value)
+    return ctx
@@ -176,12 +176,10 @@ def feed_screen(events: Iterable[dict], filters: Optional[dict]) -> Screen:
     buttons: List[Button] = [Button("🔎 Фильтры", constants.ACTION_FEED_FILTERS)]
     for idx, event in enumerate(items, start=1):
         buttons.append(Button(f"Карточка {idx}", f"{constants.ACTION_CARD}:{event['id']}"))
-    if filters and filters.get("offset", 0) > 0:
-        prev_offset = max(filters.get("offset", 0) - filters.get("limit", 10), 0)
-        buttons.append(Button("◀️ Пред", f"{constants.ACTION_FEED}:offset={prev_offset}"))
-    if filters and filters.get("has_next"):
-        next_offset = filters.get("offset", 0) + filters.get("limit", 10)
-        buttons.append(Button("След ▶️", f"{constants.ACTION_FEED}:offset={next_offset}"))
+    if filters and filters.get("cursors"):
+        buttons.append(Button("◀️ Пред", f"{constants.ACTION_FEED}:page=prev"))
+    if filters and filters.get("next_cursor"):
+        buttons.append(Button("След ▶️", f"{constants.ACTION_FEED}:cursor={filters['next_cursor']}"))
     buttons.append(Button("⬅️ Назад", constants.ACTION_BACK))
     return Screen(
         key=constants.ACTION_FEED,
@@ -371,13 +369,19 @@ def kb_delete_screen(rules: Iterable[dict]) -> Screen:
     )
 
 
+def _cabinet_line(cabinet: dict) -> str:
+    line = f"• {cabinet['marketplace']} — {cabinet['name']}"
+    backfill = cabinet.get("backfill") or {}
+    if backfill.get("status") in {"pending", "running"}:
+        line += f" (импорт истории: {backfill.get('progress', 0)}%)"
+    return line
+
+
 def cabinets_screen(cabinets: Iterable[dict]) -> Screen:
     cabinets_list = list(cabinets)
     body = (
         "Подключённые кабинеты:\n"
-        + "\n".join(
-            f"• {cabinet['marketplace']} — {cabinet['name']}" for cabinet in cabinets_list
-        )
+        + "\n".join(_cabinet_line(cabinet) for cabinet in cabinets_list)
         if cabinets_list
         else "Кабинеты не подключены."
     )
@@ -0,0 +1,50 @@
+from __future__ import annotations
+
+import json
+from typing import Any, Optional
+
+from aiogram.fsm.storage.base import BaseEventIsolation, BaseStorage
+from aiogram.fsm.storage.memory import DisabledEventIsolation, MemoryStorage
+from aiogram.fsm.storage.redis import DefaultKeyBuilder, RedisEventIsolation, RedisStorage
+
+FSM_KEY_PREFIX = "fsm"
+
+
+def compact_dumps(value: Any) -> str:
+    """FSM data is mostly Cyrillic text and small dicts; skip whitespace and \\u escapes."""
+    return json.dumps(value, ensure_ascii=False, separators=(",", ":"))
+
+
+def build_redis_storage(redis, state_ttl: Optional[int] = None, data_ttl: Optional[int] = None) -> RedisStorage:
+    return RedisStorage(
+        redis,
+        key_builder=DefaultKeyBuilder(prefix=FSM_KEY_PREFIX, with_bot_id=True),
+        state_ttl=state_ttl,
+        data_ttl=data_ttl,
+        json_dumps=compact_dumps,
+    )
+
+
+def build_storage(settings) -> tuple[BaseStorage, BaseEventIsolation]:
+    """Return the FSM storage and event isolation selected by ``BOT_FSM_STORAGE``.
+
+    ``memory`` keeps state in the process (single bot instance only);
+    ``redis`` shares it between replicas and serialises updates per chat with a Redis lock.
+    """
+    if settings.bot_fsm_storage == "memory":
+        return MemoryStorage(), DisabledEventIsolation()
+    if settings.bot_fsm_storage != "redis":
+        raise ValueError(f"Unknown FSM storage: {settings.bot_fsm_storage}")
+    from redis.asyncio import Redis
+
+    redis = Redis.from_url(settings.redis_url)
+    storage = build_redis_storage(
+        redis,
+        state_ttl=settings.bot_fsm_ttl_seconds,
+        data_ttl=settings.bot_fsm_ttl_seconds,
+    )
+    isolation = RedisEventIsolation(
+        redis,
+        key_builder=DefaultKeyBuilder(prefix=FSM_KEY_PREFIX, with_bot_id=True),
+    )
+    return storage, isolation
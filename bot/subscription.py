@@ -1,9 +1,19 @@
 from __future__ import annotations
 
 import json
+import logging
+import time
 import urllib.error
 import urllib.parse
 import urllib.request
+from collections import OrderedDict
+from typing import Callable, Optional, Tuple
+
+import httpx
+
+logger = logging.getLogger(__name__)
+
+TELEGRAM_API_URL = "https://api.telegram.org"
 
 
 def get_chat_member(bot_token: str, chat_id: str, user_id: int) -> str:
@@ -13,7 +23,7 @@ def get_chat_member(bot_token: str, chat_id: str, user_id: int) -> str:
     """
     if not bot_token:
         raise RuntimeError("Bot token is not configured")
-    url = f"https://api.telegram.org/bot{bot_token}/getChatMember"
+    url = f"{TELEGRAM_API_URL}/bot{bot_token}/getChatMember"
     payload = urllib.parse.urlencode({"chat_id": chat_id, "user_id": user_id}).encode(
         "utf-8"
     )
@@ -30,5 +40,155 @@ def get_chat_member(bot_token: str, chat_id: str, user_id: int) -> str:
     return result.get("status", "left")
 
 
+async def get_chat_member_async(
+    client: httpx.AsyncClient, bot_token: str, chat_id: str, user_id: int
+) -> str:
+    """Async variant of :func:`get_chat_member` on a shared client; same errors."""
+    if not bot_token:
+        raise RuntimeError("Bot token is not configured")
+    try:
+        response = await client.post(
+            f"/bot{bot_token}/getChatMember",
+            data={"chat_id": chat_id, "user_id": user_id},
+        )
+        data = response.json()
+    except (httpx.HTTPError, ValueError) as exc:
+        raise RuntimeError("Failed to contact Telegram API") from exc
+    if not data.get("ok"):
+        raise RuntimeError(data.get("description", "Telegram API error"))
+    result = data.get("result", {})
+    return result.get("status", "left")
+
+
 def is_subscribed(status: str) -> bool:
     return status in {"member", "administrator", "creator"}
+
+
+class SubscriptionCache:
+    """LRU of subscription results keyed by (channel, user_id), with an optional Redis tier.
+
+    Positive and negative results expire separately so a user who just joined
+    the channel is not locked out for the full positive TTL.
+    """
+
+    def __init__(
+        self,
+        maxsize: int = 10000,
+        ttl: float = 300.0,
+        negative_ttl: float = 30.0,
+        redis=None,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.redis = redis
+        self.clock = clock
+        self._entries: "OrderedDict[Tuple[str, int], Tuple[bool, float]]" = OrderedDict()
+
+    @staticmethod
+    def _redis_key(channel: str, user_id: int) -> str:
+        return f"tg:sub:{channel}:{user_id}"
+
+    def _ttl_for(self, subscribed: bool) -> float:
+        return self.ttl if subscribed else self.negative_ttl
+
+    def _remember(self, key: Tuple[str, int], subscribed: bool, ttl: float) -> None:
+        self._entries[key] = (subscribed, self.clock() + ttl)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    async def get(self, channel: str, user_id: int) -> Optional[bool]:
+        key = (channel, user_id)
+        entry = self._entries.get(key)
+        if entry:
+            subscribed, expires_at = entry
+            if expires_at > self.clock():
+                self._entries.move_to_end(key)
+                return subscribed
+            del self._entries[key]
+        if self.redis is None:
+            return None
+        try:
+            raw = await self.redis.get(self._redis_key(channel, user_id))
+        except Exception:
+            logger.warning("Subscription cache read from redis failed", exc_info=True)
+            return None
+        if raw is None:
+            return None
+        subscribed = raw in (b"1", "1")
+        self._remember(key, subscribed, self._ttl_for(subscribed))
+        return subscribed
+
+    async def set(self, channel: str, user_id: int, subscribed: bool) -> None:
+        ttl = self._ttl_for(subscribed)
+        self._remember((channel, user_id), subscribed, ttl)
+        if self.redis is None:
+            return
+        try:
+            await self.redis.set(
+                self._redis_key(channel, user_id), "1" if subscribed else "0", ex=max(1, int(ttl))
+            )
+        except Exception:
+            logger.warning("Subscription cache write to redis failed", exc_info=True)
+
+    async def invalidate(self, channel: str, user_id: int) -> None:
+        self._entries.pop((channel, user_id), None)
+        if self.redis is None:
+            return
+        try:
+            await self.redis.delete(self._redis_key(channel, user_id))
+        except Exception:
+            logger.warning("Subscription cache invalidation in redis failed", exc_info=True)
+
+
+class SubscriptionChecker:
+    """Cached channel membership checks over one pooled Telegram API client."""
+
+    def __init__(
+        self,
+        bot_token: str,
+        cache: Optional[SubscriptionCache] = None,
+        client: Optional[httpx.AsyncClient] = None,
+        base_url: str = TELEGRAM_API_URL,
+    ) -> None:
+        self.bot_token = bot_token
+        self.cache = cache or SubscriptionCache()
+        self._client = client or httpx.AsyncClient(
+            base_url=base_url,
+            timeout=httpx.Timeout(10.0, connect=3.0),
+        )
+
+    async def aclose(self) -> None:
+        await self._client.aclose()
+        if self.cache.redis is not None:
+            await self.cache.redis.aclose()
+
+    async def check(self, channel: str, user_id: int, force: bool = False) -> bool:
+        """Return whether the user is subscribed; ``force`` drops the cached answer first."""
+        if force:
+            await self.cache.invalidate(channel, user_id)
+        else:
+            cached = await self.cache.get(channel, user_id)
+            if cached is not None:
+                return cached
+        status = await get_chat_member_async(self._client, self.bot_token, channel, user_id)
+        subscribed = is_subscribed(status)
+        await self.cache.set(channel, user_id, subscribed)
+        return subscribed
+
+
+def build_checker(settings) -> SubscriptionChecker:
+    redis = None
+    if settings.subscription_cache_redis:
+        from redis import asyncio as redis_asyncio
+
+        redis = redis_asyncio.from_url(settings.redis_url)
+    cache = SubscriptionCache(
+        maxsize=settings.subscription_cache_size,
+        ttl=settings.subscription_cache_ttl_seconds,
+        negative_ttl=settings.subscription_negative_ttl_seconds,
+        redis=redis,
+    )
+    return SubscriptionChecker(settings.telegram_bot_token, cache=cache)
@@ -0,0 +1,132 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import secrets
+from collections import defaultdict, deque
+from contextlib import asynccontextmanager
+from typing import Any, Awaitable, Callable, Deque, Dict, Hashable, List, Optional
+
+from fastapi import FastAPI, Header, HTTPException, Request, Response
+
+logger = logging.getLogger(__name__)
+
+SECRET_HEADER = "X-Telegram-Bot-Api-Secret-Token"
+
+Handler = Callable[[Any], Awaitable[None]]
+Hook = Callable[[], Awaitable[None]]
+
+
+class ChatOrderedExecutor:
+    """Bounded worker pool that runs updates of one chat strictly in order.
+
+    Each chat has its own FIFO; a chat id sits in the ready queue at most once,
+    so a slow chat occupies one worker while other chats keep flowing.
+    ``submit`` refuses new work once ``max_pending`` updates are queued or running.
+    """
+
+    def __init__(self, handler: Handler, workers: int = 32, max_pending: int = 1000) -> None:
+        self.handler = handler
+        self.workers = workers
+        self.max_pending = max_pending
+        self.pending = 0
+        self._chats: Dict[Hashable, Deque[Any]] = defaultdict(deque)
+        self._ready: "asyncio.Queue[Hashable]" = asyncio.Queue()
+        self._tasks: List[asyncio.Task] = []
+
+    def start(self) -> None:
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def stop(self) -> None:
+        """Finish everything already accepted, then stop the workers."""
+        await self._ready.join()
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def submit(self, chat_id: Hashable, item: Any) -> bool:
+        if self.pending >= self.max_pending:
+            return False
+        self.pending += 1
+        queue = self._chats[chat_id]
+        queue.append(item)
+        if len(queue) == 1:
+            self._ready.put_nowait(chat_id)
+        return True
+
+    async def _worker(self) -> None:
+        while True:
+            chat_id = await self._ready.get()
+            queue = self._chats[chat_id]
+            try:
+                await self.handler(queue[0])
+            except Exception:
+                logger.exception("Update handling failed for chat %s", chat_id)
+            finally:
+                queue.popleft()
+                self.pending -= 1
+                if queue:
+                    self._ready.put_nowait(chat_id)
+                else:
+                    del self._chats[chat_id]
+                self._ready.task_done()
+
+
+def update_chat_id(update: dict) -> Hashable:
+    """Chat (or user) the update belongs to; updates without one get their own key."""
+    for key, value in update.items():
+        if key == "update_id" or not isinstance(value, dict):
+            continue
+        chat = value.get("chat") or (value.get("message") or {}).get("chat")
+        if chat and "id" in chat:
+            return chat["id"]
+        sender = value.get("from") or value.get("user")
+        if sender and "id" in sender:
+            return sender["id"]
+    return ("update", update.get("update_id"))
+
+
+def build_webhook_app(
+    handler: Handler,
+    path: str = "/telegram/webhook",
+    secret: str = "",
+    workers: int = 32,
+    max_pending: int = 1000,
+    on_startup: Optional[Hook] = None,
+    on_shutdown: Optional[Hook] = None,
+) -> FastAPI:
+    """ASGI app that accepts Telegram webhook updates and hands them to a ChatOrderedExecutor.
+
+    Updates are acknowledged as soon as they are queued; when the queue is full
+    the endpoint answers 429 so Telegram redelivers the update later.
+    """
+    @asynccontextmanager
+    async def lifespan(app: FastAPI):
+        executor = ChatOrderedExecutor(handler, workers=workers, max_pending=max_pending)
+        executor.start()
+        app.state.executor = executor
+        if on_startup:
+            await on_startup()
+        try:
+            yield
+        finally:
+            await executor.stop()
+            if on_shutdown:
+                await on_shutdown()
+
+    app = FastAPI(title="mp_reviews_bot webhook", lifespan=lifespan)
+
+    @app.post(path)
+    async def telegram_webhook(
+        request: Request,
+        secret_token: str | None = Header(default=None, alias=SECRET_HEADER),
+    ):
+        if secret and not secrets.compare_digest((secret_token or "").encode(), secret.encode()):
+            raise HTTPException(status_code=403, detail="Invalid secret token")
+        update = await request.json()
+        if not request.app.state.executor.submit(update_chat_id(update), update):
+            return Response(status_code=429, headers={"Retry-After": "1"})
+        return {"ok": True}
+
+    return app
@@ -0,0 +1,48 @@
+"""events dedupe unique constraint
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-17 00:00:00
+"""
+from alembic import op
+
+
+revision = "0002"
+down_revision = "0001"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.execute(
+        """
+        WITH ranked AS (
+            SELECT id, MIN(id) OVER (
+                PARTITION BY cabinet_id, marketplace, marketplace_event_id
+            ) AS keep_id
+            FROM events
+        )
+        UPDATE audit_logs SET event_id = ranked.keep_id
+        FROM ranked
+        WHERE audit_logs.event_id = ranked.id AND ranked.id <> ranked.keep_id
+        """
+    )
+    op.execute(
+        """
+        DELETE FROM events a
+        USING events b
+        WHERE a.cabinet_id = b.cabinet_id
+          AND a.marketplace = b.marketplace
+          AND a.marketplace_event_id = b.marketplace_event_id
+          AND a.id > b.id
+        """
+    )
+    op.create_unique_constraint(
+        "uq_events_cabinet_marketplace_event",
+        "events",
+        ["cabinet_id", "marketplace", "marketplace_event_id"],
+    )
+
+
+def downgrade() -> None:
+    op.drop_constraint("uq_events_cabinet_marketplace_event", "events", type_="unique")
@@ -0,0 +1,31 @@
+"""events feed keyset indexes
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-17 00:00:00
+"""
+from alembic import op
+
+
+revision = "0003"
+down_revision = "0002"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_index(
+        "ix_events_project_status_created_id",
+        "events",
+        ["project_id", "status", "created_at", "id"],
+    )
+    op.create_index(
+        "ix_events_project_created_id",
+        "events",
+        ["project_id", "created_at", "id"],
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_events_project_created_id", table_name="events")
+    op.drop_index("ix_events_project_status_created_id", table_name="events")
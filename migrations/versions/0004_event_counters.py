@@ -0,0 +1,45 @@
+"""event counters
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-17 00:00:00
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0004"
+down_revision = "0003"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "event_counters",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("project_id", sa.Integer(), sa.ForeignKey("projects.id"), nullable=False),
+        sa.Column("status", sa.String(), nullable=False),
+        sa.Column("sentiment", sa.String(), nullable=False, server_default=""),
+        sa.Column("event_type", sa.String(), nullable=False),
+        sa.Column("count", sa.Integer(), nullable=False, server_default="0"),
+        sa.UniqueConstraint(
+            "project_id",
+            "status",
+            "sentiment",
+            "event_type",
+            name="uq_event_counters_dimensions",
+        ),
+    )
+    op.execute(
+        """
+        INSERT INTO event_counters (project_id, status, sentiment, event_type, count)
+        SELECT project_id, COALESCE(status, 'new'), COALESCE(sentiment, ''), event_type, COUNT(id)
+        FROM events
+        GROUP BY project_id, COALESCE(status, 'new'), COALESCE(sentiment, ''), event_type
+        """
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("event_counters")
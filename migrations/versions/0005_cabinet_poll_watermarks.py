@@ -0,0 +1,26 @@
+"""cabinet poll watermarks
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-17 00:00:00
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0005"
+down_revision = "0004"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column("cabinets", sa.Column("reviews_since", sa.DateTime(), nullable=True))
+    op.add_column("cabinets", sa.Column("questions_since", sa.DateTime(), nullable=True))
+    op.add_column("cabinets", sa.Column("last_polled_at", sa.DateTime(), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column("cabinets", "last_polled_at")
+    op.drop_column("cabinets", "questions_since")
+    op.drop_column("cabinets", "reviews_since")
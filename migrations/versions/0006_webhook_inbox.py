@@ -0,0 +1,38 @@
+"""webhook inbox
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2026-10-17 00:00:00
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0006"
+down_revision = "0005"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column(
+        "cabinets",
+        sa.Column("webhook_enabled", sa.Boolean(), nullable=False, server_default=sa.false()),
+    )
+    op.create_table(
+        "webhook_inbox",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("cabinet_id", sa.Integer(), sa.ForeignKey("cabinets.id"), nullable=False),
+        sa.Column("marketplace", sa.String(), nullable=False),
+        sa.Column("payload", sa.JSON(), nullable=False),
+        sa.Column("error", sa.Text(), nullable=True),
+        sa.Column("received_at", sa.DateTime(), nullable=True),
+        sa.Column("processed_at", sa.DateTime(), nullable=True),
+    )
+    op.create_index("ix_webhook_inbox_pending", "webhook_inbox", ["processed_at", "id"])
+
+
+def downgrade() -> None:
+    op.drop_index("ix_webhook_inbox_pending", table_name="webhook_inbox")
+    op.drop_table("webhook_inbox")
+    op.drop_column("cabinets", "webhook_enabled")
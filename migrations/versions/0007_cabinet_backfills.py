@@ -0,0 +1,36 @@
+"""cabinet history backfills
+
+Revision ID: 0007
+Revises: 0006
+Create Date: 2026-10-17 00:00:00
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0007"
+down_revision = "0006"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "cabinet_backfills",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("cabinet_id", sa.Integer(), sa.ForeignKey("cabinets.id"), nullable=False, unique=True),
+        sa.Column("status", sa.String(), nullable=False, server_default="pending"),
+        sa.Column("start_at", sa.DateTime(), nullable=False),
+        sa.Column("end_at", sa.DateTime(), nullable=False),
+        sa.Column("cursor_at", sa.DateTime(), nullable=False),
+        sa.Column("checkpoint", sa.JSON(), nullable=False, server_default="{}"),
+        sa.Column("progress", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("imported", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("error", sa.Text(), nullable=True),
+        sa.Column("leased_until", sa.DateTime(), nullable=True),
+        sa.Column("updated_at", sa.DateTime(), nullable=True),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("cabinet_backfills")
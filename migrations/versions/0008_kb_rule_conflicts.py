@@ -0,0 +1,35 @@
+"""kb rule conflict pairs
+
+Revision ID: 0008
+Revises: 0007
+Create Date: 2026-10-17 00:00:00
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0008"
+down_revision = "0007"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "kb_rule_conflicts",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("project_id", sa.Integer(), sa.ForeignKey("projects.id"), nullable=False),
+        sa.Column("rule_id", sa.Integer(), sa.ForeignKey("kb_rules.id", ondelete="CASCADE"), nullable=False),
+        sa.Column(
+            "other_rule_id", sa.Integer(), sa.ForeignKey("kb_rules.id", ondelete="CASCADE"), nullable=False
+        ),
+        sa.UniqueConstraint("rule_id", "other_rule_id", name="uq_kb_rule_conflicts_pair"),
+    )
+    op.create_index("ix_kb_rule_conflicts_project_id", "kb_rule_conflicts", ["project_id"])
+    op.create_index("ix_kb_rule_conflicts_other_rule_id", "kb_rule_conflicts", ["other_rule_id"])
+
+
+def downgrade() -> None:
+    op.drop_index("ix_kb_rule_conflicts_other_rule_id", table_name="kb_rule_conflicts")
+    op.drop_index("ix_kb_rule_conflicts_project_id", table_name="kb_rule_conflicts")
+    op.drop_table("kb_rule_conflicts")
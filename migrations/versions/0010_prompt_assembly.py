@@ -0,0 +1,24 @@
+"""project tone and event prompt tokens
+
+Revision ID: 0010
+Revises: 0009
+Create Date: 2026-10-17 00:00:00
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0010"
+down_revision = "0009"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column("projects", sa.Column("tone_description", sa.Text(), nullable=True))
+    op.add_column("events", sa.Column("prompt_tokens", sa.Integer(), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column("events", "prompt_tokens")
+    op.drop_column("projects", "tone_description")
@@ -0,0 +1,27 @@
+"""cabinet last webhook timestamp
+
+Revision ID: 0011
+Revises: 0010
+Create Date: 2026-10-17 00:00:00
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0011"
+down_revision = "0010"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column("cabinets", sa.Column("last_webhook_at", sa.DateTime(), nullable=True))
+    op.drop_column("cabinets", "webhook_enabled")
+
+
+def downgrade() -> None:
+    op.add_column(
+        "cabinets",
+        sa.Column("webhook_enabled", sa.Boolean(), nullable=False, server_default=sa.false()),
+    )
+    op.drop_column("cabinets", "last_webhook_at")
@@ -0,0 +1,22 @@
+"""event generation error
+
+Revision ID: 0012
+Revises: 0011
+Create Date: 2026-10-17 00:00:00
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0012"
+down_revision = "0011"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column("events", sa.Column("generation_error", sa.Text(), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column("events", "generation_error")
@@ -0,0 +1,31 @@
+"""store conflict verdicts for existing kb rules
+
+Revision ID: 0013
+Revises: 0012
+Create Date: 2026-10-17 00:00:00
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.orm import Session
+
+
+revision = "0013"
+down_revision = "0012"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    from app.services.kb_conflicts import rebuild_conflicts
+
+    db = Session(bind=op.get_bind())
+    try:
+        project_ids = db.scalars(sa.text("SELECT DISTINCT project_id FROM kb_rules ORDER BY project_id")).all()
+        for project_id in project_ids:
+            rebuild_conflicts(db, project_id)
+    finally:
+        db.close()
+
+
+def downgrade() -> None:
+    pass
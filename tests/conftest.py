@@ -0,0 +1,28 @@
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.db import Base
+from app.services.kb_conflicts import conflict_matrices
+from app.services.kb_index import kb_indexes
+from app.services.kb_snapshot import kb_snapshots
+
+
+@pytest.fixture(autouse=True)
+def _fresh_kb_caches():
+    """Process-wide KB caches outlive each test's in-memory database."""
+    yield
+    kb_snapshots.clear()
+    kb_indexes.clear()
+    conflict_matrices.clear()
+
+
+@pytest.fixture
+def db():
+    """A session on a fresh in-memory SQLite database with every table created."""
+    engine = create_engine("sqlite:///:memory:")
+    Base.metadata.create_all(bind=engine)
+    session = sessionmaker(bind=engine, autocommit=False, autoflush=False)()
+    yield session
+    session.close()
+    engine.dispose()
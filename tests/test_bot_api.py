@@ -0,0 +1,31 @@
+import asyncio
+
+import httpx
+
+from bot.api import BotAPI
+
+
+def test_bot_api_reuses_one_client_for_all_calls():
+    seen = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        seen.append((request.method, request.url.path))
+        return httpx.Response(200, json={"ok": True})
+
+    client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    api = BotAPI("http://backend/", client=client)
+
+    async def scenario():
+        await api.profile(1)
+        await api.create_kb_rule(1, 2, {"project_id": 2, "text": "Факт"})
+        await api.delete_kb_rule(1, 3)
+        await api.aclose()
+
+    asyncio.run(scenario())
+
+    assert seen == [
+        ("GET", "/bot/profile/1"),
+        ("POST", "/bot/projects/1/2/kb"),
+        ("DELETE", "/bot/kb/1/3"),
+    ]
+    assert client.is_closed
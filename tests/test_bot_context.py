@@ -0,0 +1,51 @@
+import asyncio
+
+from bot import constants
+from bot.context import build_context
+
+
+class FakeState:
+    def __init__(self, data):
+        self.data = data
+
+    async def get_data(self):
+        return dict(self.data)
+
+    async def update_data(self, **kwargs):
+        self.data.update(kwargs)
+
+
+class FakeAPI:
+    def __init__(self):
+        self.calls = []
+
+    async def screen(self, user_id, params):
+        self.calls.append(params)
+        screen = {"profile": {"is_admin": True}, "projects": [{"id": 7, "name": "Бренд"}]}
+        if params["action"] == constants.ACTION_FEED and "project_id" in params:
+            screen["feed"] = {"items": [{"id": 1}], "total": 1, "limit": 10, "next_cursor": "abc"}
+        return screen
+
+
+def test_build_context_loads_screen_in_one_round_trip():
+    state = FakeState({"current_project_id": 7, "feed_filters": {"limit": 10, "cursors": [None]}})
+    api = FakeAPI()
+
+    ctx = asyncio.run(build_context(constants.ACTION_FEED, 1, state, api))
+
+    assert api.calls == [{"action": constants.ACTION_FEED, "project_id": 7, "limit": 10}]
+    assert ctx.is_admin is True
+    assert ctx.current_project_name == "Бренд"
+    assert ctx.feed == [{"id": 1}]
+    assert ctx.feed_filters["next_cursor"] == "abc"
+    assert state.data["projects"] == [{"id": 7, "name": "Бренд"}]
+
+
+def test_build_context_skips_project_screens_without_project():
+    state = FakeState({"projects": [{"id": 7, "name": "Бренд"}]})
+    api = FakeAPI()
+
+    ctx = asyncio.run(build_context(constants.ACTION_FEED, 1, state, api))
+
+    assert api.calls == [{"action": constants.ACTION_FEED}]
+    assert ctx.feed == []
@@ -0,0 +1,79 @@
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, event as sa_event
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from app import crud
+from app.db import Base, get_db
+from app.main import app
+
+
+def _client():
+    engine = create_engine(
+        "sqlite:///:memory:",
+        connect_args={"check_same_thread": False},
+        poolclass=StaticPool,
+    )
+    Base.metadata.create_all(bind=engine)
+    SessionLocal = sessionmaker(bind=engine, autocommit=False, autoflush=False)
+    statements = []
+    sa_event.listen(engine, "before_cursor_execute", lambda *args: statements.append(args[2]))
+
+    def override():
+        db = SessionLocal()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    app.dependency_overrides[get_db] = override
+    return TestClient(app), SessionLocal(), statements
+
+
+def test_screen_returns_profile_projects_and_action_payload():
+    client, db, statements = _client()
+    user = crud.get_or_create_user(db, "100")
+    project = crud.create_project(db, "Бренд", user.id)
+    crud.create_event(
+        db,
+        {
+            "project_id": project.id,
+            "cabinet_id": 1,
+            "marketplace": "WB",
+            "marketplace_event_id": "evt-1",
+            "event_type": "review",
+            "text": "Отлично",
+            "rating": 5,
+            "sentiment": "positive",
+            "internal_sku": "SKU1",
+            "raw_payload": {},
+        },
+    )
+    statements.clear()
+    try:
+        response = client.get("/bot/screen/100", params={"action": "feed", "project_id": project.id, "limit": 5})
+    finally:
+        app.dependency_overrides.clear()
+
+    assert response.status_code == 200
+    body = response.json()
+    assert body["profile"]["telegram_user_id"] == "100"
+    assert [item["name"] for item in body["projects"]] == ["Бренд"]
+    assert body["feed"]["total"] == 1
+    assert body["feed"]["items"][0]["text"] == "Отлично"
+    assert body["dashboard"] is None
+    assert sum("FROM users" in sql for sql in statements) == 1
+
+
+def test_screen_rejects_foreign_project_and_event():
+    client, db, _ = _client()
+    owner = crud.get_or_create_user(db, "100")
+    project = crud.create_project(db, "Бренд", owner.id)
+    try:
+        project_response = client.get("/bot/screen/200", params={"action": "dashboard", "project_id": project.id})
+        event_response = client.get("/bot/screen/200", params={"action": "card", "event_id": 1})
+    finally:
+        app.dependency_overrides.clear()
+
+    assert project_response.status_code == 404
+    assert event_response.status_code == 404
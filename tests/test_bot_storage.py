@@ -0,0 +1,34 @@
+import asyncio
+
+from aiogram.fsm.storage.base import StorageKey
+import fakeredis
+from fakeredis import aioredis
+
+from bot.storage import build_redis_storage
+
+
+def test_redis_storage_is_shared_between_replicas_with_ttl():
+    async def scenario():
+        server = fakeredis.FakeServer()
+        first = build_redis_storage(aioredis.FakeRedis(server=server), state_ttl=60, data_ttl=60)
+        second = build_redis_storage(aioredis.FakeRedis(server=server), state_ttl=60, data_ttl=60)
+        key = StorageKey(bot_id=1, chat_id=10, user_id=10)
+
+        await first.set_state(key, "ScreenStates:feed")
+        await first.set_data(key, {"nav_stack": [{"action": "dashboard", "payload": None}], "current_project_name": "Бренд"})
+
+        state = await second.get_state(key)
+        data = await second.get_data(key)
+        raw_key = first.key_builder.build(key, "data")
+        raw = await first.redis.get(raw_key)
+        ttl = await first.redis.ttl(raw_key)
+        await first.close()
+        await second.close()
+        return state, data, raw, ttl
+
+    state, data, raw, ttl = asyncio.run(scenario())
+
+    assert state == "ScreenStates:feed"
+    assert data["current_project_name"] == "Бренд"
+    assert raw.decode("utf-8") == '{"nav_stack":[{"action":"dashboard","payload":null}],"current_project_name":"Бренд"}'
+    assert 0 < ttl <= 60
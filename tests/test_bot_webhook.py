@@ -0,0 +1,75 @@
+import asyncio
+
+from fastapi.testclient import TestClient
+
+from bot.webhook import ChatOrderedExecutor, build_webhook_app, update_chat_id
+
+
+def test_executor_keeps_chat_order_without_head_of_line_blocking():
+    log = []
+
+    async def handler(item):
+        chat_id, seq, delay = item
+        await asyncio.sleep(delay)
+        log.append((chat_id, seq))
+
+    async def scenario():
+        executor = ChatOrderedExecutor(handler, workers=4, max_pending=100)
+        executor.start()
+        executor.submit(1, (1, 0, 0.05))
+        executor.submit(1, (1, 1, 0))
+        executor.submit(1, (1, 2, 0))
+        executor.submit(2, (2, 0, 0))
+        executor.submit(3, (3, 0, 0))
+        await executor.stop()
+
+    asyncio.run(scenario())
+
+    assert [seq for chat_id, seq in log if chat_id == 1] == [0, 1, 2]
+    assert log.index((2, 0)) < log.index((1, 0))
+    assert log.index((3, 0)) < log.index((1, 0))
+
+
+def test_executor_applies_backpressure():
+    async def handler(item):
+        await asyncio.sleep(0)
+
+    async def scenario():
+        executor = ChatOrderedExecutor(handler, workers=1, max_pending=2)
+        accepted = [executor.submit(chat_id, chat_id) for chat_id in range(3)]
+        executor.start()
+        await executor.stop()
+        return accepted, executor.pending
+
+    assert asyncio.run(scenario()) == ([True, True, False], 0)
+
+
+def test_update_chat_id_covers_messages_and_callbacks():
+    assert update_chat_id({"update_id": 1, "message": {"chat": {"id": 5}}}) == 5
+    assert update_chat_id({"update_id": 2, "callback_query": {"from": {"id": 7}, "message": {"chat": {"id": 6}}}}) == 6
+    assert update_chat_id({"update_id": 3, "inline_query": {"from": {"id": 8}}}) == 8
+    assert update_chat_id({"update_id": 4}) == ("update", 4)
+
+
+def test_webhook_checks_secret_and_answers_429_when_full():
+    received = []
+
+    async def handler(update):
+        received.append(update["update_id"])
+
+    app = build_webhook_app(handler, secret="s3cret", workers=1, max_pending=1)
+    headers = {"X-Telegram-Bot-Api-Secret-Token": "s3cret"}
+
+    with TestClient(app) as client:
+        forbidden = client.post("/telegram/webhook", json={"update_id": 1})
+        wrong = client.post("/telegram/webhook", json={"update_id": 1}, headers={"X-Telegram-Bot-Api-Secret-Token": "s3cre"})
+        client.app.state.executor.pending = 1
+        full = client.post("/telegram/webhook", json={"update_id": 2}, headers=headers)
+        client.app.state.executor.pending = 0
+        accepted = client.post("/telegram/webhook", json={"update_id": 3, "message": {"chat": {"id": 1}}}, headers=headers)
+
+    assert forbidden.status_code == wrong.status_code == 403
+    assert full.status_code == 429
+    assert full.headers["Retry-After"] == "1"
+    assert accepted.json() == {"ok": True}
+    assert received == [3]
@@ -0,0 +1,48 @@
+from app import crud, models
+
+
+def _event(marketplace_event_id, cabinet_id=1):
+    return {
+        "project_id": 1,
+        "cabinet_id": cabinet_id,
+        "marketplace": "WB",
+        "marketplace_event_id": marketplace_event_id,
+        "event_type": "review",
+        "text": "Отлично",
+        "rating": 5,
+        "sentiment": "positive",
+        "internal_sku": "SKU1",
+        "raw_payload": {"id": marketplace_event_id},
+        "media_links": [],
+    }
+
+
+def test_bulk_ingest_dedupes_inside_batch_and_against_db(db):
+    crud.create_event(db, _event("evt-1"))
+
+    created, duplicates = crud.create_events_bulk(
+        db,
+        [_event("evt-1"), _event("evt-2"), _event("evt-2"), _event("evt-3"), _event("evt-1", cabinet_id=2)],
+    )
+
+    assert sorted((event.cabinet_id, event.marketplace_event_id) for event in created) == [
+        (1, "evt-2"),
+        (1, "evt-3"),
+        (2, "evt-1"),
+    ]
+    assert all(event.id and event.status == "new" for event in created)
+    assert sorted(item["marketplace_event_id"] for item in duplicates) == ["evt-1", "evt-2"]
+    assert db.query(models.Event).count() == 4
+
+
+def test_bulk_ingest_empty_batch(db):
+    assert crud.create_events_bulk(db, []) == ([], [])
+
+
+def test_create_event_returns_existing_on_conflict(db):
+    event, created = crud.create_event(db, _event("evt-1"))
+    again, created_again = crud.create_event(db, _event("evt-1"))
+
+    assert created is True
+    assert created_again is False
+    assert again.id == event.id
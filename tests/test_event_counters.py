@@ -0,0 +1,54 @@
+from sqlalchemy import update
+
+from app import crud, models
+
+
+def _event(idx, sentiment="positive", event_type="review"):
+    return {
+        "project_id": 1,
+        "cabinet_id": 1,
+        "marketplace": "WB",
+        "marketplace_event_id": f"evt-{idx}",
+        "event_type": event_type,
+        "text": "Текст",
+        "rating": 5,
+        "sentiment": sentiment,
+        "internal_sku": "SKU1",
+        "raw_payload": {"id": idx},
+    }
+
+
+def test_counters_follow_inserts_and_status_changes(db):
+    crud.create_events_bulk(db, [_event(1), _event(2, sentiment=None), _event(3, event_type="question")])
+    event, _ = crud.create_event(db, _event(4, sentiment="negative"))
+    crud.create_event(db, _event(4, sentiment="negative"))
+
+    crud.set_event_status(db, event, "escalated")
+    db.commit()
+
+    assert crud.count_event_statuses(db, 1) == {"new": 3, "without_answer": 3, "escalated": 1}
+    assert crud.count_events(db, 1) == 4
+    assert crud.count_events(db, 1, status=crud.WITHOUT_ANSWER_STATUSES, sentiment="positive") == 2
+    assert crud.count_events(db, 1, internal_sku="SKU1") == 4
+
+
+def test_reconcile_fixes_drift(db):
+    crud.create_events_bulk(db, [_event(1), _event(2)])
+    db.execute(update(models.EventCounter).values(count=42))
+    db.commit()
+
+    crud.reconcile_event_counters(db, project_id=1)
+
+    assert crud.count_events(db, 1) == 2
+    assert crud.count_event_statuses(db, 1)["new"] == 2
+
+
+def test_reconcile_of_all_projects_drops_counters_without_events(db):
+    crud.create_events_bulk(db, [_event(1), {**_event(2), "project_id": 2}])
+    db.add(models.EventCounter(project_id=3, status="new", sentiment="", event_type="review", count=5))
+    db.execute(update(models.EventCounter).where(models.EventCounter.project_id == 2).values(count=9))
+    db.commit()
+
+    crud.reconcile_event_counters(db)
+
+    assert [crud.count_events(db, project_id) for project_id in (1, 2, 3)] == [1, 1, 0]
@@ -0,0 +1,41 @@
+import pytest
+
+from app import crud
+
+
+def _event(idx, status_hint="review"):
+    return {
+        "project_id": 1,
+        "cabinet_id": 1,
+        "marketplace": "WB",
+        "marketplace_event_id": f"evt-{idx}",
+        "event_type": status_hint,
+        "text": f"Отзыв {idx}",
+        "rating": 5,
+        "sentiment": "positive",
+        "internal_sku": "SKU1",
+        "raw_payload": {"id": idx},
+    }
+
+
+def test_keyset_pages_cover_feed_without_gaps_or_repeats(db):
+    crud.create_events_bulk(db, [_event(idx) for idx in range(7)])
+    crud.create_events_bulk(db, [_event(idx) for idx in range(7, 12)])
+
+    seen = []
+    cursor = None
+    while True:
+        page, cursor = crud.list_events_page(db, 1, limit=5, cursor=cursor)
+        seen.extend(event.id for event in page)
+        if not cursor:
+            break
+
+    assert len(seen) == 12
+    assert len(set(seen)) == 12
+    offset_order = [event.id for event in crud.list_events(db, 1, limit=100)]
+    assert seen == offset_order
+
+
+def test_keyset_rejects_malformed_cursor(db):
+    with pytest.raises(ValueError, match="Invalid cursor"):
+        crud.list_events_page(db, 1, cursor="not-a-cursor")
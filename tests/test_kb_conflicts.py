@@ -0,0 +1,90 @@
+from sqlalchemy import select
+
+from app import crud, models
+from app.schemas import LLMResponse
+from app.services.generation import draft_replies
+from app.services.kb_conflicts import ConflictMatrix, conflict_matrices, rebuild_conflicts, rules_conflict
+from app.services.llm import LLMAdapter
+
+
+class AttributingLLM(LLMAdapter):
+    def __init__(self, rule_ids):
+        self.rule_ids = rule_ids
+
+    def generate_batch(self, prompts, project_ids=None):
+        return [LLMResponse(text="Спасибо!", confidence=90, kb_rule_ids=self.rule_ids) for _ in prompts]
+
+
+def _pairs(db):
+    return db.execute(
+        select(models.KBRuleConflict.rule_id, models.KBRuleConflict.other_rule_id).order_by(
+            models.KBRuleConflict.rule_id, models.KBRuleConflict.other_rule_id
+        )
+    ).all()
+
+
+def test_verdicts_need_a_shared_topic_and_a_disagreement():
+    assert rules_conflict("Гарантия 1 год", "Гарантия 6 месяцев")
+    assert rules_conflict("Гарантия на фен 2 года", "Гарантия 1 год")
+    assert rules_conflict("Доставка бесплатная", "Доставка не бесплатная")
+    assert not rules_conflict("Гарантия 1 год", "Гарантия 12 месяцев")
+    assert not rules_conflict("Гарантия 1 год", "Доставка 2 дня")
+    assert not rules_conflict("Гарантия 1 год", "Гарантия распространяется на заводской брак")
+    assert not rules_conflict("Таблица размеров в карточке товара", "Размер соответствует таблице")
+
+
+def test_matrix_lookup_covers_every_pair_of_the_retrieved_rules():
+    matrix = ConflictMatrix([(1, 4), (2, 3)])
+
+    assert matrix.pairs([5, 4, 1, 3]) == [(1, 4)]
+    assert matrix.has_conflict([3, 2])
+    assert not matrix.has_conflict([1, 2, 5])
+
+
+def test_rule_writes_store_pairs_within_retrieval_scope(db):
+    year = crud.create_kb_rule(db, 1, None, "Гарантия 1 год")
+    months = crud.create_kb_rule(db, 1, "SKU1", "Гарантия 6 месяцев")
+    other_sku = crud.create_kb_rule(db, 1, "SKU2", "Гарантия 2 года")
+    crud.create_kb_rule(db, 1, None, "Доставка 2 дня")
+    crud.create_kb_rule(db, 2, None, "Гарантия 3 года")
+
+    assert _pairs(db) == [(year.id, months.id), (year.id, other_sku.id)]
+
+    crud.delete_kb_rule(db, year.id)
+    assert _pairs(db) == []
+
+    db.add(models.KBRule(project_id=1, internal_sku="SKU1", text="Гарантия 2 года"))
+    db.commit()
+    assert rebuild_conflicts(db, 1) == 1
+    assert len(_pairs(db)) == 1
+
+
+def test_draft_is_flagged_only_for_contradicting_rules(db):
+    year = crud.create_kb_rule(db, 1, None, "Гарантия 1 год")
+    months = crud.create_kb_rule(db, 1, None, "Гарантия 6 месяцев")
+    delivery = crud.create_kb_rule(db, 1, None, "Доставка 2 дня")
+    created, _ = crud.create_events_bulk(
+        db,
+        [
+            {
+                "project_id": 1,
+                "cabinet_id": 1,
+                "marketplace": "WB",
+                "marketplace_event_id": marketplace_event_id,
+                "event_type": "question",
+                "text": "Есть ли гарантия?",
+                "rating": None,
+                "sentiment": None,
+                "internal_sku": "SKU1",
+                "raw_payload": {},
+            }
+            for marketplace_event_id in ("q-1", "q-2")
+        ],
+    )
+    conflict_matrices.forget(1)
+
+    draft_replies(db, [created[0].id], AttributingLLM([year.id, delivery.id]))
+    draft_replies(db, [created[1].id], AttributingLLM([year.id, delivery.id, months.id]))
+
+    assert db.get(models.Event, created[0].id).conflict is False
+    assert db.get(models.Event, created[1].id).conflict is True
@@ -0,0 +1,122 @@
+import random
+
+from sqlalchemy import update
+
+from app import crud, models
+from app.services.generation import draft_replies
+from app.services.kb_index import BM25Index, KBIndexRegistry, ProjectKBIndex, kb_indexes, stem, tokenize
+from app.services.kb_snapshot import kb_snapshots
+from app.services.llm import LLMAdapter
+
+
+def test_russian_word_forms_share_a_stem():
+    assert stem("гарантия") == stem("гарантии") == stem("гарантией")
+    assert stem("доставка") == stem("доставки") == stem("доставку")
+    assert stem("красивая") == stem("красивые")
+    assert tokenize("Всё отлично, а гарантия на X200 есть?") == ["отличн", "гарант", "x200"]
+
+
+def test_bm25_prefers_rare_terms_and_short_rules():
+    index = ProjectKBIndex()
+    index.add(1, None, "Доставка по России 3-5 дней")
+    index.add(2, None, "Гарантия на товар 1 год")
+    index.add(3, None, "Гарантия на товар 1 год, обмен и возврат через пункт выдачи в течение 14 дней")
+    index.add(4, None, "Товар сертифицирован")
+
+    hits = index.search("Какая гарантия на товар?", k=3)
+
+    assert [hit.rule_id for hit in hits] == [2, 3, 4]
+    assert hits[0].score > hits[1].score > hits[2].score
+    assert index.search("привет", k=3) == []
+
+
+def test_search_sees_project_rules_and_only_the_events_sku():
+    index = ProjectKBIndex()
+    index.add(1, None, "Гарантия 1 год на всю продукцию")
+    index.add(2, "SKU1", "Гарантия на фен 2 года")
+    index.add(3, "SKU2", "Гарантия на утюг 6 месяцев")
+
+    assert {hit.rule_id for hit in index.search("гарантия", "SKU1")} == {1, 2}
+    assert {hit.rule_id for hit in index.search("гарантия")} == {1}
+    assert index.search("гарантия", "SKU2", k=1)[0].internal_sku == "SKU2"
+
+
+def test_incremental_updates_match_a_fresh_build():
+    rng = random.Random(3)
+    words = "гарантия доставка размер возврат упаковка цвет ткань заряд батарея чехол модель брак".split()
+    rules = {rule_id: " ".join(rng.choices(words, k=rng.randint(2, 8))) for rule_id in range(1, 400)}
+    incremental = BM25Index(walk_budget=4)
+    for rule_id, text in rules.items():
+        incremental.add(rule_id, tokenize(text))
+    for rule_id in range(1, 400, 3):
+        incremental.remove(rule_id)
+        del rules[rule_id]
+    fresh = BM25Index(walk_budget=10_000)
+    for rule_id, text in rules.items():
+        fresh.add(rule_id, tokenize(text))
+    fresh._reweigh()
+    incremental._reweigh()
+
+    for query in ("гарантия модель", "доставка упаковка брак", "заряд батарея чехол цвет"):
+        expected = fresh.search(tokenize(query), k=5)
+        assert incremental.search(tokenize(query), k=5) == expected
+        scores = {}
+        for rule_id, text in rules.items():
+            score = sum(
+                fresh._idf(len(fresh.postings[term])) * fresh.postings[term].get(rule_id, 0.0)
+                for term in set(tokenize(query))
+                if term in fresh.postings
+            )
+            scores[rule_id] = score
+        assert [score for score, _ in expected] == sorted(scores.values(), reverse=True)[:5]
+
+
+def test_registry_follows_crud_writes_and_other_processes(db):
+    crud.create_project(db, "Бренд", crud.get_or_create_user(db, "100").id)
+    registry = KBIndexRegistry()
+    rule = crud.create_kb_rule(db, 1, None, "Гарантия 1 год")
+    assert [hit.rule_id for hit in registry.search(db, 1, "гарантия")] == [rule.id]
+
+    other = crud.create_kb_rule(db, 1, "SKU1", "Гарантия на фен 2 года")
+    assert {hit.rule_id for hit in registry.search(db, 1, "гарантия", "SKU1")} == {rule.id, other.id}
+
+    crud.delete_kb_rule(db, rule.id)
+    assert [hit.rule_id for hit in registry.search(db, 1, "гарантия", "SKU1")] == [other.id]
+
+    index = kb_indexes.get(db, 1)
+    crud.create_kb_rule(db, 1, None, "Доставка 2 дня")
+    assert kb_indexes.get(db, 1) is index
+    assert len(index) == 2
+
+    db.execute(update(models.KBRule).where(models.KBRule.id == other.id).values(text="Доставка курьером"))
+    db.execute(update(models.Project).where(models.Project.id == 1).values(kb_version=models.Project.kb_version + 1))
+    db.commit()
+    kb_snapshots.clear()
+    rebuilt = kb_indexes.get(db, 1)
+    assert rebuilt is not index
+    assert {hit.rule_id for hit in rebuilt.search("курьером", "SKU1")} == {other.id}
+
+
+def test_drafts_link_the_most_relevant_rules(db):
+    warranty = crud.create_kb_rule(db, 1, "SKU1", "Гарантия на фен 2 года")
+    crud.create_kb_rule(db, 1, None, "Доставка 2 дня")
+    crud.create_kb_rule(db, 1, "SKU2", "Гарантия на утюг 6 месяцев")
+    event, _ = crud.create_event(
+        db,
+        {
+            "project_id": 1,
+            "cabinet_id": 1,
+            "marketplace": "WB",
+            "marketplace_event_id": "q-1",
+            "event_type": "question",
+            "text": "Какая гарантия на фен?",
+            "rating": None,
+            "sentiment": None,
+            "internal_sku": "SKU1",
+            "raw_payload": {},
+        },
+    )
+
+    draft_replies(db, [event.id], LLMAdapter(), kb_top_k=2)
+
+    assert db.get(models.Event, event.id).kb_rule_ids == [warranty.id]
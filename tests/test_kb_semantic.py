@@ -0,0 +1,103 @@
+import numpy as np
+
+from app import crud, models
+from app.services.generation import draft_replies
+from app.services.kb_semantic import HashingEmbedder, SemanticKBIndex
+from app.services.llm import LLMAdapter
+
+
+class CountingEmbedder(HashingEmbedder):
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.encoded = []
+
+    def encode(self, texts):
+        self.encoded.extend(texts)
+        return super().encode(texts)
+
+
+def test_hashed_vectors_are_normalized_and_match_word_variants():
+    embedder = HashingEmbedder(dim=256)
+    vectors = embedder.encode(["Маломерит, берите больше", "маломерка", "Доставка 2 дня", ""])
+
+    assert vectors.shape == (4, 256)
+    assert np.allclose(np.linalg.norm(vectors[:3], axis=1), 1.0)
+    assert not vectors[3].any()
+    assert vectors[0] @ vectors[1] > vectors[0] @ vectors[2]
+
+
+def test_batched_search_ranks_by_cosine_within_sku_scope(db):
+    size = crud.create_kb_rule(db, 1, None, "Модель маломерит, советуем брать на размер больше")
+    delivery = crud.create_kb_rule(db, 1, None, "Доставка занимает 2-3 дня")
+    warranty = crud.create_kb_rule(db, 1, "SKU1", "Гарантия на фен 2 года")
+    crud.create_kb_rule(db, 1, "SKU2", "Гарантия на утюг 6 месяцев")
+    other = crud.create_kb_rule(db, 2, None, "Гарантия 1 год")
+    index = SemanticKBIndex(HashingEmbedder(dim=512), min_score=0.1)
+
+    hits = index.search_batch(
+        db,
+        [
+            (1, "SKU1", "Платье маломерное, размер меньше"),
+            (1, "SKU1", "Какая гарантия на фен?"),
+            (1, None, "Сколько дней доставка?"),
+            (2, None, "гарантия"),
+        ],
+        k=2,
+    )
+
+    assert hits[0][0][1] == size.id
+    assert [rule_id for _, rule_id in hits[1]] == [warranty.id]
+    assert hits[2][0][1] == delivery.id
+    assert [rule_id for _, rule_id in hits[3]] == [other.id]
+    assert all(score > 0.1 for found in hits for score, _ in found)
+
+
+def test_vectors_persist_and_only_new_rules_are_embedded(db, tmp_path):
+    crud.create_project(db, "Бренд", crud.get_or_create_user(db, "100").id)
+    first = crud.create_kb_rule(db, 1, None, "Гарантия 1 год")
+    second = crud.create_kb_rule(db, 1, None, "Доставка 2 дня")
+    embedder = CountingEmbedder(dim=128)
+    SemanticKBIndex(embedder, str(tmp_path)).get(db, 1)
+    assert embedder.encoded == ["Гарантия 1 год", "Доставка 2 дня"]
+    assert [item.name for item in tmp_path.iterdir()] == ["1.npz"]
+
+    restarted = CountingEmbedder(dim=128)
+    index = SemanticKBIndex(restarted, str(tmp_path))
+    assert index.get(db, 1).ids.tolist() == [first.id, second.id]
+    assert restarted.encoded == []
+
+    crud.delete_kb_rule(db, first.id)
+    third = crud.create_kb_rule(db, 1, "SKU1", "Возврат 14 дней")
+    vectors = index.get(db, 1)
+    assert vectors.ids.tolist() == [second.id, third.id]
+    assert vectors.skus.tolist() == ["", "SKU1"]
+    assert restarted.encoded == ["Возврат 14 дней"]
+
+    other_model = CountingEmbedder(dim=64)
+    SemanticKBIndex(other_model, str(tmp_path)).get(db, 1)
+    assert len(other_model.encoded) == 2
+
+
+def test_drafts_use_semantic_matches_when_enabled(db):
+    size = crud.create_kb_rule(db, 1, "SKU1", "Модель маломерит, берите на размер больше")
+    crud.create_kb_rule(db, 1, None, "Доставка занимает 2-3 дня")
+    event, _ = crud.create_event(
+        db,
+        {
+            "project_id": 1,
+            "cabinet_id": 1,
+            "marketplace": "WB",
+            "marketplace_event_id": "r-1",
+            "event_type": "review",
+            "text": "Маломерка, пришлось менять",
+            "rating": 3,
+            "sentiment": None,
+            "internal_sku": "SKU1",
+            "raw_payload": {},
+        },
+    )
+
+    semantic = SemanticKBIndex(HashingEmbedder(), min_score=0.1)
+    draft_replies(db, [event.id], LLMAdapter(), kb_top_k=1, semantic=semantic)
+
+    assert db.get(models.Event, event.id).kb_rule_ids == [size.id]
@@ -0,0 +1,94 @@
+import time
+
+import fakeredis
+import pytest
+from sqlalchemy import update
+
+from app import crud, models
+from app.services.kb_snapshot import KBSnapshotCache, kb_snapshots
+
+
+def _project(db):
+    user = crud.get_or_create_user(db, "100")
+    return crud.create_project(db, "Бренд", user.id)
+
+
+def _wait_for(condition, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline
+        time.sleep(0.01)
+
+
+def test_snapshot_is_read_only_and_indexed_by_id_and_sku(db):
+    project = _project(db)
+    shared = crud.create_kb_rule(db, project.id, None, "Доставка 2 дня")
+    sku_rule = crud.create_kb_rule(db, project.id, "SKU1", "Гарантия 1 год")
+
+    snapshot = kb_snapshots.get(db, project.id)
+
+    assert [rule.id for rule in snapshot.rules] == [shared.id, sku_rule.id]
+    assert [rule.text for rule in snapshot.by_sku["SKU1"]] == ["Гарантия 1 год"]
+    assert [rule.id for rule in snapshot.rules_by_ids([sku_rule.id, 999, shared.id])] == [sku_rule.id, shared.id]
+    assert snapshot.digest("SKU2") == snapshot.digest(None) != snapshot.digest("SKU1")
+    with pytest.raises(AttributeError):
+        snapshot.version = 7
+    with pytest.raises(AttributeError):
+        snapshot.rules[0].text = "Гарантия 5 лет"
+    with pytest.raises(AttributeError):
+        snapshot.extra = 1
+
+
+def test_rule_writes_bump_the_project_version_and_reload_the_snapshot(db):
+    project = _project(db)
+    cache = KBSnapshotCache()
+
+    rule = crud.create_kb_rule(db, project.id, None, "Доставка 2 дня")
+    first = cache.get(db, project.id)
+    assert first.version == 1
+    assert cache.get(db, project.id) is first
+
+    db.add(models.KBRule(project_id=project.id, text="Гарантия 1 год"))
+    db.commit()
+    assert cache.get(db, project.id) is first
+
+    crud.delete_kb_rule(db, rule.id)
+    second = cache.get(db, project.id)
+    assert second.version == 2
+    assert [item.text for item in second.rules] == ["Гарантия 1 год"]
+
+
+def test_listening_cache_trusts_pubsub_and_reloads_only_stale_projects(db):
+    project = _project(db)
+    other = crud.create_project(db, "Другой", project.owner_id)
+    crud.create_kb_rule(db, project.id, None, "Доставка 2 дня")
+    crud.create_kb_rule(db, other.id, None, "Гарантия 1 год")
+    server = fakeredis.FakeServer()
+    worker = KBSnapshotCache(retry_seconds=0.01)
+    worker.listen(fakeredis.FakeRedis(server=server))
+    _wait_for(worker._listening.is_set)
+    cached = worker.get(db, project.id)
+    untouched = worker.get(db, other.id)
+
+    db.execute(update(models.Project).where(models.Project.id == project.id).values(kb_version=5))
+    db.commit()
+    assert worker.get(db, project.id) is cached
+
+    api = KBSnapshotCache()
+    api.redis = fakeredis.FakeRedis(server=server)
+    api.publish(project.id, 5)
+    _wait_for(lambda: project.id not in worker._snapshots)
+
+    assert worker.get(db, project.id).version == 5
+    assert worker.get(db, other.id) is untouched
+
+
+def test_event_detail_sources_come_from_the_snapshot(db):
+    project = _project(db)
+    first = crud.create_kb_rule(db, project.id, None, "Доставка 2 дня")
+    second = crud.create_kb_rule(db, project.id, "SKU1", "Гарантия 1 год")
+
+    rules = crud.list_kb_rules_by_ids(db, [second.id, first.id], project.id)
+
+    assert [rule.text for rule in rules] == ["Гарантия 1 год", "Доставка 2 дня"]
+    assert rules[0] is kb_snapshots.get(db, project.id).by_id[second.id]
@@ -0,0 +1,219 @@
+import asyncio
+import json
+
+import httpx
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from app import crud, models
+from app.db import Base, get_db
+from app.main import app
+from app.routers import bot as bot_router
+from app.schemas import LLMResponse
+from app.services.llm import AsyncLLMAdapter, BlockingLLMAdapter, HTTPLLMAdapter, get_async_adapter
+from app.services.prompts import Prompt
+
+
+class ScriptedAdapter(AsyncLLMAdapter):
+    """Each attempt pops (delay, error) from the script; tracks concurrency per project."""
+
+    def __init__(self, script=None, delay=0.0, **limits):
+        super().__init__(**limits)
+        self.script = list(script or [])
+        self.delay = delay
+        self.attempts = 0
+        self.cancelled = 0
+        self.active = 0
+        self.peak = 0
+
+    async def _complete(self, prompt):
+        self.attempts += 1
+        attempt = self.attempts
+        delay, error = self.script.pop(0) if self.script else (self.delay, None)
+        self.active += 1
+        self.peak = max(self.peak, self.active)
+        try:
+            await asyncio.sleep(delay)
+        except asyncio.CancelledError:
+            self.cancelled += 1
+            raise
+        finally:
+            self.active -= 1
+        if error:
+            raise error
+        return LLMResponse(text=f"{prompt}#{attempt}", confidence=80)
+
+
+def test_slow_attempt_is_hedged_and_first_success_wins():
+    adapter = ScriptedAdapter([(1.0, None), (0.0, None)], hedge_after=0.01, max_attempts=2)
+
+    response = asyncio.run(adapter.generate("привет"))
+
+    assert response.text == "привет#2"
+    assert (adapter.attempts, adapter.cancelled) == (2, 1)
+
+
+def test_failed_attempt_is_retried_and_timeout_is_enforced():
+    adapter = ScriptedAdapter([(0.0, RuntimeError("502")), (0.0, None)], hedge_after=5, max_attempts=2)
+    assert asyncio.run(adapter.generate("a")).text == "a#2"
+
+    failing = ScriptedAdapter([(0.0, RuntimeError("502")), (0.0, RuntimeError("503"))], max_attempts=2)
+    with pytest.raises(RuntimeError, match="503"):
+        asyncio.run(failing.generate("a"))
+
+    slow = ScriptedAdapter(delay=1.0, timeout=0.05, max_attempts=1)
+    with pytest.raises(asyncio.TimeoutError):
+        asyncio.run(slow.generate("a"))
+
+
+def test_in_flight_limits_per_project_and_provider():
+    adapter = ScriptedAdapter(delay=0.01, max_in_flight=5, max_in_flight_per_project=2)
+    responses = asyncio.run(adapter.generate_batch([str(i) for i in range(8)], [1] * 8))
+    assert len(responses) == 8
+    assert adapter.peak == 2
+
+    adapter = ScriptedAdapter(delay=0.01, max_in_flight=5, max_in_flight_per_project=2)
+    asyncio.run(adapter.generate_batch([str(i) for i in range(20)], list(range(20))))
+    assert adapter.peak == 5
+
+
+def test_batch_returns_failures_in_place_of_responses():
+    adapter = ScriptedAdapter([(0.0, None), (0.0, RuntimeError("502")), (0.0, None)], max_attempts=1)
+
+    responses = asyncio.run(adapter.generate_batch(["a", "b", "c"]))
+
+    assert [getattr(item, "text", None) for item in responses] == ["a#1", None, "c#3"]
+    assert isinstance(responses[1], RuntimeError)
+
+
+def test_blocking_facade_keeps_one_loop_for_the_process():
+    blocking = BlockingLLMAdapter(ScriptedAdapter(delay=0.01, max_in_flight_per_project=50))
+    try:
+        assert [item.text for item in blocking.generate_batch(["a", "b"], [1, 1])] == ["a#1", "b#2"]
+        assert blocking.generate("c").text == "c#3"
+    finally:
+        blocking.close()
+
+
+def _sse_transport(seen):
+    def handler(request):
+        body = json.loads(request.content)
+        seen.append(body)
+        if not body["stream"]:
+            return httpx.Response(200, json={"choices": [{"message": {"content": "Спасибо за отзыв!"}}]})
+        events = [{"choices": [{"delta": {"content": part}}]} for part in ("Спасибо", " за", " отзыв!")]
+        lines = "".join(f"data: {json.dumps(event)}\n\n" for event in events) + "data: [DONE]\n\n"
+        return httpx.Response(200, text=lines, headers={"Content-Type": "text/event-stream"})
+
+    return httpx.MockTransport(handler)
+
+
+def test_http_adapter_completes_and_streams_tokens():
+    seen = []
+
+    async def scenario():
+        client = httpx.AsyncClient(base_url="https://llm.test", transport=_sse_transport(seen))
+        adapter = HTTPLLMAdapter("https://llm.test", "key", "model-x", client=client)
+        try:
+            full = await adapter.generate("Отзыв", project_id=1)
+            chunks = [chunk async for chunk in adapter.stream("Отзыв", project_id=1)]
+        finally:
+            await adapter.aclose()
+        return full, chunks
+
+    full, chunks = asyncio.run(scenario())
+
+    assert full.text == "Спасибо за отзыв!"
+    assert chunks == ["Спасибо", " за", " отзыв!"]
+    assert seen[0]["model"] == "model-x"
+    assert seen[0]["messages"] == [{"role": "user", "content": "Отзыв"}]
+
+
+def test_adapter_needs_at_least_one_attempt():
+    with pytest.raises(ValueError):
+        ScriptedAdapter(max_attempts=0)
+
+
+def _shared_sessions(monkeypatch):
+    """A session factory the router's own sessions share, since it saves from a thread pool."""
+    engine = create_engine(
+        "sqlite:///:memory:", connect_args={"check_same_thread": False}, poolclass=StaticPool
+    )
+    Base.metadata.create_all(bind=engine)
+    SessionLocal = sessionmaker(bind=engine, autocommit=False, autoflush=False)
+    monkeypatch.setattr(bot_router, "SessionLocal", SessionLocal)
+    return SessionLocal
+
+
+def _new_event(db, project_id, marketplace_event_id="evt-1"):
+    event, _ = crud.create_event(
+        db,
+        {
+            "project_id": project_id,
+            "cabinet_id": 1,
+            "marketplace": "WB",
+            "marketplace_event_id": marketplace_event_id,
+            "event_type": "review",
+            "text": "Отлично",
+            "rating": 5,
+            "sentiment": "positive",
+            "internal_sku": "SKU1",
+            "raw_payload": {},
+        },
+    )
+    return event
+
+
+def test_regenerate_endpoint_streams_and_saves_draft(monkeypatch):
+    SessionLocal = _shared_sessions(monkeypatch)
+    db = SessionLocal()
+    user = crud.get_or_create_user(db, "100")
+    project = crud.create_project(db, "Бренд", user.id)
+    event = _new_event(db, project.id)
+    client = httpx.AsyncClient(base_url="https://llm.test", transport=_sse_transport([]))
+
+    def override_db():
+        session = SessionLocal()
+        try:
+            yield session
+        finally:
+            session.close()
+
+    app.dependency_overrides[get_db] = override_db
+    app.dependency_overrides[get_async_adapter] = lambda: HTTPLLMAdapter(
+        "https://llm.test", "key", "model-x", client=client
+    )
+    try:
+        response = TestClient(app).post(f"/bot/events/100/{event.id}/regenerate")
+        foreign = TestClient(app).post(f"/bot/events/200/{event.id}/regenerate")
+    finally:
+        app.dependency_overrides.clear()
+
+    assert response.status_code == 200
+    assert response.text == "Спасибо за отзыв!"
+    assert foreign.status_code == 404
+    db.expire_all()
+    saved = db.get(models.Event, event.id)
+    assert (saved.suggested_reply, saved.status) == ("Спасибо за отзыв!", "drafted")
+    assert saved.prompt_tokens > 0
+
+
+def test_regeneration_is_saved_without_a_reader_and_bounded_by_the_timeout(monkeypatch):
+    SessionLocal = _shared_sessions(monkeypatch)
+    db = SessionLocal()
+    project = crud.create_project(db, "Бренд", crud.get_or_create_user(db, "100").id)
+    abandoned = _new_event(db, project.id, "evt-1")
+    stuck = _new_event(db, project.id, "evt-2")
+    prompt = Prompt(text="привет", tokens=2, prefix_tokens=0, rule_ids=(), context="")
+
+    asyncio.run(bot_router._regenerate(ScriptedAdapter(), abandoned.id, project.id, prompt, asyncio.Queue()))
+    slow = ScriptedAdapter(delay=1.0, timeout=0.05)
+    asyncio.run(bot_router._regenerate(slow, stuck.id, project.id, prompt, asyncio.Queue()))
+
+    db.expire_all()
+    assert (abandoned.suggested_reply, abandoned.status) == ("привет#1", "drafted")
+    assert (stuck.suggested_reply, stuck.status) == (None, "new")
+    assert "TimeoutError" in stuck.generation_error
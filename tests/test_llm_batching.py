@@ -0,0 +1,153 @@
+import fakeredis
+import pytest
+
+from app import crud, models
+from app.schemas import LLMResponse
+from app.services.generation import GenerationBatcher, draft_replies
+from app.services.llm import LLMAdapter
+
+
+class FakeClock:
+    def __init__(self, now=1000.0):
+        self.now = now
+        self.sleeps = []
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(round(seconds, 3))
+        self.now += seconds
+
+
+class RecordingLLM(LLMAdapter):
+    def __init__(self):
+        self.batches = []
+
+    def generate_batch(self, prompts, project_ids=None):
+        reviews = [prompt.splitlines()[-1] for prompt in prompts]
+        self.batches.append(reviews)
+        return [LLMResponse(text=f"Ответ: {review}", confidence=90, kb_rule_ids=[1]) for review in reviews]
+
+
+class FlakyLLM(RecordingLLM):
+    def __init__(self, failing):
+        super().__init__()
+        self.failing = failing
+
+    def generate_batch(self, prompts, project_ids=None):
+        responses = super().generate_batch(prompts, project_ids)
+        return [
+            RuntimeError(review) if review in self.failing else response
+            for review, response in zip(self.batches[-1], responses)
+        ]
+
+
+def _event(marketplace_event_id, project_id):
+    return {
+        "project_id": project_id,
+        "cabinet_id": project_id,
+        "marketplace": "WB",
+        "marketplace_event_id": marketplace_event_id,
+        "event_type": "review",
+        "text": marketplace_event_id,
+        "rating": 5,
+        "sentiment": "positive",
+        "internal_sku": "SKU1",
+        "raw_payload": {},
+    }
+
+
+def test_batcher_releases_full_batches_at_once_and_partial_ones_after_wait():
+    clock = FakeClock()
+    batcher = GenerationBatcher(fakeredis.FakeRedis(), max_items=2, max_wait_ms=500, clock=clock, sleep=clock.sleep)
+    for event_id in (1, 2, 3):
+        batcher.push(event_id)
+
+    assert batcher.next_batch() == [1, 2]
+    assert clock.sleeps == []
+    assert batcher.next_batch() == [3]
+    assert clock.sleeps == [0.5]
+    assert batcher.next_batch() == []
+
+
+def test_taken_batches_survive_a_killed_worker_until_acked():
+    clock = FakeClock()
+    redis = fakeredis.FakeRedis()
+    crashed = GenerationBatcher(redis, max_items=2, max_wait_ms=0, clock=clock, sleep=clock.sleep, worker_id="w1")
+    for event_id in (1, 2, 3):
+        crashed.push(event_id)
+    assert crashed.next_batch() == [1, 2]
+    survivor = GenerationBatcher(redis, max_items=2, max_wait_ms=0, clock=clock, sleep=clock.sleep, worker_id="w2")
+
+    assert survivor.recover() == 0
+    redis.delete("llm:pending:lease:w1")
+    assert survivor.recover() == 2
+    assert survivor.next_batch() == [1, 2]
+    survivor.ack()
+    assert survivor.next_batch() == [3]
+    survivor.ack()
+    assert redis.keys("llm:pending:processing:*") == []
+
+
+def test_failing_events_are_retried_then_dropped_and_marked(db):
+    created, _ = crud.create_events_bulk(db, [_event("a", 1)])
+    clock = FakeClock()
+    batcher = GenerationBatcher(
+        fakeredis.FakeRedis(), max_wait_ms=0, clock=clock, sleep=clock.sleep, worker_id="w1", max_attempts=2
+    )
+    batcher.push(created[0].id)
+
+    assert batcher.next_batch() == [created[0].id]
+    assert batcher.fail() == []
+    assert batcher.next_batch() == [created[0].id]
+    dropped = batcher.fail()
+    crud.mark_generation_failed(db, dropped, "RuntimeError('provider down')")
+
+    assert dropped == [created[0].id]
+    assert batcher.next_batch() == []
+    event = db.get(models.Event, created[0].id)
+    db.refresh(event)
+    assert (event.status, event.generation_error) == ("new", "RuntimeError('provider down')")
+
+
+def test_only_events_the_llm_failed_on_are_retried(db):
+    created, _ = crud.create_events_bulk(db, [_event("a", 1), _event("b", 1), _event("c", 1)])
+    ids = [event.id for event in created]
+    clock = FakeClock()
+    redis = fakeredis.FakeRedis()
+    batcher = GenerationBatcher(redis, max_wait_ms=0, clock=clock, sleep=clock.sleep, worker_id="w1", max_attempts=2)
+    for event_id in ids:
+        batcher.push(event_id)
+    llm = FlakyLLM(failing={"b"})
+
+    failures = {}
+    assert draft_replies(db, batcher.next_batch(), llm, failures=failures) == 2
+    assert list(failures) == [ids[1]]
+    assert batcher.fail(failures) == []
+    batcher.ack()
+
+    assert batcher.next_batch() == [ids[1]]
+    assert batcher.fail([ids[1]]) == [ids[1]]
+    assert redis.keys("llm:pending:processing:*") == []
+    statuses = {event.marketplace_event_id: event.status for event in db.query(models.Event).all()}
+    assert statuses == {"a": "drafted", "b": "new", "c": "drafted"}
+    with pytest.raises(RuntimeError, match="b"):
+        draft_replies(db, [ids[1]], llm)
+
+
+def test_draft_replies_uses_one_llm_call_and_skips_handled_events(db):
+    created, _ = crud.create_events_bulk(db, [_event("a", 1), _event("b", 2), _event("c", 2)])
+    crud.set_event_status(db, created[2], "sent")
+    db.commit()
+    llm = RecordingLLM()
+
+    drafted = draft_replies(db, [event.id for event in created], llm)
+
+    assert drafted == 2
+    assert llm.batches == [["a", "b"]]
+    events = {event.marketplace_event_id: event for event in db.query(models.Event).all()}
+    assert (events["a"].status, events["a"].suggested_reply, events["a"].kb_rule_ids) == ("drafted", "Ответ: a", [1])
+    assert events["b"].status == "drafted"
+    assert events["c"].suggested_reply is None
+    assert crud.count_events(db, 2, status="drafted") == 1
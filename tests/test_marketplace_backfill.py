@@ -0,0 +1,190 @@
+import asyncio
+import json
+from datetime import datetime, timedelta, timezone
+
+import httpx
+from sqlalchemy import create_engine, func, select
+from sqlalchemy.orm import sessionmaker
+
+from app import crud, models
+from app.config import settings
+from app.db import Base
+from app.marketplace.clients import AsyncOzonClient, AsyncWBClient
+from app.marketplace.ratelimit import LocalTokenBucket
+from app.services import backfill as backfill_service
+from app.services.backfill import backfill_claimed, window_progress
+
+
+async def _no_sleep(seconds):
+    pass
+
+
+def _setup(monkeypatch, tmp_path):
+    monkeypatch.setattr(settings, "encryption_key", "test-key")
+    monkeypatch.setattr(settings, "wb_api_base_url", "https://wb.test")
+    monkeypatch.setattr(AsyncWBClient, "page_size", 2)
+    engine = create_engine(f"sqlite:///{tmp_path / 'backfill.db'}")
+    Base.metadata.create_all(bind=engine)
+    SessionLocal = sessionmaker(bind=engine, autocommit=False, autoflush=False)
+    db = SessionLocal()
+    user = crud.get_or_create_user(db, "1")
+    project = crud.create_project(db, "Бренд", user.id)
+    cabinet = crud.create_cabinet(db, project.id, "WB", "WB", "wb-token", backfill_days=30)
+    return SessionLocal, db, cabinet
+
+
+def _day(start_at, days):
+    return str(int((start_at + timedelta(days=days)).replace(tzinfo=timezone.utc).timestamp()))
+
+
+def _history(start_at):
+    def item(key, days):
+        created = (start_at + timedelta(days=days)).replace(tzinfo=timezone.utc)
+        return {
+            "id": key,
+            "text": key,
+            "productValuation": 5,
+            "createdDate": created.isoformat(),
+            "productDetails": {"nmId": 1},
+        }
+
+    return {
+        "feedbacks": [item(f"fb-{days}", days) for days in (1, 2, 3, 10, 20, 29)],
+        "questions": [item("q-5", 5)],
+    }
+
+
+def _transport(history, log, fail_once=None):
+    failures = []
+
+    def handler(request):
+        key = "feedbacks" if request.url.path.endswith("feedbacks") else "questions"
+        params = request.url.params
+        log.append((key, params["dateFrom"], params["skip"]))
+        if fail_once == (key, params["dateFrom"]) and not failures:
+            failures.append(request)
+            return httpx.Response(500)
+        since, until = int(params["dateFrom"]), int(params["dateTo"])
+        items = [
+            item
+            for item in history[key]
+            if since <= datetime.fromisoformat(item["createdDate"]).timestamp() < until
+        ]
+        skip, take = int(params["skip"]), int(params["take"])
+        return httpx.Response(200, json={"data": {key: items[skip : skip + take]}})
+
+    return httpx.MockTransport(handler)
+
+
+def _run(SessionLocal, backfill_id, transport, max_windows, limiter=None):
+    async def scenario():
+        async with httpx.AsyncClient(transport=transport) as http:
+            return await backfill_claimed(
+                [backfill_id], SessionLocal, http, limiter or LocalTokenBucket(sleep=_no_sleep), max_windows=max_windows
+            )
+
+    return asyncio.run(scenario())
+
+
+def _ozon_transport(start_at, log):
+    reviews = [
+        {"id": f"oz-{days}", "text": "Ок", "rating": 4, "sku": 1, "published_at": (start_at + timedelta(days=days)).isoformat() + "Z"}
+        for days in (29, 20, 10, 3, 2, 1)
+    ]
+
+    def handler(request):
+        body = json.loads(request.content)
+        if request.url.path.endswith("/v1/question/list"):
+            return httpx.Response(200, json={"questions": [], "last_id": ""})
+        log.append(body["last_id"])
+        offset = int(body["last_id"] or 0)
+        page = reviews[offset : offset + body["limit"]]
+        has_next = offset + body["limit"] < len(reviews)
+        return httpx.Response(200, json={"reviews": page, "has_next": has_next, "last_id": str(offset + len(page))})
+
+    return httpx.MockTransport(handler)
+
+
+def test_new_cabinet_polls_live_from_creation_and_queues_backfill(monkeypatch, tmp_path):
+    SessionLocal, db, cabinet = _setup(monkeypatch, tmp_path)
+
+    assert cabinet.reviews_since == cabinet.questions_since == cabinet.created_at
+    backfill = cabinet.backfill
+    assert (backfill.status, backfill.progress, backfill.checkpoint) == ("pending", 0, {})
+    assert backfill.end_at == cabinet.created_at
+    assert backfill.cursor_at == backfill.start_at == cabinet.created_at - timedelta(days=30)
+
+    now = datetime.utcnow()
+    assert crud.claim_backfills(db, now, lease_seconds=60) == [backfill.id]
+    assert crud.claim_backfills(db, now, lease_seconds=60) == []
+    assert crud.claim_backfills(db, now + timedelta(seconds=61), lease_seconds=60) == [backfill.id]
+
+
+def test_backfill_walks_windows_and_reports_progress(monkeypatch, tmp_path):
+    SessionLocal, db, cabinet = _setup(monkeypatch, tmp_path)
+    backfill = cabinet.backfill
+    log = []
+    transport = _transport(_history(backfill.start_at), log)
+
+    first = _run(SessionLocal, backfill.id, transport, max_windows=4)
+    db.refresh(backfill)
+    assert first == {"backfills": 1, "imported": 6, "failed": 0}
+    assert backfill.status == "running"
+    assert backfill.progress == window_progress(backfill.start_at, backfill.end_at, backfill.cursor_at) == 93
+    assert backfill.leased_until is None
+
+    second = _run(SessionLocal, backfill.id, transport, max_windows=4)
+    db.refresh(backfill)
+    assert second["imported"] == 1
+    assert (backfill.status, backfill.progress, backfill.imported) == ("done", 100, 7)
+    assert backfill.cursor_at == backfill.end_at
+    assert db.scalar(select(func.count(models.Event.id))) == 7
+    assert ("feedbacks", _day(backfill.start_at, 0), "0") in log
+    assert ("feedbacks", _day(backfill.start_at, 2), "0") in log
+
+
+def test_interrupted_backfill_resumes_from_page_checkpoint(monkeypatch, tmp_path):
+    SessionLocal, db, cabinet = _setup(monkeypatch, tmp_path)
+    backfill = cabinet.backfill
+    log = []
+    resume_from = _day(backfill.start_at, 2)
+    transport = _transport(_history(backfill.start_at), log, fail_once=("feedbacks", resume_from))
+
+    failed = _run(SessionLocal, backfill.id, transport, max_windows=1)
+    db.refresh(backfill)
+    assert failed["failed"] == 1
+    assert backfill.checkpoint == {"reviews": f"{resume_from}:fb-2"}
+    assert backfill.imported == 2
+    assert "500" in backfill.error
+
+    log.clear()
+    resumed = _run(SessionLocal, backfill.id, transport, max_windows=1)
+    db.refresh(backfill)
+    assert resumed["imported"] == 2
+    assert log[0][1:] == (resume_from, "0")
+    assert backfill.error is None
+    assert backfill.checkpoint == {}
+    assert db.scalar(select(func.count(models.Event.id))) == 4
+
+
+def test_ozon_reviews_are_read_in_one_checkpointed_pass_from_the_shared_bucket(monkeypatch, tmp_path):
+    SessionLocal, db, _ = _setup(monkeypatch, tmp_path)
+    monkeypatch.setattr(settings, "ozon_api_base_url", "https://ozon.test")
+    monkeypatch.setattr(AsyncOzonClient, "page_size", 2)
+    monkeypatch.setattr(backfill_service, "UNDATED_PAGES_PER_WINDOW", 1)
+    cabinet = crud.create_cabinet(db, 1, "OZON", "Ozon", "1:key", backfill_days=30)
+    backfill = cabinet.backfill
+    log = []
+    transport = _ozon_transport(backfill.start_at, log)
+    limiter = LocalTokenBucket(sleep=_no_sleep)
+
+    first = _run(SessionLocal, backfill.id, transport, max_windows=1, limiter=limiter)
+    db.refresh(backfill)
+    assert (first["imported"], backfill.status, backfill.checkpoint) == (2, "running", {"reviews:all": "2"})
+
+    second = _run(SessionLocal, backfill.id, transport, max_windows=10, limiter=limiter)
+    db.refresh(backfill)
+    assert second["imported"] == 4
+    assert (backfill.status, backfill.progress) == ("done", 100)
+    assert log == ["", "2", "4"]
+    assert {f"OZON:{cabinet.id}", f"backfill:OZON:{cabinet.id}"} <= set(limiter._state)
@@ -0,0 +1,146 @@
+import asyncio
+import json
+from datetime import datetime, timezone
+
+import httpx
+
+from app.marketplace.clients import AsyncOzonClient, AsyncWBClient
+
+
+def _wb_feedback(index):
+    return {
+        "id": f"fb-{index}",
+        "text": f"Отзыв {index}",
+        "productValuation": 5,
+        "createdDate": f"2026-10-01T10:{index:02d}:00Z",
+        "productDetails": {"nmId": 100 + index},
+    }
+
+
+def _ts(index):
+    return int(datetime(2026, 10, 1, 10, index, tzinfo=timezone.utc).timestamp())
+
+
+def _wb_transport(total, seen, answered=()):
+    """Unanswered feedbacks at or after ``dateFrom``; ``answered`` ids drop out as the walk goes on."""
+
+    def handler(request):
+        params = request.url.params
+        skip, take = int(params["skip"]), int(params["take"])
+        date_from = int(params.get("dateFrom", 0))
+        seen.append((params.get("dateFrom"), skip))
+        items = [
+            _wb_feedback(index)
+            for index in range(total)
+            if _ts(index) >= date_from and f"fb-{index}" not in answered
+        ]
+        page = items[skip : skip + take]
+        return httpx.Response(200, json={"data": {"feedbacks": page}})
+
+    return httpx.MockTransport(handler)
+
+
+def _wb_pages(total, seen, answered=(), **kwargs):
+    async def scenario():
+        async with httpx.AsyncClient(transport=_wb_transport(total, seen, answered)) as http:
+            client = AsyncWBClient("token", http, base_url="https://wb.test")
+            client.page_size = 2
+            return [page async for page in client.iter_reviews(**kwargs)]
+
+    return asyncio.run(scenario())
+
+
+def test_wb_iterator_yields_pages_keyed_by_date():
+    seen = []
+    pages = _wb_pages(5, seen)
+
+    assert [[review.marketplace_review_id for review in page.items] for page in pages] == [
+        ["fb-0", "fb-1"],
+        ["fb-2"],
+        ["fb-3"],
+        ["fb-4"],
+        [],
+    ]
+    assert [page.next_token for page in pages] == [f"{_ts(index)}:fb-{index}" for index in range(1, 5)] + [None]
+    assert seen == [(None, 0)] + [(str(_ts(index)), 0) for index in range(1, 5)]
+
+
+def test_wb_walk_does_not_skip_reviews_answered_meanwhile():
+    answered = set()
+    seen = []
+
+    async def scenario():
+        async with httpx.AsyncClient(transport=_wb_transport(6, seen, answered)) as http:
+            client = AsyncWBClient("token", http, base_url="https://wb.test")
+            client.page_size = 2
+            ids = []
+            async for page in client.iter_reviews():
+                ids.extend(review.marketplace_review_id for review in page.items)
+                answered.update(ids)
+            return ids
+
+    assert asyncio.run(scenario()) == [f"fb-{index}" for index in range(6)]
+
+
+def test_wb_iterator_resumes_from_token():
+    seen = []
+    pages = _wb_pages(5, seen, page_token=f"{_ts(3)}:fb-3")
+    legacy = _wb_pages(5, [], page_token="4")
+
+    assert [review.marketplace_review_id for page in pages for review in page.items] == ["fb-4"]
+    assert seen == [(str(_ts(3)), 0), (str(_ts(4)), 0)]
+    assert [review.marketplace_review_id for page in legacy for review in page.items] == ["fb-4"]
+
+
+def test_fetch_reviews_collects_all_pages():
+    async def scenario():
+        async with httpx.AsyncClient(transport=_wb_transport(5, [])) as http:
+            client = AsyncWBClient("token", http, base_url="https://wb.test")
+            client.page_size = 2
+            return await client.fetch_reviews()
+
+    assert len(asyncio.run(scenario())) == 5
+
+
+def test_ozon_reviews_stop_at_watermark_and_resume_by_last_id():
+    listing = {
+        "": {
+            "reviews": [
+                {"id": "r3", "text": "c", "rating": 5, "published_at": "2026-10-03T00:00:00Z", "sku": 1},
+                {"id": "r2", "text": "b", "rating": 4, "published_at": "2026-10-02T00:00:00Z", "sku": 1},
+            ],
+            "last_id": "r2",
+            "has_next": True,
+        },
+        "r2": {
+            "reviews": [
+                {"id": "r1", "text": "a", "rating": 2, "published_at": "2026-10-01T00:00:00Z", "sku": 1},
+                {"id": "r0", "text": "z", "rating": 1, "published_at": "2026-09-01T00:00:00Z", "sku": 1},
+            ],
+            "last_id": "r0",
+            "has_next": True,
+        },
+    }
+    requested = []
+
+    def handler(request):
+        last_id = json.loads(request.content)["last_id"]
+        requested.append(last_id)
+        return httpx.Response(200, json=listing[last_id])
+
+    def run(**kwargs):
+        async def scenario():
+            async with httpx.AsyncClient(transport=httpx.MockTransport(handler)) as http:
+                client = AsyncOzonClient("42:key", http, base_url="https://ozon.test")
+                return [page async for page in client.iter_reviews(**kwargs)]
+
+        return asyncio.run(scenario())
+
+    pages = run(since=datetime(2026, 9, 15))
+    assert [[review.marketplace_review_id for review in page.items] for page in pages] == [["r3", "r2"], ["r1"]]
+    assert [page.next_token for page in pages] == ["r2", None]
+
+    requested.clear()
+    resumed = run(since=datetime(2026, 9, 15), page_token="r2")
+    assert requested == ["r2"]
+    assert [review.marketplace_review_id for review in resumed[0].items] == ["r1"]
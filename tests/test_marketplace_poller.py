@@ -0,0 +1,101 @@
+import asyncio
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+from sqlalchemy import create_engine, select, update
+from sqlalchemy.orm import sessionmaker
+
+from app import crud, models
+from app.config import settings
+from app.db import Base
+from app.services.poller import poll_all
+
+WB_FEEDBACKS = [
+    {"id": "wb-1", "text": "Отлично", "productValuation": 5, "createdDate": "2026-10-01T10:00:00Z", "productDetails": {"nmId": 111}},
+    {"id": "wb-2", "text": "Плохо", "productValuation": 1, "createdDate": "2026-10-02T10:00:00Z", "productDetails": {"nmId": 222}},
+]
+WB_QUESTIONS = [
+    {"id": "wb-q1", "text": "Какой размер?", "createdDate": "2026-10-03T10:00:00Z", "productDetails": {"nmId": 111}},
+]
+OZON_REVIEWS = [
+    {"id": "oz-1", "text": "Норм", "rating": 3, "published_at": "2026-10-04T10:00:00Z", "sku": 333},
+]
+
+
+class FakeMarketplace(BaseHTTPRequestHandler):
+    requests = []
+
+    def log_message(self, *args):
+        pass
+
+    def _reply(self, payload):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        query = parse_qs(url.query)
+        self.requests.append((url.path, query.get("dateFrom", [None])[0], self.headers.get("Authorization")))
+        key = "feedbacks" if url.path == "/api/v1/feedbacks" else "questions"
+        items = WB_FEEDBACKS if key == "feedbacks" else WB_QUESTIONS
+        self._reply({"data": {key: items}})
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        self.requests.append((self.path, None, self.headers.get("Api-Key")))
+        if self.path == "/v1/review/list":
+            self._reply({"reviews": OZON_REVIEWS, "has_next": False, "last_id": ""})
+        else:
+            self._reply({"questions": [], "last_id": ""})
+
+
+def test_poll_all_fetches_new_items_and_advances_watermarks(monkeypatch, tmp_path):
+    server = ThreadingHTTPServer(("127.0.0.1", 0), FakeMarketplace)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f"http://127.0.0.1:{server.server_address[1]}"
+    monkeypatch.setattr(settings, "encryption_key", "test-key")
+    monkeypatch.setattr(settings, "wb_api_base_url", base_url)
+    monkeypatch.setattr(settings, "ozon_api_base_url", base_url)
+
+    engine = create_engine(f"sqlite:///{tmp_path / 'poller.db'}")
+    Base.metadata.create_all(bind=engine)
+    SessionLocal = sessionmaker(bind=engine, autocommit=False, autoflush=False)
+    db = SessionLocal()
+    user = crud.get_or_create_user(db, "1")
+    project = crud.create_project(db, "Бренд", user.id)
+    wb = crud.create_cabinet(db, project.id, "WB", "WB", "wb-token")
+    crud.create_cabinet(db, project.id, "OZON", "Ozon", "42:ozon-key")
+    crud.upsert_sku_map(db, project.id, "WB", "art-1", "111", "SKU-1", None)
+    # Cabinets connected before history backfill existed have no watermark yet.
+    db.execute(update(models.Cabinet).values(reviews_since=None, questions_since=None))
+    db.commit()
+    FakeMarketplace.requests = []
+
+    try:
+        first = asyncio.run(poll_all(SessionLocal, concurrency=2))
+        second = asyncio.run(poll_all(SessionLocal, concurrency=2))
+    finally:
+        server.shutdown()
+
+    assert (first.cabinets, first.created, first.failed) == (2, 4, 0)
+    assert second.created == 0
+    events = db.scalars(select(models.Event).order_by(models.Event.marketplace_event_id)).all()
+    by_id = {event.marketplace_event_id: event for event in events}
+    assert by_id["wb-1"].internal_sku == "SKU-1"
+    assert by_id["wb-2"].internal_sku == "222"
+    assert by_id["wb-2"].sentiment == "negative"
+    assert by_id["wb-q1"].event_type == "question"
+    assert by_id["oz-1"].sentiment == "neutral"
+    db.refresh(wb)
+    assert wb.reviews_since.isoformat() == "2026-10-02T10:00:00"
+    assert wb.last_polled_at is not None
+    wb_feedback_requests = [req for req in FakeMarketplace.requests if req[0] == "/api/v1/feedbacks"]
+    assert wb_feedback_requests[0][1:] == (None, "wb-token")
+    assert wb_feedback_requests[1][1] == "1790935200"
+    assert ("/v1/review/list", None, "ozon-key") in FakeMarketplace.requests
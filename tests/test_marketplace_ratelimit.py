@@ -0,0 +1,94 @@
+import asyncio
+
+import fakeredis
+import httpx
+from fakeredis import aioredis
+
+from app.marketplace.clients import AsyncWBClient
+from app.marketplace.ratelimit import LocalTokenBucket, RedisTokenBucket, parse_retry_after
+
+
+class FakeTime:
+    def __init__(self, now=1000.0):
+        self.now = now
+        self.sleeps = []
+
+    def __call__(self):
+        return self.now
+
+    async def sleep(self, seconds):
+        self.sleeps.append(seconds)
+
+
+def _drain(limiter, clock):
+    async def scenario():
+        waits = [await limiter.acquire("WB:1", rate=2, burst=2, scope="WB") for _ in range(4)]
+        await limiter.penalize("WB:1", 5, scope="WB")
+        waits.append(await limiter.acquire("WB:1", rate=2, burst=2, scope="WB"))
+        clock.now += 10
+        waits.append(await limiter.acquire("WB:1", rate=2, burst=2, scope="WB"))
+        return waits
+
+    return asyncio.run(scenario())
+
+
+def test_local_bucket_spaces_calls_and_honours_penalty():
+    clock = FakeTime()
+    limiter = LocalTokenBucket(clock=clock, sleep=clock.sleep)
+
+    assert _drain(limiter, clock) == [0, 0, 0.5, 1.0, 6.5, 0]
+    stats = limiter.metrics.snapshot()["WB"]
+    assert stats["count"] == 6
+    assert stats["throttled"] == 1
+    assert stats["wait_seconds_max"] == 6.5
+    assert stats["wait_seconds_bucket"]["0.0"] == 3
+    assert stats["wait_seconds_bucket"]["+Inf"] == 6
+
+
+def test_redis_bucket_matches_local_semantics():
+    clock = FakeTime()
+    limiter = RedisTokenBucket(aioredis.FakeRedis(server=fakeredis.FakeServer()), clock=clock, sleep=clock.sleep)
+
+    assert _drain(limiter, clock) == [0, 0, 0.5, 1.0, 6.5, 0]
+
+
+def _queue_after_penalty(limiter):
+    async def scenario():
+        await limiter.penalize("WB:1", 5, scope="WB")
+        return [await limiter.acquire("WB:1", rate=2, burst=4, scope="WB") for _ in range(4)]
+
+    return asyncio.run(scenario())
+
+
+def test_callers_queued_during_a_block_are_spread_out_after_it():
+    clock = FakeTime()
+    local = LocalTokenBucket(clock=clock, sleep=clock.sleep)
+    shared = RedisTokenBucket(aioredis.FakeRedis(server=fakeredis.FakeServer()), clock=clock, sleep=clock.sleep)
+
+    assert _queue_after_penalty(local) == [5.0, 5.5, 6.0, 6.5]
+    assert _queue_after_penalty(shared) == [5.0, 5.5, 6.0, 6.5]
+
+
+def test_client_backs_off_on_429_using_retry_after():
+    clock = FakeTime()
+    limiter = LocalTokenBucket(clock=clock, sleep=clock.sleep)
+    responses = [
+        httpx.Response(429, headers={"Retry-After": "3"}),
+        httpx.Response(200, json={"data": {"feedbacks": []}}),
+    ]
+    transport = httpx.MockTransport(lambda request: responses.pop(0))
+
+    async def scenario():
+        async with httpx.AsyncClient(transport=transport) as http:
+            client = AsyncWBClient("token", http, base_url="https://wb.test", limiter=limiter, limiter_key="WB:1")
+            return await client.fetch_reviews()
+
+    assert asyncio.run(scenario()) == []
+    assert clock.sleeps == [3.0]
+    assert limiter.metrics.snapshot()["WB"]["throttled"] == 1
+
+
+def test_parse_retry_after_accepts_seconds_and_garbage():
+    assert parse_retry_after("7") == 7.0
+    assert parse_retry_after(None, default=2.0) == 2.0
+    assert parse_retry_after("soon", default=1.5) == 1.5
@@ -0,0 +1,96 @@
+from datetime import datetime, timedelta
+
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, select
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from app import crud, models
+from app.config import settings
+from app.db import Base, get_db
+from app.main import app
+from app.services.inbox import drain_inbox
+
+
+def _setup(monkeypatch):
+    monkeypatch.setattr(settings, "encryption_key", "test-key")
+    monkeypatch.setattr(settings, "marketplace_webhook_token", "hook-secret")
+    engine = create_engine(
+        "sqlite:///:memory:", connect_args={"check_same_thread": False}, poolclass=StaticPool
+    )
+    Base.metadata.create_all(bind=engine)
+    SessionLocal = sessionmaker(bind=engine, autocommit=False, autoflush=False)
+
+    def override():
+        db = SessionLocal()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    app.dependency_overrides[get_db] = override
+    db = SessionLocal()
+    user = crud.get_or_create_user(db, "1")
+    project = crud.create_project(db, "Бренд", user.id)
+    wb = crud.create_cabinet(db, project.id, "WB", "WB", "wb-token")
+    ozon = crud.create_cabinet(db, project.id, "OZON", "Ozon", "1:key")
+    return TestClient(app, headers={"X-Webhook-Token": "hook-secret"}), db, wb, ozon
+
+
+def test_webhooks_queue_payloads_and_worker_normalizes_in_batches(monkeypatch):
+    client, db, wb, ozon = _setup(monkeypatch)
+    feedback = {"id": "wb-1", "text": "Супер", "productValuation": 5, "createdDate": "2026-10-01T10:00:00Z", "productDetails": {"nmId": 1}}
+    try:
+        responses = [
+            client.post(f"/webhooks/wb/{wb.id}", json={"feedbacks": [feedback]}),
+            client.post(f"/webhooks/wb/{wb.id}", json=feedback),
+            client.post(f"/webhooks/ozon/{ozon.id}", json=[{"id": "oz-q1", "text": "Есть размер M?", "published_at": "2026-10-01T11:00:00Z", "sku": 9}]),
+            client.post(f"/webhooks/ozon/{ozon.id}", json={"id": "broken"}),
+        ]
+        wrong_marketplace = client.post(f"/webhooks/ozon/{wb.id}", json=feedback)
+    finally:
+        app.dependency_overrides.clear()
+
+    assert [response.status_code for response in responses] == [200] * 4
+    assert wrong_marketplace.status_code == 404
+    assert db.scalar(select(models.Event.id)) is None
+    for cabinet in (wb, ozon):
+        crud.update_cabinet_watermarks(db, cabinet.id, datetime.utcnow())
+    assert crud.list_cabinet_ids(db) == []
+
+    result = drain_inbox(db, limit=10)
+
+    assert result == {"processed": 4, "created": 2, "duplicates": 1, "failed": 1}
+    events = {event.marketplace_event_id: event for event in db.scalars(select(models.Event)).all()}
+    assert events["wb-1"].sentiment == "positive"
+    assert events["oz-q1"].event_type == "question"
+    errors = db.scalars(select(models.WebhookInbox.error).where(models.WebhookInbox.error.is_not(None))).all()
+    assert len(errors) == 1
+    assert drain_inbox(db)["processed"] == 0
+
+
+def test_webhooks_are_refused_without_a_configured_or_matching_token(monkeypatch):
+    client, db, wb, ozon = _setup(monkeypatch)
+    try:
+        wrong = client.post(f"/webhooks/wb/{wb.id}", json={"id": "wb-1"}, headers={"X-Webhook-Token": "guess"})
+        monkeypatch.setattr(settings, "marketplace_webhook_token", "")
+        unconfigured = client.post(f"/webhooks/wb/{wb.id}", json={"id": "wb-1"})
+    finally:
+        app.dependency_overrides.clear()
+
+    assert (wrong.status_code, unconfigured.status_code) == (403, 403)
+    assert db.scalar(select(models.WebhookInbox.id)) is None
+    assert crud.list_cabinet_ids(db) == [wb.id, ozon.id]
+
+
+def test_polling_resumes_when_webhooks_stop_and_safety_polls_keep_running(monkeypatch):
+    _, db, wb, ozon = _setup(monkeypatch)
+    app.dependency_overrides.clear()
+    now = datetime(2026, 10, 17, 12, 0)
+    crud.update_cabinet_watermarks(db, wb.id, now - timedelta(minutes=5))
+    crud.update_cabinet_watermarks(db, ozon.id, now - timedelta(hours=7))
+    crud.enqueue_webhook(db, wb, {"id": "wb-1"}, received_at=now - timedelta(minutes=10))
+    crud.enqueue_webhook(db, ozon, [{"id": "oz-1"}], received_at=now - timedelta(minutes=10))
+
+    assert crud.list_cabinet_ids(db, now) == [ozon.id]
+    assert crud.list_cabinet_ids(db, now + timedelta(hours=2)) == [wb.id, ozon.id]
@@ -0,0 +1,44 @@
+import fakeredis
+
+from app.services.poll_schedule import AdaptiveBackoff, HeapPollScheduler, RedisPollScheduler
+
+BACKOFF = AdaptiveBackoff(base=60, min_interval=15, max_interval=240)
+
+
+def _exercise(scheduler):
+    scheduler.sync([1, 2, 3], now=0)
+    assert sorted(scheduler.due(now=0)) == [1, 2, 3]
+    assert scheduler.due(now=0) == []
+
+    assert scheduler.record(1, 5, now=0) == 30
+    assert scheduler.record(2, 0, now=0) == 120
+    assert scheduler.record(3, None, now=0) == 60
+
+    assert scheduler.due(now=30) == [1]
+    assert scheduler.record(1, 3, now=30) == 15
+    assert scheduler.due(now=45) == [1]
+    assert scheduler.record(1, 1, now=45) == 15
+    assert sorted(scheduler.due(now=120)) == [1, 2, 3]
+    for _ in range(5):
+        interval = scheduler.record(2, 0, now=120)
+    assert interval == 240
+
+
+def test_heap_scheduler_adapts_intervals_within_sla():
+    _exercise(HeapPollScheduler(BACKOFF))
+
+
+def test_redis_scheduler_adapts_intervals_within_sla():
+    _exercise(RedisPollScheduler(fakeredis.FakeRedis(), BACKOFF))
+
+
+def test_claimed_cabinets_return_after_max_interval_if_never_recorded():
+    scheduler = RedisPollScheduler(fakeredis.FakeRedis(), BACKOFF)
+    scheduler.sync([7], now=0)
+
+    assert scheduler.due(now=0) == [7]
+    assert scheduler.due(now=239) == []
+    assert scheduler.due(now=240) == [7]
+
+    scheduler.remove(7)
+    assert scheduler.due(now=1000) == []
@@ -0,0 +1,41 @@
+import fakeredis
+
+from app.services.poll_sharding import HashRing, RedisMembership
+
+
+class Clock:
+    def __init__(self):
+        self.now = 100.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_ring_moves_only_the_leaving_nodes_cabinets():
+    cabinets = list(range(3000))
+    before = HashRing(["a", "b", "c"]).partition(cabinets)
+    after = HashRing(["a", "b"]).partition(cabinets)
+
+    assert sum(len(ids) for ids in before.values()) == 3000
+    assert all(600 < len(ids) < 1400 for ids in before.values())
+    owners_after = {cabinet: node for node, ids in after.items() for cabinet in ids}
+    for node in ("a", "b"):
+        assert all(owners_after[cabinet] == node for cabinet in before[node])
+
+
+def test_membership_expires_silent_nodes():
+    clock = Clock()
+    members = RedisMembership(fakeredis.FakeRedis(), ttl=30, clock=clock)
+
+    members.heartbeat("worker-1")
+    members.heartbeat("worker-2")
+    assert members.members() == ["worker-1", "worker-2"]
+
+    clock.now += 20
+    members.heartbeat("worker-2")
+    clock.now += 15
+    assert members.members() == ["worker-2"]
+    assert members.ring().nodes == ["worker-2"]
+
+    members.leave("worker-2")
+    assert members.members() == []
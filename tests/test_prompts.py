@@ -0,0 +1,124 @@
+from app import crud, models
+from app.schemas import LLMResponse
+from app.services.generation import draft_replies
+from app.services.kb_snapshot import KBRuleView
+from app.services.llm import LLMAdapter
+from app.services.prompts import RULES_HEADER, PromptBuilder, estimate_tokens, truncate_tokens
+from app.services.reply_cache import ReplyCache
+
+
+class RecordingLLM(LLMAdapter):
+    def __init__(self):
+        self.prompts = []
+
+    def generate_batch(self, prompts, project_ids=None):
+        self.prompts.extend(prompts)
+        return [LLMResponse(text="Спасибо!", confidence=90) for _ in prompts]
+
+
+def _event(db, project_id, marketplace_event_id, text):
+    event, _ = crud.create_event(
+        db,
+        {
+            "project_id": project_id,
+            "cabinet_id": 1,
+            "marketplace": "WB",
+            "marketplace_event_id": marketplace_event_id,
+            "event_type": "review",
+            "text": text,
+            "rating": 2,
+            "sentiment": "negative",
+            "internal_sku": "SKU1",
+            "raw_payload": {},
+        },
+    )
+    return event
+
+
+def test_token_estimate_counts_words_by_script_and_punctuation():
+    assert estimate_tokens("") == 0
+    assert estimate_tokens("Hello, world!") == 2 + 1 + 2 + 1
+    assert estimate_tokens("Доставка заняла 2 дня.") == 3 + 2 + 1 + 1 + 1
+    assert truncate_tokens("раз два три четыре", 2) == "раз два…"
+    assert truncate_tokens("раз два", 2) == "раз два"
+
+
+def test_rules_are_packed_in_relevance_order_within_budget(db):
+    user = crud.get_or_create_user(db, "100")
+    project = crud.create_project(db, "Бренд", user.id, "Дружелюбно, на «вы»")
+    long_rule = crud.create_kb_rule(db, project.id, None, "Возврат " + "очень " * 200 + "долгий")
+    size = crud.create_kb_rule(db, project.id, "SKU1", "Модель маломерит, берите на размер больше")
+    delivery = crud.create_kb_rule(db, project.id, None, "Доставка 2-3 дня")
+    db.add(
+        models.SKUMap(
+            project_id=project.id,
+            marketplace="WB",
+            seller_sku="A-1",
+            marketplace_item_id="1",
+            internal_sku="SKU1",
+            product_name="Платье летнее",
+        )
+    )
+    db.commit()
+    event = _event(db, project.id, "r-1", "Маломерит! " * 300)
+    builder = PromptBuilder(max_tokens=400, max_review_tokens=100)
+
+    prompt = builder.build_batch(db, [event], {event.id: [size.id, long_rule.id, delivery.id]})[0]
+
+    prefix = builder.prefix(project.id, "Дружелюбно, на «вы»")
+    assert prompt.text.startswith(prefix.text + "\n\nТовар: Платье летнее\nПравила магазина:\n- Модель маломерит")
+    assert prompt.rule_ids == (size.id, delivery.id)
+    assert prompt.text.endswith("…")
+    assert prompt.tokens == estimate_tokens(prompt.text) <= 400
+    assert prompt.prefix_tokens == prefix.tokens
+    assert builder.prefix(project.id, "Дружелюбно, на «вы»") is prefix
+    assert builder.prefix(project.id, "Строго") is not prefix
+
+
+def test_budget_counts_the_rules_header_and_shortens_the_review_to_fit():
+    builder = PromptBuilder(max_tokens=10_000, max_review_tokens=600)
+    prefix = builder.prefix(1, "Коротко")
+    event = models.Event(event_type="review", rating=5, text="Всё отлично, спасибо")
+    rule = KBRuleView(models.KBRule(id=7, project_id=1, text="Доставка 2-3 дня"))
+    review_tokens = estimate_tokens("Отзыв покупателя, оценка 5 из 5:\nВсё отлично, спасибо")
+    exact = prefix.tokens + review_tokens + estimate_tokens(RULES_HEADER) + estimate_tokens("- Доставка 2-3 дня")
+
+    builder.max_tokens = exact
+    fits = builder.build(prefix, event, None, [rule])
+    builder.max_tokens = exact - 1
+    too_small = builder.build(prefix, event, None, [rule])
+    builder.max_tokens = prefix.tokens + 16
+    cramped = builder.build(prefix, event, None, [rule])
+    builder.max_tokens = prefix.tokens - 5
+    overflowing = builder.build(prefix, event, None, [rule])
+
+    assert (fits.rule_ids, fits.tokens) == ((7,), exact)
+    assert too_small.rule_ids == ()
+    assert too_small.tokens <= exact - 1
+    assert cramped.rule_ids == ()
+    assert cramped.text.endswith("Отзыв покупателя, оценка 5 из 5:\nВсё…")
+    assert cramped.tokens == estimate_tokens(cramped.text) <= prefix.tokens + 16
+    assert overflowing.tokens == estimate_tokens(overflowing.text) <= prefix.tokens - 5
+
+
+def test_drafts_send_assembled_prompts_and_record_their_size(db):
+    user = crud.get_or_create_user(db, "100")
+    project = crud.create_project(db, "Бренд", user.id, "Коротко и тепло")
+    rule = crud.create_kb_rule(db, project.id, None, "Доставка занимает 2-3 дня")
+    first = _event(db, project.id, "r-1", "Доставка долгая")
+    second = _event(db, project.id, "r-2", "Доставка долгая")
+    llm = RecordingLLM()
+    cache = ReplyCache()
+
+    draft_replies(db, [first.id], llm, cache)
+    project.tone_description = "Официально"
+    db.commit()
+    draft_replies(db, [second.id], llm, cache)
+
+    assert "Тон ответов бренда: Коротко и тепло" in llm.prompts[0]
+    assert "- Доставка занимает 2-3 дня" in llm.prompts[0]
+    assert llm.prompts[0].endswith("Отзыв покупателя, оценка 2 из 5:\nДоставка долгая")
+    assert "Тон ответов бренда: Официально" in llm.prompts[1]
+    drafted = db.get(models.Event, first.id)
+    assert drafted.kb_rule_ids == [rule.id]
+    assert drafted.prompt_tokens == estimate_tokens(llm.prompts[0])
@@ -0,0 +1,119 @@
+import fakeredis
+
+from app import crud, models
+from app.schemas import LLMResponse
+from app.services.generation import draft_replies
+from app.services.llm import LLMAdapter
+from app.services.reply_cache import ReplyCache, ReplyKey, normalize_text
+
+
+class CountingLLM(LLMAdapter):
+    def __init__(self):
+        self.prompts = []
+
+    def generate_batch(self, prompts, project_ids=None):
+        responses = [
+            LLMResponse(text=f"Спасибо! #{len(self.prompts) + index}", confidence=90)
+            for index in range(len(prompts))
+        ]
+        self.prompts.extend(prompts)
+        return responses
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def _event(marketplace_event_id, text, rating=5, sku="SKU1", event_type="review"):
+    return {
+        "project_id": 1,
+        "cabinet_id": 1,
+        "marketplace": "WB",
+        "marketplace_event_id": marketplace_event_id,
+        "event_type": event_type,
+        "text": text,
+        "rating": rating,
+        "sentiment": None,
+        "internal_sku": sku,
+        "raw_payload": {},
+    }
+
+
+def _key(text="всё отлично", version="v1"):
+    return ReplyKey(1, "review", "SKU1", "positive", version, normalize_text(text))
+
+
+def test_normalize_text_ignores_case_punctuation_and_yo():
+    assert normalize_text("Всё ОТЛИЧНО, спасибо!!! 👍") == normalize_text("все отлично спасибо") == "все отлично спасибо"
+
+
+def test_near_identical_reviews_share_one_generation(db):
+    created, _ = crud.create_events_bulk(
+        db,
+        [
+            _event("a", "Всё отлично, спасибо!"),
+            _event("b", "все отлично спасибо"),
+            _event("c", "Всё отлично, спасибо!", rating=1),
+            _event("d", "Всё отлично, спасибо!", sku="SKU2"),
+        ],
+    )
+    cache = ReplyCache()
+    llm = CountingLLM()
+
+    draft_replies(db, [event.id for event in created], llm, cache)
+
+    assert len(llm.prompts) == 3
+    replies = {event.marketplace_event_id: event.suggested_reply for event in db.query(models.Event).all()}
+    assert replies["a"] == replies["b"]
+    assert len({replies["a"], replies["c"], replies["d"]}) == 3
+    assert cache.snapshot()["misses"] == 3
+
+    more, _ = crud.create_events_bulk(db, [_event("e", "ВСЁ ОТЛИЧНО спасибо")])
+    draft_replies(db, [more[0].id], llm, cache)
+    assert len(llm.prompts) == 3
+    assert cache.snapshot()["hits"] == 1
+
+    question, _ = crud.create_events_bulk(db, [_event("f", "Всё отлично, спасибо!", event_type="question")])
+    draft_replies(db, [question[0].id], llm, cache)
+    assert len(llm.prompts) == 4
+
+
+def test_kb_change_for_project_or_sku_invalidates_cached_replies(db):
+    cache = ReplyCache()
+    llm = CountingLLM()
+
+    def draft(*events):
+        created, _ = crud.create_events_bulk(db, list(events))
+        draft_replies(db, [event.id for event in created], llm, cache)
+        return len(llm.prompts)
+
+    assert draft(_event("a", "Отлично"), _event("x", "Отлично", sku="SKU2")) == 2
+    crud.create_kb_rule(db, 1, "SKU1", "Гарантия 1 год")
+    assert draft(_event("b", "Отлично"), _event("y", "Отлично", sku="SKU2")) == 3
+    crud.create_kb_rule(db, 1, None, "Доставка 2 дня")
+    assert draft(_event("z", "Отлично", sku="SKU2")) == 4
+
+
+def test_lru_ttl_and_redis_tier():
+    clock = FakeClock()
+    redis = fakeredis.FakeRedis()
+    cache = ReplyCache(maxsize=1, ttl=60, redis=redis, clock=clock)
+    response = LLMResponse(text="Спасибо!", confidence=90)
+
+    cache.set(_key("один"), response)
+    cache.set(_key("два"), response)
+    assert len(cache._entries) == 1
+
+    other_worker = ReplyCache(redis=redis, clock=clock)
+    assert other_worker.get(_key("один")) == response
+    assert other_worker.snapshot()["redis_hits"] == 1
+
+    local_only = ReplyCache(ttl=60, clock=clock)
+    local_only.set(_key(), response)
+    clock.now = 61
+    assert local_only.get(_key()) is None
+    assert local_only.get(_key(version="v2")) is None
@@ -0,0 +1,70 @@
+import asyncio
+
+import httpx
+
+from bot.subscription import SubscriptionCache, SubscriptionChecker
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def _checker(statuses, clock, calls):
+    def handler(request):
+        calls.append(request.url.path)
+        return httpx.Response(200, json={"ok": True, "result": {"status": statuses.pop(0)}})
+
+    client = httpx.AsyncClient(base_url="https://tg.test", transport=httpx.MockTransport(handler))
+    cache = SubscriptionCache(maxsize=2, ttl=300, negative_ttl=30, clock=clock)
+    return SubscriptionChecker("token", cache=cache, client=client)
+
+
+def test_positive_results_are_cached_until_ttl():
+    clock, calls = Clock(), []
+    checker = _checker(["member", "left"], clock, calls)
+
+    async def scenario():
+        first = await checker.check("@channel", 1)
+        clock.now = 299
+        cached = await checker.check("@channel", 1)
+        clock.now = 301
+        expired = await checker.check("@channel", 1)
+        await checker.aclose()
+        return first, cached, expired
+
+    assert asyncio.run(scenario()) == (True, True, False)
+    assert calls == ["/bottoken/getChatMember"] * 2
+
+
+def test_negative_results_expire_sooner_and_force_invalidates():
+    clock, calls = Clock(), []
+    checker = _checker(["left", "left", "member"], clock, calls)
+
+    async def scenario():
+        results = [await checker.check("@channel", 1)]
+        clock.now = 31
+        results.append(await checker.check("@channel", 1))
+        results.append(await checker.check("@channel", 1, force=True))
+        results.append(await checker.check("@channel", 1))
+        await checker.aclose()
+        return results
+
+    assert asyncio.run(scenario()) == [False, False, True, True]
+    assert len(calls) == 3
+
+
+def test_cache_evicts_least_recently_used():
+    cache = SubscriptionCache(maxsize=2, clock=Clock())
+
+    async def scenario():
+        await cache.set("@c", 1, True)
+        await cache.set("@c", 2, True)
+        await cache.get("@c", 1)
+        await cache.set("@c", 3, True)
+        return [await cache.get("@c", user_id) for user_id in (1, 2, 3)]
+
+    assert asyncio.run(scenario()) == [True, None, True]
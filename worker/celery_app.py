@@ -1,12 +1,44 @@
 from celery import Celery
+from celery.schedules import crontab
 
 from app.config import settings
+from worker.config import CELERY_SETTINGS
 
 celery_app = Celery(
     "mp_reviews_bot",
     broker=settings.redis_url,
     backend=settings.redis_url,
-    include=["worker.tasks"],
+    include=["worker.tasks", "worker.sharding"],
 )
 
 celery_app.conf.update(task_track_started=True, broker_connection_retry_on_startup=True)
+celery_app.conf.task_routes = {
+    "worker.tasks.poll_marketplaces": {"queue": CELERY_SETTINGS.polling_queue},
+    "worker.tasks.poll_cabinets": {"queue": CELERY_SETTINGS.polling_queue},
+    "worker.tasks.backfill_cabinets": {"queue": CELERY_SETTINGS.import_queue},
+    "worker.tasks.generate_replies": {"queue": CELERY_SETTINGS.llm_queue},
+}
+celery_app.conf.beat_schedule = {
+    "poll-marketplaces": {
+        "task": "worker.tasks.poll_marketplaces",
+        "schedule": float(CELERY_SETTINGS.poll_min_interval_seconds),
+    },
+    "process-webhook-inbox": {
+        "task": "worker.tasks.process_event",
+        "schedule": 5.0,
+    },
+    "generate-replies": {
+        "task": "worker.tasks.generate_replies",
+        "schedule": 5.0,
+        "options": {"expires": 5},
+    },
+    "backfill-cabinets": {
+        "task": "worker.tasks.backfill_cabinets",
+        "schedule": float(CELERY_SETTINGS.backfill_interval_seconds),
+        "options": {"expires": CELERY_SETTINGS.backfill_interval_seconds},
+    },
+    "reconcile-event-counters": {
+        "task": "worker.tasks.reconcile_event_counters",
+        "schedule": crontab(minute=30, hour=3),
+    },
+}
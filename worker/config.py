@@ -9,6 +9,10 @@ class CelerySettings:
     broker_url: str
     result_backend: str
     poll_interval_seconds: int = 60
+    poll_min_interval_seconds: int = 15
+    poll_max_interval_seconds: int = 240
+    poll_membership_ttl_seconds: int = 30
+    backfill_interval_seconds: int = 30
     retention_days: int = 90
     retention_run_hour: int = 3
     timezone: str = "UTC"
@@ -30,12 +34,20 @@ class CelerySettings:
         broker_url = os.getenv("CELERY_BROKER_URL", "redis://localhost:6379/0")
         result_backend = os.getenv("CELERY_RESULT_BACKEND", broker_url)
         poll_interval_seconds = int(os.getenv("CELERY_POLL_INTERVAL_SECONDS", "60"))
+        poll_min_interval_seconds = int(os.getenv("CELERY_POLL_MIN_INTERVAL_SECONDS", "15"))
+        poll_max_interval_seconds = int(os.getenv("CELERY_POLL_MAX_INTERVAL_SECONDS", "240"))
+        poll_membership_ttl_seconds = int(os.getenv("CELERY_POLL_MEMBERSHIP_TTL_SECONDS", "30"))
+        backfill_interval_seconds = int(os.getenv("CELERY_BACKFILL_INTERVAL_SECONDS", "30"))
         retention_days = int(os.getenv("CELERY_RETENTION_DAYS", "90"))
         retention_run_hour = int(os.getenv("CELERY_RETENTION_RUN_HOUR", "3"))
         return CelerySettings(
             broker_url=broker_url,
             result_backend=result_backend,
             poll_interval_seconds=poll_interval_seconds,
+            poll_min_interval_seconds=poll_min_interval_seconds,
+            poll_max_interval_seconds=poll_max_interval_seconds,
+            poll_membership_ttl_seconds=poll_membership_ttl_seconds,
+            backfill_interval_seconds=backfill_interval_seconds,
             retention_days=retention_days,
             retention_run_hour=retention_run_hour,
         )
@@ -0,0 +1,68 @@
+from __future__ import annotations
+
+import logging
+import threading
+
+import redis
+from celery.signals import celeryd_after_setup, worker_ready, worker_shutdown
+
+from app.config import settings
+from app.services.poll_sharding import RedisMembership
+from worker.config import CELERY_SETTINGS
+
+logger = logging.getLogger(__name__)
+
+_node: dict = {}
+
+
+def node_queue(node: str) -> str:
+    """Per-node queue that the owner of a shard consumes in addition to the shared polling queue."""
+    return f"{CELERY_SETTINGS.polling_queue}.{node}"
+
+
+def membership() -> RedisMembership:
+    return RedisMembership(
+        redis.Redis.from_url(settings.redis_url),
+        ttl=CELERY_SETTINGS.poll_membership_ttl_seconds,
+    )
+
+
+@celeryd_after_setup.connect
+def _subscribe_node_queue(sender, instance, **kwargs):
+    queues = instance.app.amqp.queues
+    if queues.consume_from and CELERY_SETTINGS.polling_queue not in queues.consume_from:
+        return
+    queues.select_add(node_queue(sender))
+    _node["name"] = sender
+
+
+def _heartbeat_loop(name: str, stop: threading.Event) -> None:
+    members = membership()
+    interval = CELERY_SETTINGS.poll_membership_ttl_seconds / 3
+    while not stop.is_set():
+        try:
+            members.heartbeat(name)
+        except redis.RedisError:
+            logger.warning("Polling heartbeat for %s failed", name, exc_info=True)
+        stop.wait(interval)
+    members.leave(name)
+
+
+@worker_ready.connect
+def _join_polling_ring(**kwargs):
+    name = _node.get("name")
+    if not name:
+        return
+    stop = threading.Event()
+    thread = threading.Thread(target=_heartbeat_loop, args=(name, stop), daemon=True)
+    thread.start()
+    _node.update(stop=stop, thread=thread)
+
+
+@worker_shutdown.connect
+def _leave_polling_ring(**kwargs):
+    stop = _node.get("stop")
+    if stop is None:
+        return
+    stop.set()
+    _node["thread"].join(timeout=5)
@@ -1,38 +1,163 @@
 from datetime import datetime, timedelta
 
+import redis
+
 from worker.celery_app import celery_app
+from worker.config import CELERY_SETTINGS
+from app.config import settings
 from app.db import SessionLocal
-from app import models
-from app.services.llm import LLMAdapter
+from app import crud, models
+from app.services.llm import LLMAdapter, build_llm_adapter
+from app.services.backfill import run_backfills
 from app.services.gating import can_autosend
+from app.services.generation import GenerationBatcher, draft_replies
+from app.services.reply_cache import ReplyCache, build_reply_cache
+from app.services.kb_semantic import SemanticKBIndex, build_semantic_index
+from app.services.kb_snapshot import kb_snapshots
+from app.services.inbox import drain_inbox
+from app.services.poll_schedule import AdaptiveBackoff, RedisPollScheduler
+from app.services.poller import claim_due_cabinets, poll_claimed, summary_dict
+from worker.sharding import membership, node_queue
+
+
+def _poll_scheduler() -> RedisPollScheduler:
+    backoff = AdaptiveBackoff(
+        base=CELERY_SETTINGS.poll_interval_seconds,
+        min_interval=CELERY_SETTINGS.poll_min_interval_seconds,
+        max_interval=CELERY_SETTINGS.poll_max_interval_seconds,
+    )
+    return RedisPollScheduler(redis.Redis.from_url(settings.redis_url), backoff)
 
 
 @celery_app.task
 def poll_marketplaces():
-    return "polling"
+    """Claim due cabinets and hand each live polling node the shard it owns on the hash ring."""
+    due = claim_due_cabinets(_poll_scheduler())
+    if not due:
+        return {}
+    ring = membership().ring()
+    if not ring.nodes:
+        poll_cabinets.apply_async(args=[due], expires=CELERY_SETTINGS.poll_max_interval_seconds)
+        return {"unsharded": len(due)}
+    shards = ring.partition(due)
+    for node, cabinet_ids in shards.items():
+        poll_cabinets.apply_async(
+            args=[cabinet_ids],
+            queue=node_queue(node),
+            expires=CELERY_SETTINGS.poll_max_interval_seconds,
+        )
+    return {node: len(cabinet_ids) for node, cabinet_ids in shards.items()}
 
 
 @celery_app.task
-def process_event(event_id: int):
-    return event_id
+def poll_cabinets(cabinet_ids: list[int]):
+    return summary_dict(poll_claimed(_poll_scheduler(), cabinet_ids))
+
+
+@celery_app.task
+def backfill_cabinets(limit: int = 1, max_windows: int = 4):
+    """Import history of newly connected cabinets a few windows at a time on the import queue."""
+    return run_backfills(limit=limit, max_windows=max_windows)
+
+
+@celery_app.task
+def process_event(limit: int = 500, max_batches: int = 20):
+    """Drain the webhook inbox in batches of ``limit`` until it is empty or ``max_batches`` ran."""
+    totals = {"processed": 0, "created": 0, "duplicates": 0, "failed": 0}
+    db = SessionLocal()
+    try:
+        for _ in range(max_batches):
+            result = drain_inbox(db, limit)
+            for key in totals:
+                totals[key] += result[key]
+            if result["processed"] < limit:
+                break
+        return totals
+    finally:
+        db.close()
+
+
+def _generation_batcher() -> GenerationBatcher:
+    return GenerationBatcher(
+        redis.Redis.from_url(settings.redis_url),
+        max_items=settings.llm_batch_size,
+        max_wait_ms=settings.llm_batch_wait_ms,
+        lease_seconds=settings.llm_batch_lease_seconds,
+        max_attempts=settings.llm_batch_max_attempts,
+    )
+
+
+_reply_cache: ReplyCache | None = None
+_llm: LLMAdapter | None = None
+_semantic_index: SemanticKBIndex | None = None
+
+
+def _get_reply_cache() -> ReplyCache:
+    global _reply_cache
+    if _reply_cache is None:
+        _reply_cache = build_reply_cache(settings)
+    return _reply_cache
+
+
+def _get_llm() -> LLMAdapter:
+    global _llm
+    if _llm is None:
+        _llm = build_llm_adapter(settings)
+    return _llm
+
+
+def _listen_for_kb_changes() -> None:
+    if settings.kb_snapshot_pubsub:
+        kb_snapshots.listen(redis.Redis.from_url(settings.redis_url))
+
+
+def _get_semantic_index() -> SemanticKBIndex | None:
+    global _semantic_index
+    if settings.kb_retrieval_mode != "semantic":
+        return None
+    if _semantic_index is None:
+        _semantic_index = build_semantic_index(settings)
+    return _semantic_index
 
 
 @celery_app.task
 def generate_reply(event_id: int):
+    """Queue the event for the next generation batch."""
+    _generation_batcher().push(event_id)
+    return event_id
+
+
+@celery_app.task
+def generate_replies(max_batches: int = 50):
+    """Draft queued events in batches of up to ``llm_batch_size``, one LLM call and one commit each."""
+    batcher = _generation_batcher()
+    llm = _get_llm()
+    cache = _get_reply_cache()
+    semantic = _get_semantic_index()
+    _listen_for_kb_changes()
+    batcher.recover()
+    drafted = 0
     db = SessionLocal()
     try:
-        event = db.get(models.Event, event_id)
-        if not event:
-            return None
-        llm = LLMAdapter()
-        response = llm.generate(event.text)
-        event.suggested_reply = response.text
-        event.confidence = response.confidence
-        event.kb_rule_ids = response.kb_rule_ids
-        event.conflict = response.conflict
-        event.status = "drafted"
-        db.commit()
-        return event.id
+        for _ in range(max_batches):
+            event_ids = batcher.next_batch()
+            if not event_ids:
+                break
+            failures: dict[int, Exception] = {}
+            try:
+                drafted += draft_replies(
+                    db, event_ids, llm, cache, settings.kb_top_k, semantic, failures=failures
+                )
+            except Exception as exc:
+                db.rollback()
+                dropped = batcher.fail()
+                if dropped:
+                    crud.mark_generation_failed(db, dropped, repr(exc))
+                raise
+            for event_id in batcher.fail(failures):
+                crud.mark_generation_failed(db, [event_id], repr(failures[event_id]))
+            batcher.ack()
+        return {"drafted": drafted, "reply_cache": cache.snapshot()}
     finally:
         db.close()
 
@@ -45,16 +170,25 @@ def auto_send(event_id: int):
         if not event:
             return None
         if not can_autosend(event):
-            event.status = "approved"
+            crud.set_event_status(db, event, "approved")
             db.commit()
             return False
-        event.status = "sent"
+        crud.set_event_status(db, event, "sent")
         db.commit()
         return True
     finally:
         db.close()
 
 
+@celery_app.task
+def reconcile_event_counters(project_id: int | None = None):
+    db = SessionLocal()
+    try:
+        return crud.reconcile_event_counters(db, project_id)
+    finally:
+        db.close()
+
+
 @celery_app.task
 def cleanup_logs():
     db = SessionLocal()